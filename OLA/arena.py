@@ -0,0 +1,163 @@
+"""
+This contains the flat array form of a depth-limited game tree, which lets
+the CFR iterations of a search run as array passes.
+"""
+
+import numpy as np
+
+from OLA.core import Player
+from OLA.tables import TableStore
+
+
+class TreeArena:
+    """
+    This holds a game tree as flat arrays of its nodes: the parent of each
+    node, the index of the action that leads to it in the parent's searched
+    actions, the player to move, the table row of each decision node (-1 for
+    leaves) and the value of each leaf, relative to its player to move.
+
+    The nodes are added depth first while the tree is walked once, and then
+    frozen into level order, where the nodes of every level are contiguous
+    and the children of each node are contiguous within the next level. The
+    regret and strategy updates of an iteration are then a top-down pass for
+    the reach probabilities and a bottom-up pass for the values, one level
+    at a time, without any boards or infostates.
+
+    Every decision node reads its profile from the start of the pass, which
+    matches a depth first traversal unless several nodes share a table row.
+    """
+
+    def __init__(self):
+        self.parents = []
+        self.indices = []
+        self.players = []
+        self.rows = []
+        self.values = []
+        self.levels = []
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, parent: int, index: int, player: int, row: int = -1,
+            value: float = 0.0):
+        """
+        This adds a node below the parent (-1 for the root), returning its id.
+        The players of leaves are not used.
+        """
+        node = len(self.parents)
+        self.parents.append(parent)
+        self.indices.append(index)
+        self.players.append(player)
+        self.rows.append(row)
+        self.values.append(value)
+        self.levels.append(0 if parent < 0 else self.levels[parent] + 1)
+
+        return node
+
+    def freeze(self, tables: TableStore):
+        """
+        This converts the nodes to arrays in level order, locating the slab
+        entry of every edge in the tables. No rows may be added to the tables
+        of a frozen arena.
+        """
+        levels = np.array(self.levels, dtype=np.int64)
+        order = np.argsort(levels, kind="stable")
+        positions = np.empty_like(order)
+        positions[order] = np.arange(len(order))
+
+        parents = np.array(self.parents, dtype=np.int64)[order]
+        self.parents = np.where(parents < 0, -1, positions[parents])
+        self.indices = np.array(self.indices, dtype=np.int64)[order]
+        self.players = np.array(self.players, dtype=np.int64)[order]
+        self.rows = np.array(self.rows, dtype=np.int64)[order]
+        self.values = np.array(self.values, dtype=np.float64)[order]
+        self.levels = levels[order]
+        self.bounds = np.searchsorted(
+            self.levels, np.arange(self.levels[-1] + 2)).tolist()
+
+        # The slab entry of the edge into every node but the root
+        offsets = np.array(tables.offsets, dtype=np.int64)
+        self.entries = np.zeros(len(order), dtype=np.int64)
+        self.entries[1:] = (offsets[self.rows[self.parents[1:]]]
+                            + self.indices[1:])
+        # The children of the decision nodes, as slices of the next level
+        self.decisions = np.flatnonzero(self.rows >= 0)
+        self.decision_bounds = np.searchsorted(self.decisions,
+                                               self.bounds).tolist()
+        self.first_children = np.searchsorted(self.parents[1:],
+                                              self.decisions) + 1
+
+    def iterate(self, tables: TableStore, current_player: int,
+                regret_weight: float = 1.0, strategy_weight: float = 1.0):
+        """
+        This runs one CFR traversal over the arena, updating the tables of
+        the decision nodes of the current player, or of both players if it is
+        None. The weights scale the added regrets and strategies.
+        """
+        if not len(self.decisions):
+            return
+        count = len(self.parents)
+
+        parents, players, entries = self.parents, self.players, self.entries
+        probabilities = np.ones(count)
+        probabilities[1:] = tables.profile_slab[entries[1:]]
+
+        # Reach probabilities, from the root down
+        blue_reach, red_reach = np.ones(count), np.ones(count)
+        for start, end in zip(self.bounds[1:-1], self.bounds[2:]):
+            level_parents = parents[start:end]
+            moves = players[level_parents]
+            blue_reach[start:end] = blue_reach[level_parents]*np.where(
+                moves == Player.BLUE, probabilities[start:end], 1.0)
+            red_reach[start:end] = red_reach[level_parents]*np.where(
+                moves == Player.RED, probabilities[start:end], 1.0)
+
+        # Node values, from the leaves up
+        values = self.values.copy()
+        utilities = np.zeros(count)  # Of each edge, for the player at its parent
+        for level in range(len(self.bounds) - 3, -1, -1):
+            start, end = self.bounds[level + 1], self.bounds[level + 2]
+            utilities[start:end] = -values[start:end]
+            first, last = self.decision_bounds[level:level + 2]
+            values[self.decisions[first:last]] = np.add.reduceat(
+                probabilities[start:end]*utilities[start:end],
+                self.first_children[first:last] - start)
+
+        # Regret and strategy updates of the edges below the updated nodes
+        edges = np.arange(1, count)
+        edge_parents = parents[1:]
+        if current_player is not None:
+            edges = edges[players[edge_parents] == current_player]
+            edge_parents = parents[edges]
+        if not len(edges):
+            return
+        is_blue = players[edge_parents] == Player.BLUE
+        player_reach = np.where(is_blue, blue_reach[edge_parents],
+                                red_reach[edge_parents])
+        opponent_reach = np.where(is_blue, red_reach[edge_parents],
+                                  blue_reach[edge_parents])
+
+        np.add.at(tables.regret_slab, entries[edges], regret_weight*opponent_reach*(
+            utilities[edges] - values[edge_parents]))
+        np.add.at(tables.strategy_slab, entries[edges],
+                  strategy_weight*player_reach*probabilities[edges])
+
+        # The entries of every updated row, row after row
+        updated_rows = np.unique(self.rows[edge_parents])
+        if tables.updated is not None:
+            tables.updated.update(updated_rows.tolist())
+        widths = np.array(tables.widths, dtype=np.int64)[updated_rows]
+        row_starts = np.cumsum(widths) - widths
+        row_entries = np.repeat(
+            np.array(tables.offsets, dtype=np.int64)[updated_rows] - row_starts,
+            widths) + np.arange(widths.sum())
+        regrets = tables.regret_slab[row_entries]
+
+        # Regret matching of the next profiles, with uniform fallbacks
+        positive_regrets = np.maximum(regrets, 0.0)
+        positive_sums = np.repeat(
+            np.add.reduceat(positive_regrets, row_starts), widths)
+        tables.profile_slab[row_entries] = np.where(
+            positive_sums > 0,
+            positive_regrets/np.where(positive_sums > 0, positive_sums, 1.0),
+            1.0/np.repeat(widths, widths))
@@ -0,0 +1,27 @@
+"""
+This selects the compiled extensions when they have been built with
+`python setup.py build_ext --inplace`, and falls back to their equivalent pure
+Python implementations in the helpers module otherwise.
+"""
+
+from OLA import helpers
+
+try:
+    from OLA.fasteval import evaluation, evaluate_children
+    EVALUATION_BACKEND = "compiled"
+except ImportError:  # Missing, or built before evaluate_children existed
+    evaluation, evaluate_children = (
+        helpers.evaluation, helpers.evaluate_children)
+    EVALUATION_BACKEND = "python"
+
+try:
+    from OLA.find_locations import find_unique_locations, find_unique_squares
+    LOCATIONS_BACKEND = "compiled"
+except ImportError:  # Missing, or built before find_unique_squares existed
+    find_unique_locations, find_unique_squares = (
+        helpers.find_unique_locations, helpers.find_unique_squares)
+    LOCATIONS_BACKEND = "python"
+
+# Either "compiled", "python", or "mixed" when only some extensions are built
+BACKEND = (EVALUATION_BACKEND if EVALUATION_BACKEND == LOCATIONS_BACKEND
+           else "mixed")
@@ -88,3 +88,32 @@ class Controller:
 
     def __init__(self):
         pass
+
+
+class Replacement:
+    """
+    This class contains constants for the replacement policies of the
+    transposition table (see TranspositionTable class for details).
+    """
+    LRU = 0
+    BUCKETS = 1
+
+    def __init__(self):
+        pass
+
+
+class UpdateRule:
+    """
+    This class contains constants for the regret and strategy update rules of
+    the CFR trainers. CFR+ floors the regrets at zero and averages the
+    strategies linearly, Linear CFR weights both by the iteration number, and
+    Discounted CFR shrinks the past positive regrets, negative regrets and
+    strategies by the alpha, beta and gamma discounts.
+    """
+    VANILLA = 0
+    CFR_PLUS = 1
+    LINEAR = 2
+    DISCOUNTED = 3
+
+    def __init__(self):
+        pass
@@ -2,19 +2,15 @@
 Here we define the core components of the OLA engine.
 """
 import logging
-import copy
 import random
 
 from dataclasses import dataclass
 
 from OLA.constants import Ranking, Result, POV
 from OLA.helpers import (get_random_permutation, get_hex_uppercase_string,
-                         find_indices)
-
-import OLA.fasteval as fev
-
-# Configure the logging
-logging.basicConfig(level=logging.WARNING)
+                         find_indices, get_zobrist_keys, defeats)
+from OLA.backend import (evaluation, evaluate_children,
+                         find_unique_squares)
 
 
 class Player:
@@ -230,13 +226,24 @@ class Board:
     """
     ROWS = 8
     COLUMNS = 9
+    SQUARES = ROWS*COLUMNS
+    # Index of the first square of the last (red end) row in the flat squares
+    RED_END = SQUARES - COLUMNS
+    # Checks the incrementally updated evaluation against fasteval when set
+    VERIFY_EVALUATION = False
+    # Boards are created for every node of a search, so they carry no __dict__
+    __slots__ = ('squares', 'player_to_move', 'blue_anticipating',
+                 'red_anticipating', 'zobrist', 'blue_flag', 'red_flag',
+                 '_terminality', '_outcome', 'blue_value', 'red_value')
 
     def __init__(self, matrix: list[list[int]], player_to_move: int,
                  blue_anticipating: bool, red_anticipating: bool):
         """
         The matrix is simply a representation of the current piece positions and
         ranks, with the rank designations being 0 to 30 (see constant
-        definitions in the Ranking class).
+        definitions in the Ranking class). It is stored as a flat bytearray of
+        squares in row-major order, so square (row, column) is found at index
+        row*Board.COLUMNS + column.
 
         blue_anticipating is True when the blue player's flag has reached the
         eighth row, but can still be challenged in the next turn by a red piece.
@@ -248,6 +255,165 @@ class Board:
         self.player_to_move = player_to_move
         self.blue_anticipating = blue_anticipating
         self.red_anticipating = red_anticipating
+        self.zobrist = Board.compute_zobrist(
+            self.squares, player_to_move, blue_anticipating, red_anticipating)
+
+    @classmethod
+    def from_squares(cls, squares: bytearray, player_to_move: int,
+                     blue_anticipating: bool, red_anticipating: bool):
+        """
+        This creates a board directly from a flat bytearray of squares, skipping
+        the conversion from a nested matrix.
+        """
+        board = cls.__new__(cls)
+        board.squares = squares
+        board.locate_flags()
+        board.sum_values()
+        board.player_to_move = player_to_move
+        board.blue_anticipating = blue_anticipating
+        board.red_anticipating = red_anticipating
+        board.zobrist = Board.compute_zobrist(
+            squares, player_to_move, blue_anticipating, red_anticipating)
+
+        return board
+
+    @staticmethod
+    def compute_zobrist(squares: bytearray, player_to_move: int,
+                        blue_anticipating: bool, red_anticipating: bool):
+        """
+        This computes the Zobrist hash of a board from scratch. Transitions
+        update the hash incrementally instead.
+        """
+        zobrist = 0
+        for square, piece in enumerate(squares):
+            zobrist ^= Zobrist.PIECES[square][piece]
+        if player_to_move == Player.RED:
+            zobrist ^= Zobrist.RED_TO_MOVE
+        if blue_anticipating:
+            zobrist ^= Zobrist.BLUE_ANTICIPATING
+        if red_anticipating:
+            zobrist ^= Zobrist.RED_ANTICIPATING
+
+        return zobrist
+
+    @staticmethod
+    def _moved_zobrist(zobrist: int, squares: tuple[int, int],
+                       old_pieces: tuple[int, int], new_pieces: tuple[int, int],
+                       old_anticipations: tuple[bool, bool],
+                       new_anticipations: tuple[bool, bool]):
+        """
+        This obtains the hash after a move from the hash before it, by swapping
+        the keys of the two squares the move touched and toggling the keys of
+        the player to move and of the anticipation flags that changed.
+        """
+        pieces = Zobrist.PIECES
+        start, dest = squares
+        zobrist ^= (Zobrist.RED_TO_MOVE
+                    ^ pieces[start][old_pieces[0]] ^ pieces[start][new_pieces[0]]
+                    ^ pieces[dest][old_pieces[1]] ^ pieces[dest][new_pieces[1]])
+        if old_anticipations[0] != new_anticipations[0]:
+            zobrist ^= Zobrist.BLUE_ANTICIPATING
+        if old_anticipations[1] != new_anticipations[1]:
+            zobrist ^= Zobrist.RED_ANTICIPATING
+
+        return zobrist
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self.squares == other.squares
+                and self.player_to_move == other.player_to_move
+                and self.blue_anticipating == other.blue_anticipating
+                and self.red_anticipating == other.red_anticipating)
+
+    def __hash__(self):
+        # Boards moved with make() change their hash, so they should not be
+        # used as dictionary keys while being moved in place
+        return self.zobrist
+
+    @property
+    def matrix(self):
+        """
+        This is a nested list view of the flat squares, kept for printing and
+        for callers that index the board by row and column. Changes to the view
+        are not reflected in the board.
+        """
+        squares = self.squares
+        return [list(squares[i:i + Board.COLUMNS])
+                for i in range(0, len(squares), Board.COLUMNS)]
+
+    @matrix.setter
+    def matrix(self, matrix: list[list[int]]):
+        self.squares = bytearray(entry for row in matrix for entry in row)
+        self.locate_flags()
+        self.sum_values()
+
+    def locate_flags(self):
+        """
+        This finds the squares of both flags (-1 for a captured flag) after the
+        squares have been set wholesale, and clears the cached terminal status
+        and reward. Transitions update the flag squares from the move instead.
+        """
+        self.blue_flag, self.red_flag = find_unique_squares(
+            [Ranking.FLAG, Ranking.FLAG + Ranking.SPY], self.squares)
+        self._terminality = self._outcome = None
+
+    def sum_values(self):
+        """
+        This computes the blue and red components of the naive evaluation from
+        scratch after the squares have been set wholesale. Transitions update
+        them from the move instead.
+        """
+        self.blue_value = self.red_value = 0
+        for square, piece in enumerate(self.squares):
+            self.blue_value += SquareValues.BLUE[square][piece]
+            self.red_value += SquareValues.RED[square][piece]
+
+    @staticmethod
+    def _moved_values(values: tuple[int, int], squares: tuple[int, int],
+                      old_pieces: tuple[int, int], new_pieces: tuple[int, int]):
+        """
+        This obtains the blue and red evaluation components after a move from
+        the ones before it, by swapping the values of the pieces on the two
+        squares the move touched.
+        """
+        blue_values, red_values = SquareValues.BLUE, SquareValues.RED
+        start, dest = squares
+        blue_value = (values[0]
+                      - blue_values[start][old_pieces[0]]
+                      - blue_values[dest][old_pieces[1]]
+                      + blue_values[start][new_pieces[0]]
+                      + blue_values[dest][new_pieces[1]])
+        red_value = (values[1]
+                     - red_values[start][old_pieces[0]]
+                     - red_values[dest][old_pieces[1]]
+                     + red_values[start][new_pieces[0]]
+                     + red_values[dest][new_pieces[1]])
+
+        return blue_value, red_value
+
+    @staticmethod
+    def _moved_flag(flag_square: int, flag: int, squares: bytearray,
+                    start: int, dest: int):
+        """
+        This obtains the square of a flag after a move, given the squares after
+        the move. Only a flag on the start or destination square can be
+        affected, and it either ends up at the destination or is removed.
+        """
+        if flag_square not in (start, dest):
+            return flag_square
+        return dest if squares[dest] == flag else -1
+
+    @staticmethod
+    def _action_squares(action: int):
+        """
+        This looks up the start and destination indices of an action in the
+        flat squares. Action strings are accepted for callers at the human
+        boundary.
+        """
+        if action.__class__ is str:
+            action = Action.IDS[action]
+        return Action.ORIGINS[action], Action.DESTINATIONS[action]
 
     @staticmethod
     def get_piece_affiliation(piece: int):
@@ -287,7 +453,7 @@ class Board:
         """
         This checks if a particular piece is missing in the board's matrix.
         """
-        return not any(piece in row for row in self.matrix)
+        return piece not in self.squares
 
     @staticmethod
     def has_at_edge_column(column_number: int):
@@ -349,35 +515,48 @@ class Board:
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.DEBUG)
 
+        if self._terminality is not None:
+            return self._terminality
+
         terminality = False  # Initialize return value
 
-        blue_flag = Ranking.FLAG
-        red_flag = Ranking.FLAG + Ranking.SPY  # See ranking class for details
-        if (self.piece_not_found(blue_flag) or self.piece_not_found(red_flag)):
+        if self.blue_flag < 0 or self.red_flag < 0:
             terminality = True
+            self._terminality = terminality
             return terminality
 
-        blue_end = 0
-        red_end = -1  # The first and last row numbers, respectively
-        if blue_flag in self.matrix[red_end] and self.blue_anticipating:
+        blue_flag_column, red_flag_column = self._end_row_flag_columns()
+        if blue_flag_column >= 0 and self.blue_anticipating:
             # If the flag has already survived a turn in the board's red end
             terminality = True
-        elif blue_flag in self.matrix[red_end] and not self.blue_anticipating:
-            flag_column_number = self.matrix[red_end].index(blue_flag)
-            terminality = Board.has_none_adjacent(flag_column_number,
-                                                  self.matrix[red_end])
-        elif red_flag in self.matrix[blue_end] and self.red_anticipating:
+        elif blue_flag_column >= 0 and not self.blue_anticipating:
+            terminality = Board.has_none_adjacent(
+                blue_flag_column, self.squares[Board.RED_END:])
+        elif red_flag_column >= 0 and self.red_anticipating:
             # If the flag has already survived a turn in the board's blue end
             terminality = True
-        elif red_flag in self.matrix[blue_end] and not self.red_anticipating:
-            flag_column_number = self.matrix[blue_end].index(red_flag)
-            terminality = Board.has_none_adjacent(flag_column_number,
-                                                  self.matrix[blue_end])
+        elif red_flag_column >= 0 and not self.red_anticipating:
+            terminality = Board.has_none_adjacent(
+                red_flag_column, self.squares[:Board.COLUMNS])
         else:
             terminality = False
 
+        self._terminality = terminality
         return terminality
 
+    def _end_row_flag_columns(self):
+        """
+        This obtains the columns of the flags that have reached the opposing
+        end rows, with -1 for a flag that has not.
+        """
+        blue_flag_column = red_flag_column = -1
+        if self.blue_flag >= Board.RED_END:
+            blue_flag_column = self.blue_flag - Board.RED_END
+        if 0 <= self.red_flag < Board.COLUMNS:
+            red_flag_column = self.red_flag
+
+        return blue_flag_column, red_flag_column
+
     @staticmethod
     def get_piece_range(player: int):
         """
@@ -422,184 +601,316 @@ class Board:
         logger.setLevel(logging.DEBUG)
 
         valid_actions = []  # Initialize return value
-        bottom_row_number = leftmost_column_number = 0
-
-        for row in range(Board.ROWS):
-            for column in range(Board.COLUMNS):
-                entry = self.matrix[row][column]
-                # Define change in coordinates per direction (up, down, left,
-                # and right)
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                for direction in directions:
-                    direction_row, direction_column = direction
-                    new_row, new_column = (row + direction_row,
-                                           column + direction_column)
-
-                    if (bottom_row_number <= new_row < Board.ROWS
-                        and leftmost_column_number <= new_column < Board.COLUMNS
-                        and entry != Ranking.BLANK
-                        and self.is_allied_piece(entry)
-                            and self.not_allied_piece(
-                                self.matrix[new_row][new_column])):
-                        valid_actions.append(
-                            f"{row}{column}{new_row}{new_column}")
+        squares = self.squares
+        moves = Action.MOVES
+        # Blanks fall outside both piece ranges
+        piece_range_start, piece_range_end = Board.get_piece_range(
+            self.player_to_move)
+
+        for square, entry in enumerate(squares):
+            if not piece_range_start <= entry <= piece_range_end:
+                continue
+            # The moves of each square are listed in the up, down, left and
+            # right order, so the action ids come out sorted
+            for destination, action in moves[square]:
+                if not piece_range_start <= squares[destination] <= piece_range_end:
+                    valid_actions.append(action)
 
         return valid_actions
 
     @staticmethod
-    def remove_piece(board_matrix: list[list[int]], row: int,
-                     column: int):
+    def remove_piece(squares: bytearray, square: int):
         """
-        This removes a piece entry from a given board matrix.
+        This removes a piece entry from the given flat squares.
         """
-        board_matrix[row][column] = Ranking.BLANK
+        squares[square] = Ranking.BLANK
 
-        return board_matrix
+        return squares
 
-    def arbitrate_challenge(self, new_matrix: list[list[int]],
-                            action: str, challenger_value: int,
+    def arbitrate_challenge(self, new_squares: bytearray,
+                            action: int, challenger_value: int,
                             target_value: int):
         """
-        This reflects challenge moves in a new matrix by arbitrating the
+        This reflects challenge moves in new squares by arbitrating the
         relative values of the opposing pieces.
         """
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
+        start, dest = Board._action_squares(action)
         if challenger_value == Ranking.PRIVATE and target_value == Ranking.SPY:
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
-            return new_matrix
+            new_squares = self._move_piece_in_squares(new_squares, start, dest)
+            return new_squares
 
         if challenger_value == Ranking.SPY and target_value == Ranking.PRIVATE:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            return new_matrix
+            new_squares = self.remove_piece(new_squares, start)
+            return new_squares
 
         if (challenger_value > target_value
             or (challenger_value == Ranking.FLAG
                 and target_value == Ranking.FLAG)):
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
+            new_squares = self._move_piece_in_squares(new_squares, start, dest)
         elif challenger_value < target_value:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            return new_matrix
+            new_squares = self.remove_piece(new_squares, start)
+            return new_squares
         elif challenger_value == target_value:
-            new_matrix = self.remove_piece(new_matrix, start_row,
-                                           start_col)
-            new_matrix = self.remove_piece(new_matrix, dest_row,
-                                           dest_col)
-            return new_matrix
+            new_squares = self.remove_piece(new_squares, start)
+            new_squares = self.remove_piece(new_squares, dest)
+            return new_squares
 
-        return new_matrix
+        return new_squares
 
-    def _move_piece_in_matrix(self, new_matrix: list[list[int]],
-                              action: str):
+    def _move_piece_in_squares(self, new_squares: bytearray, start: int,
+                               dest: int):
         """
-        This reflects non-challenge moves in a new matrix by moving the selected
+        This reflects non-challenge moves in new squares by moving the selected
         piece in the presumably unoccupied destination square.
         """
+        new_squares[dest] = self.squares[start]
+        new_squares[start] = Ranking.BLANK
 
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        new_matrix[dest_row][dest_col] = (
-            self.matrix[start_row][start_col])
-        new_matrix[start_row][start_col] = Ranking.BLANK
-
-        return new_matrix
+        return new_squares
 
-    def transition(self, action: str, *args, **kwargs):
+    def _next_anticipations(self):
         """
-        This determines the next state based on the current state and the chosen
-        action.
+        This determines the anticipation flags of the board that follows the
+        current one, based on the flags in the end rows of the current board.
         """
-        _, _ = args, kwargs  # Stops the linter's complaints
+        player_anticipations = [False, False]  # Blue and red respectively
+        blue_flag_column, red_flag_column = self._end_row_flag_columns()
+        if (blue_flag_column >= 0 and not self.blue_anticipating
+            and not self.has_none_adjacent(
+                blue_flag_column, self.squares[Board.RED_END:])):
+            player_anticipations[0] = True
+        elif (red_flag_column >= 0 and not self.red_anticipating
+              and not self.has_none_adjacent(
+                  red_flag_column, self.squares[:Board.COLUMNS])):
+            player_anticipations[1] = True
 
-        # Initialize the new game state
-        new_matrix = copy.deepcopy(self.matrix)
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        piece_to_move = self.matrix[start_row][start_col]
-        destination_square = self.matrix[dest_row][dest_col]
+        return player_anticipations
+
+    def _resolve_action(self, new_squares: bytearray, action: int):
+        """
+        This reflects the action in the given squares, which are either a copy
+        of the board's squares or the board's own squares when moving in place.
+        """
+        start, dest = Board._action_squares(action)
+        piece_to_move = self.squares[start]
+        destination_square = self.squares[dest]
 
         if destination_square == Ranking.BLANK:
-            new_matrix = self._move_piece_in_matrix(new_matrix, action)
+            new_squares = self._move_piece_in_squares(new_squares, start, dest)
         elif self.player_to_move == Player.BLUE:
             # The Ranking.SPY offset allows the flattening of the board state
             # (see Ranking class for more details).
             red_piece_value = destination_square - Ranking.SPY
-            new_matrix = self.arbitrate_challenge(new_matrix, action,
-                                                  piece_to_move, red_piece_value
-                                                  )
+            new_squares = self.arbitrate_challenge(new_squares, action,
+                                                   piece_to_move, red_piece_value
+                                                   )
         elif self.player_to_move == Player.RED:
             red_piece_value = piece_to_move - Ranking.SPY
-            new_matrix = self.arbitrate_challenge(new_matrix, action,
-                                                  red_piece_value,
-                                                  destination_square
-                                                  )
-        blue_flag, red_flag = Ranking.FLAG, Ranking.FLAG + Ranking.SPY
-        player_anticipations = [False, False]  # Blue and red respectively
-        if (blue_flag in self.matrix[-1] and not self.blue_anticipating
-            and not self.has_none_adjacent(
-                self.matrix[-1].index(blue_flag), self.matrix[-1])):
-            player_anticipations[0] = True
-        elif (red_flag in self.matrix[0] and not self.red_anticipating
-              and not self.has_none_adjacent(
-                  self.matrix[0].index(red_flag), self.matrix[0]
-        )):
-            player_anticipations[1] = True
+            new_squares = self.arbitrate_challenge(new_squares, action,
+                                                   red_piece_value,
+                                                   destination_square
+                                                   )
+
+        return new_squares
+
+    def transition(self, action: int, *args, **kwargs):
+        """
+        This determines the next state based on the current state and the chosen
+        action.
+        """
+        _, _ = args, kwargs  # Stops the linter's complaints
+
+        # Initialize the new game state with a single slice copy
+        new_squares = self._resolve_action(self.squares[:], action)
+        player_anticipations = self._next_anticipations()
+
+        new_board = Board.__new__(Board)
+        new_board.squares = new_squares
+        new_board.player_to_move = (
+            Player.RED if self.player_to_move == Player.BLUE else Player.BLUE)
+        new_board.blue_anticipating, new_board.red_anticipating = (
+            player_anticipations)
+        start, dest = Board._action_squares(action)
+        new_board.blue_flag = Board._moved_flag(
+            self.blue_flag, Ranking.FLAG, new_squares, start, dest)
+        new_board.red_flag = Board._moved_flag(
+            self.red_flag, Ranking.FLAG + Ranking.SPY, new_squares, start, dest)
+        new_board._terminality = new_board._outcome = None
+        new_board.blue_value, new_board.red_value = Board._moved_values(
+            (self.blue_value, self.red_value), (start, dest),
+            old_pieces=(self.squares[start], self.squares[dest]),
+            new_pieces=(new_squares[start], new_squares[dest]))
+        new_board.zobrist = Board._moved_zobrist(
+            self.zobrist, (start, dest),
+            old_pieces=(self.squares[start], self.squares[dest]),
+            new_pieces=(new_squares[start], new_squares[dest]),
+            old_anticipations=(self.blue_anticipating, self.red_anticipating),
+            new_anticipations=player_anticipations)
+
+        return new_board
+
+    def evaluate_children(self, actions: list[int]):
+        """
+        This scores the children of the board for the given actions without
+        building them, returning a list each of their evaluations (as
+        evaluation() would return for each child), terminal flags and action
+        results.
+        """
+        blue_anticipating, red_anticipating = self._next_anticipations()
+        return evaluate_children(
+            self.squares, actions, Action.ORIGINS, Action.DESTINATIONS,
+            self.player_to_move == Player.BLUE, blue_anticipating,
+            red_anticipating, self.blue_flag, self.red_flag, self.blue_value,
+            self.red_value)
+
+    def copy(self):
+        """
+        This returns an independent board with the same state, for callers that
+        intend to move in place with make() and unmake().
+        """
+        board = Board.__new__(Board)
+        board.squares = self.squares[:]
+        board.player_to_move = self.player_to_move
+        board.blue_anticipating = self.blue_anticipating
+        board.red_anticipating = self.red_anticipating
+        board.zobrist = self.zobrist
+        board.blue_flag, board.red_flag = self.blue_flag, self.red_flag
+        board._terminality, board._outcome = self._terminality, self._outcome
+        board.blue_value, board.red_value = self.blue_value, self.red_value
+
+        return board
 
-        return Board(new_matrix, player_to_move=(
-            Player.RED if self.player_to_move == Player.BLUE else Player.BLUE),
-            blue_anticipating=player_anticipations[0],
-            red_anticipating=player_anticipations[1])
+    def make(self, action: int):
+        """
+        This applies the action to the board in place, and returns an undo
+        record of (start square, destination square, moved piece, piece at the
+        destination, player to move, blue_anticipating, red_anticipating,
+        zobrist, blue flag square, red flag square, cached terminality, cached
+        outcome, blue_value, red_value) from before the move. Passing the
+        record to unmake() restores the board.
+        """
+        start, dest = Board._action_squares(action)
+        undo = (start, dest, self.squares[start], self.squares[dest],
+                self.player_to_move, self.blue_anticipating,
+                self.red_anticipating, self.zobrist, self.blue_flag,
+                self.red_flag, self._terminality, self._outcome,
+                self.blue_value, self.red_value)
+
+        # The anticipations depend on the board before the move
+        player_anticipations = self._next_anticipations()
+        self._resolve_action(self.squares, action)
+        self.player_to_move = (Player.RED if self.player_to_move == Player.BLUE
+                               else Player.BLUE)
+        self.zobrist = Board._moved_zobrist(
+            self.zobrist, (start, dest), old_pieces=undo[2:4],
+            new_pieces=(self.squares[start], self.squares[dest]),
+            old_anticipations=undo[5:7], new_anticipations=player_anticipations)
+        self.blue_anticipating, self.red_anticipating = player_anticipations
+        self.blue_flag = Board._moved_flag(
+            self.blue_flag, Ranking.FLAG, self.squares, start, dest)
+        self.red_flag = Board._moved_flag(
+            self.red_flag, Ranking.FLAG + Ranking.SPY, self.squares, start, dest)
+        self._terminality = self._outcome = None
+        self.blue_value, self.red_value = Board._moved_values(
+            undo[12:14], (start, dest), old_pieces=undo[2:4],
+            new_pieces=(self.squares[start], self.squares[dest]))
+
+        return undo
+
+    def unmake(self, undo: tuple):
+        """
+        This reverts the move that produced the given undo record, which must
+        be the most recent move made on the board.
+        """
+        (start, dest, moved_piece, destination_piece, self.player_to_move,
+         self.blue_anticipating, self.red_anticipating, self.zobrist,
+         self.blue_flag, self.red_flag, self._terminality, self._outcome,
+         self.blue_value, self.red_value) = undo
+        self.squares[start] = moved_piece
+        self.squares[dest] = destination_piece
 
-    def _deduce_action_result(self, matrix_difference: list[list[int]],
-                              action: str):
+    @staticmethod
+    def _moved_result(moved_piece: int, destination_piece: int,
+                      new_destination_piece: int):
+        """
+        This classifies the result of a move from the pieces at its destination
+        square before and after it, since only the arbitrated winner (if any)
+        remains there.
+        """
+        if destination_piece == Ranking.BLANK:
+            return Result.OCCUPY
+        if new_destination_piece == moved_piece:
+            return Result.WIN
+        if new_destination_piece == destination_piece:
+            return Result.LOSS
+
+        return Result.DRAW
+
+    def transition_with_result(self, action: int):
+        """
+        This determines the next state as transition() does, along with the
+        result classification of the action, without diffing the boards.
         """
-        This examines the characteristics of the difference matrix to classify
-        the result of the action in the board state.
+        new_board = self.transition(action)
+        start, dest = Board._action_squares(action)
+        result = Board._moved_result(self.squares[start], self.squares[dest],
+                                     new_board.squares[dest])
+
+        return new_board, result
+
+    def made_action_result(self, undo: tuple):
+        """
+        This classifies the result of the move that produced the given undo
+        record while the move is still applied, as classify_action_result does
+        for transitions.
+        """
+        _, dest, moved_piece, destination_piece = undo[:4]
+
+        return Board._moved_result(moved_piece, destination_piece,
+                                   self.squares[dest])
+
+    def _deduce_action_result(self, squares_difference: list[int],
+                              action: int):
+        """
+        This examines the characteristics of the difference between the flat
+        squares to classify the result of the action in the board state.
         """
         result = None  # Initialize return value
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
-        challenger_value, target_value = (self.matrix[start_row][start_col],
-                                          self.matrix[dest_row][dest_col])
-        # Deduce the result based on the difference matrix' characteristics
-        if (matrix_difference[start_row][start_col] == challenger_value
-                and matrix_difference[dest_row][dest_col] == target_value):
+        start, dest = Board._action_squares(action)
+        challenger_value, target_value = (self.squares[start],
+                                          self.squares[dest])
+        # Deduce the result based on the difference' characteristics
+        if (squares_difference[start] == challenger_value
+                and squares_difference[dest] == target_value):
             result = Result.DRAW
-        elif (matrix_difference[start_row][start_col] == challenger_value
-              and (matrix_difference[dest_row][dest_col] == (
+        elif (squares_difference[start] == challenger_value
+              and (squares_difference[dest] == (
                 target_value - challenger_value
-                  ) and self.matrix[dest_row][dest_col] == Ranking.BLANK)
+                  ) and self.squares[dest] == Ranking.BLANK)
               ):
             result = Result.OCCUPY
-        elif (matrix_difference[start_row][start_col] == challenger_value
-              and (matrix_difference[dest_row][dest_col] == (
+        elif (squares_difference[start] == challenger_value
+              and (squares_difference[dest] == (
                 target_value - challenger_value
-                  ) and self.matrix[dest_row][dest_col] != Ranking.BLANK)
+                  ) and self.squares[dest] != Ranking.BLANK)
               ):
             result = Result.WIN
-        elif (matrix_difference[start_row][start_col] == challenger_value
-                and matrix_difference[dest_row][dest_col] == Ranking.BLANK):
+        elif (squares_difference[start] == challenger_value
+                and squares_difference[dest] == Ranking.BLANK):
             result = Result.LOSS
 
         return result
 
-    def classify_action_result(self, action: str, new_board: 'Board'):
+    def classify_action_result(self, action: int, new_board: 'Board'):
         """
         This classifies action results as DRAW, WIN, LOSS (for challenge moves)
         or OCCUPY (for non-challenge moves), for use of the Infostate class'
         transition function.
         """
-        matrix_difference = [
-            [self.matrix[i][j] - new_board.matrix[i][j]
-             for j in range(Board.COLUMNS)] for i in range(Board.ROWS)]
+        squares_difference = [
+            old - new for old, new in zip(self.squares, new_board.squares)]
 
-        return self._deduce_action_result(matrix_difference, action)
+        return self._deduce_action_result(squares_difference, action)
 
     def reward(self):
         """
@@ -609,34 +920,36 @@ class Board:
         move is red to obtain the actual reward.
         """
 
-        blue_flag = Ranking.FLAG
-        red_flag = Ranking.FLAG + Ranking.SPY  # See ranking class for details
-        blue_end = 0
-        red_end = -1  # The first and last row numbers, respectively
+        if self._outcome is not None:
+            return (-self._outcome if self.player_to_move == Player.RED
+                    else self._outcome)
+
         win_value = 1000000
+        blue_flag_column, red_flag_column = self._end_row_flag_columns()
 
         reward = 0  # Initialize return value
-        if self.piece_not_found(blue_flag):
+        if self.blue_flag < 0:
             reward = -win_value
-        elif self.piece_not_found(red_flag):
+        elif self.red_flag < 0:
             reward = win_value
-        elif (blue_flag in self.matrix[red_end] and not self.blue_anticipating
-              and Board.has_none_adjacent(self.matrix[red_end].index(blue_flag),
-                                          self.matrix[red_end])):
+        elif (blue_flag_column >= 0 and not self.blue_anticipating
+              and Board.has_none_adjacent(blue_flag_column,
+                                          self.squares[Board.RED_END:])):
             reward = win_value
-        elif blue_flag in self.matrix[red_end] and self.blue_anticipating:
+        elif blue_flag_column >= 0 and self.blue_anticipating:
             # If the flag has already survived a turn in the board's red end
             reward = win_value
-        elif (red_flag in self.matrix[blue_end] and not self.red_anticipating
-              and Board.has_none_adjacent(self.matrix[blue_end].index(red_flag),
-                                          self.matrix[blue_end])):
+        elif (red_flag_column >= 0 and not self.red_anticipating
+              and Board.has_none_adjacent(red_flag_column,
+                                          self.squares[:Board.COLUMNS])):
             reward = -win_value
-        elif red_flag in self.matrix[blue_end] and self.red_anticipating:
+        elif red_flag_column >= 0 and self.red_anticipating:
             # If the flag has already survived a turn in the board's blue end
             reward = -win_value
         else:
             reward = 0  # Assume a draw
 
+        self._outcome = reward  # Cached from blue's perspective
         if self.player_to_move == Player.RED:
             reward *= -1
 
@@ -653,12 +966,11 @@ class Board:
 
         red_offset = Ranking.SPY  # See Ranking class for details
 
-        for row in self.matrix:
-            for piece in row:
-                if Ranking.PRIVATE <= piece <= Ranking.SPY:
-                    blue_sum += piece
-                elif Ranking.PRIVATE + red_offset <= piece <= red_offset*2:
-                    red_sum += piece - red_offset
+        for piece in self.squares:
+            if Ranking.PRIVATE <= piece <= Ranking.SPY:
+                blue_sum += piece
+            elif Ranking.PRIVATE + red_offset <= piece <= red_offset*2:
+                red_sum += piece - red_offset
 
         advantage = blue_sum - red_sum
         if self.player_to_move == Player.RED:
@@ -674,6 +986,14 @@ class Board:
     def _in_red_range(piece: int):
         return Ranking.FLAG + Ranking.SPY <= piece <= Ranking.SPY*2
 
+    def flag_locations(self):
+        """
+        This returns the (row, column) locations of the blue and red flags, with
+        None for a captured flag, for use with the access point lookups.
+        """
+        return tuple(None if square < 0 else divmod(square, Board.COLUMNS)
+                     for square in (self.blue_flag, self.red_flag))
+
     def _get_blue_access_values(self, blue_flag_loc: tuple[int, int]):
         blue_access = AccessPointPieces()
 
@@ -681,7 +1001,8 @@ class Board:
 
         # If the blue flag is not at the last row, find the value of piece in front
         if blue_flag_loc[0] < Board.ROWS - 1:
-            front = self.matrix[blue_flag_loc[0] + 1][blue_flag_loc[1]]
+            front = self.squares[
+                (blue_flag_loc[0] + 1)*Board.COLUMNS + blue_flag_loc[1]]
             if Board._in_blue_range(front):
                 blue_access.front = front
             else:
@@ -689,7 +1010,8 @@ class Board:
 
         # If the blue flag is not at the first row, find the value of piece at the back
         if blue_flag_loc[0] > 0:
-            back = self.matrix[blue_flag_loc[0] - 1][blue_flag_loc[1]]
+            back = self.squares[
+                (blue_flag_loc[0] - 1)*Board.COLUMNS + blue_flag_loc[1]]
             if Board._in_blue_range(back):
                 blue_access.back = back
             else:
@@ -697,7 +1019,8 @@ class Board:
 
         # Find value of piece to the right (perspective of blue)
         if blue_flag_loc[1] > 0:
-            right = self.matrix[blue_flag_loc[0]][blue_flag_loc[1] - 1]
+            right = self.squares[
+                blue_flag_loc[0]*Board.COLUMNS + blue_flag_loc[1] - 1]
             if Board._in_blue_range(right):
                 blue_access.right = right
             else:
@@ -705,7 +1028,8 @@ class Board:
 
         # Find the value of piece to the left of blue flag
         if blue_flag_loc[1] < Board.COLUMNS - 1:
-            left = self.matrix[blue_flag_loc[0]][blue_flag_loc[1] + 1]
+            left = self.squares[
+                blue_flag_loc[0]*Board.COLUMNS + blue_flag_loc[1] + 1]
             if Board._in_blue_range(left):
                 blue_access.left = left
             else:
@@ -719,7 +1043,8 @@ class Board:
 
         # Find piece value in front of red flag (perspective of red)
         if red_flag_loc[0] > 0:
-            front = self.matrix[red_flag_loc[0] - 1][red_flag_loc[1]]
+            front = self.squares[
+                (red_flag_loc[0] - 1)*Board.COLUMNS + red_flag_loc[1]]
             if Board._in_red_range(front):
                 red_access.front = front - red_offset
             else:
@@ -727,7 +1052,8 @@ class Board:
 
         # Find piece value at the back of the red flag
         if red_flag_loc[0] < Board.ROWS - 1:
-            back = self.matrix[red_flag_loc[0] + 1][red_flag_loc[1]]
+            back = self.squares[
+                (red_flag_loc[0] + 1)*Board.COLUMNS + red_flag_loc[1]]
             if Board._in_red_range(back):
                 red_access.back = back - red_offset
             else:
@@ -735,7 +1061,8 @@ class Board:
 
         # Find piece value to the left of red flag (perspective of red)
         if red_flag_loc[1] > 0:
-            left = self.matrix[red_flag_loc[0]][red_flag_loc[1] - 1]
+            left = self.squares[
+                red_flag_loc[0]*Board.COLUMNS + red_flag_loc[1] - 1]
             if Board._in_red_range(left):
                 red_access.left = left - red_offset
             else:
@@ -743,7 +1070,8 @@ class Board:
 
         # Find piece value to the right of red flag
         if red_flag_loc[1] < Board.COLUMNS - 1:
-            right = self.matrix[red_flag_loc[0]][red_flag_loc[1] + 1]
+            right = self.squares[
+                red_flag_loc[0]*Board.COLUMNS + red_flag_loc[1] + 1]
             if Board._in_red_range(right):
                 red_access.right = right - red_offset
             else:
@@ -751,6 +1079,19 @@ class Board:
 
         return red_access
 
+    def access_values(self):
+        """
+        This obtains the pieces in front, at the back and to the sides of the
+        blue and red flags (see AccessPointPieces class), with None for a
+        captured flag.
+        """
+        blue_flag_loc, red_flag_loc = self.flag_locations()
+
+        return (None if blue_flag_loc is None
+                else self._get_blue_access_values(blue_flag_loc),
+                None if red_flag_loc is None
+                else self._get_red_access_values(red_flag_loc))
+
     def evaluation(self):
         """
         Attempts to assign a value to a given world state.
@@ -761,7 +1102,11 @@ class Board:
         if self.is_terminal():
             return self.reward()
 
-        advantage = fev.evaluation(self.matrix) # Use the Cython implementation
+        # The components are kept up to date by the transitions
+        advantage = self.blue_value - self.red_value
+        if Board.VERIFY_EVALUATION:
+            # Compare against the full computation
+            assert advantage == evaluation(self.squares)
         if self.player_to_move == Player.RED:
             advantage *= -1
 
@@ -788,6 +1133,106 @@ class Board:
         return squares_within_radius
 
 
+class Action:
+    """
+    This class contains the canonical integer encoding of actions. The ids 0 to
+    253 follow the order of TimelessBoard.actions(), which lists every move
+    from every square in the up, down, left and right order. Action strings
+    such as "2131" (start row, start column, destination row and destination
+    column) are only meant for the human and CSV boundaries.
+    """
+    STRINGS = []  # Action strings indexed by action id
+    COORDINATES = []  # (start row, start column, dest row, dest column)
+    ORIGINS = []  # Start square indices in the flat squares
+    DESTINATIONS = []  # Destination square indices in the flat squares
+    MOVES = [[] for _ in range(Board.SQUARES)]  # (destination, id) per square
+
+    for _row in range(Board.ROWS):
+        for _column in range(Board.COLUMNS):
+            for _direction_row, _direction_column in [(-1, 0), (1, 0),
+                                                      (0, -1), (0, 1)]:
+                _new_row = _row + _direction_row
+                _new_column = _column + _direction_column
+                if (0 <= _new_row < Board.ROWS
+                        and 0 <= _new_column < Board.COLUMNS):
+                    MOVES[_row*Board.COLUMNS + _column].append(
+                        (_new_row*Board.COLUMNS + _new_column, len(STRINGS)))
+                    STRINGS.append(f"{_row}{_column}{_new_row}{_new_column}")
+                    COORDINATES.append((_row, _column, _new_row, _new_column))
+                    ORIGINS.append(_row*Board.COLUMNS + _column)
+                    DESTINATIONS.append(_new_row*Board.COLUMNS + _new_column)
+    del _row, _column, _direction_row, _direction_column, _new_row, _new_column
+
+    COUNT = len(STRINGS)
+    IDS = {string: action for action, string in enumerate(STRINGS)}
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def to_id(action):
+        """
+        This converts an action string into its id, and passes ids through.
+        """
+        if isinstance(action, str):
+            return Action.IDS[action]
+        return action
+
+    @staticmethod
+    def to_string(action):
+        """
+        This converts an action id into its string, and passes strings through.
+        """
+        if isinstance(action, str):
+            return action
+        return Action.STRINGS[action]
+
+
+class SquareValues:
+    """
+    This class contains the contribution of each piece on each square to the
+    naive evaluation, as computed in full by fasteval. A piece is worth its
+    rank, plus its rank times a forward bonus of two per row advanced (up to
+    five rows). Flags and blanks are worth nothing. Red ranks are offset by
+    Ranking.SPY (see Ranking class for details).
+    """
+    FORWARD_WEIGHT = 2
+    MAX_FORWARD_ROWS = 5
+    BLUE = [[0]*(Ranking.SPY*2 + 1) for _ in range(Board.SQUARES)]
+    RED = [[0]*(Ranking.SPY*2 + 1) for _ in range(Board.SQUARES)]
+
+    for _square in range(Board.SQUARES):
+        _row = _square // Board.COLUMNS
+        for _rank in range(Ranking.PRIVATE, Ranking.SPY + 1):
+            BLUE[_square][_rank] = _rank*(1 + FORWARD_WEIGHT*min(
+                _row, MAX_FORWARD_ROWS))
+            RED[_square][_rank + Ranking.SPY] = _rank*(1 + FORWARD_WEIGHT*min(
+                Board.ROWS - 1 - _row, MAX_FORWARD_ROWS))
+    del _square, _row, _rank
+
+    def __init__(self):
+        pass
+
+
+class Zobrist:
+    """
+    This class contains the random keys for hashing boards and infostates.
+    Board keys are indexed by square and piece value, while infostate keys are
+    indexed by square and color*16 + rank floor (or rank ceiling).
+    """
+    PIECES = get_zobrist_keys(squares=Board.SQUARES,
+                              values=Ranking.SPY*2 + 1, seed=1)
+    FLOORS = get_zobrist_keys(squares=Board.SQUARES,
+                              values=(Player.RED + 1)*16, seed=2)
+    CEILINGS = get_zobrist_keys(squares=Board.SQUARES,
+                                values=(Player.RED + 1)*16, seed=3)
+    (RED_TO_MOVE, BLUE_ANTICIPATING, RED_ANTICIPATING, RED_OWNER,
+     ANTICIPATING) = get_zobrist_keys(squares=1, values=6, seed=4)[0][1:]
+
+    def __init__(self):
+        pass
+
+
 @dataclass
 class InfostatePiece:
     """
@@ -803,21 +1248,159 @@ class Infostate(Board):
     """
     This represents the current game state as seen by either of the players.
     """
+    __slots__ = ('colors', 'floors', 'ceilings', 'owner', 'anticipating',
+                 'flag', '_matrix', '_key', '_vector')
 
-    def __init__(self, abstracted_board: list[list[InfostatePiece]], owner: int,
-                 player_to_move: int, anticipating=bool):
+    def __init__(self, colors: bytearray, floors: bytearray,
+                 ceilings: bytearray, owner: int, player_to_move: int,
+                 anticipating: bool = False, zobrist: int = None):
         """
         In contrast to the arbiter board, the infostate must belong to strictly
         one of the players, and the value of the anticipating attribute depends
         on the location of the infostate owner's flag.
+
+        The pieces are stored as three parallel flat bytearrays indexed like the
+        squares of the arbiter board: the color of the piece on each square
+        (Player.ARBITER for blanks), and the lowest and highest ranks it can
+        have. The ranks are not offset for red pieces. Transitions copy the
+        arrays and change only the squares touched by the move.
+
+        The zobrist hash is computed from scratch unless it is provided, as
+        transitions do after updating it incrementally.
         """
-        super().__init__(matrix=None, player_to_move=player_to_move,
-                         blue_anticipating=False, red_anticipating=False)
+        self.colors, self.floors, self.ceilings = colors, floors, ceilings
         self.owner = owner
-        # Override attributes of the parent board class
-        self.matrix = Infostate.to_matrix(infostate_board=abstracted_board)
+        self.player_to_move = player_to_move
+        # The board's anticipation attributes do not apply to infostates
+        self.blue_anticipating = self.red_anticipating = False
         self.anticipating = anticipating
-        self.abstracted_board = abstracted_board
+        self.flag = Infostate._locate_flag(colors, floors, owner)
+        if zobrist is None:
+            zobrist = Infostate.compute_zobrist(colors, floors, ceilings,
+                                                owner, player_to_move,
+                                                anticipating)
+        self.zobrist = zobrist
+        self._matrix = self._key = self._vector = None  # Built on first access
+
+    @staticmethod
+    def _locate_flag(colors: bytearray, floors: bytearray, owner: int):
+        """
+        This finds the square of the infostate owner's flag, or -1 if it has
+        been captured. Only the owner's pieces have exact ranks.
+        """
+        for square, color in enumerate(colors):
+            if color == owner and floors[square] == Ranking.FLAG:
+                return square
+
+        return -1
+
+    @staticmethod
+    def _square_zobrist(square: int, color: int, floor: int, ceiling: int):
+        """
+        This obtains the hash contribution of a piece on the given square.
+        Blank squares contribute nothing.
+        """
+        color_offset = color*16
+        return (Zobrist.FLOORS[square][color_offset + floor]
+                ^ Zobrist.CEILINGS[square][color_offset + ceiling])
+
+    @staticmethod
+    def compute_zobrist(colors: bytearray, floors: bytearray,
+                        ceilings: bytearray, owner: int, player_to_move: int,
+                        anticipating: bool):
+        """
+        This computes the Zobrist hash of an infostate from scratch.
+        """
+        zobrist = 0
+        for square, color in enumerate(colors):
+            zobrist ^= Infostate._square_zobrist(square, color, floors[square],
+                                                 ceilings[square])
+        if player_to_move == Player.RED:
+            zobrist ^= Zobrist.RED_TO_MOVE
+        if owner == Player.RED:
+            zobrist ^= Zobrist.RED_OWNER
+        if anticipating:
+            zobrist ^= Zobrist.ANTICIPATING
+
+        return zobrist
+
+    @property
+    def key(self):
+        """
+        This is a canonical compact bytes key of the infostate, consisting of
+        the three arrays followed by the player to move, the owner and the
+        anticipating flag. It is built on first access.
+        """
+        if self._key is None:
+            self._key = b"".join((
+                self.colors, self.floors, self.ceilings,
+                bytes((self.player_to_move, self.owner,
+                       1 if self.anticipating else 0))))
+        return self._key
+
+    @property
+    def vector(self):
+        """
+        This is the tuple of 147 integers behind the infostate string: the
+        flattened matrix followed by the player to move, the owner and the
+        anticipating flag. It is built on first access, for serialization.
+        """
+        if self._vector is None:
+            self._vector = tuple(self.flatten()) + (
+                self.player_to_move, self.owner, 1 if self.anticipating else 0)
+        return self._vector
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.zobrist == other.zobrist and self.key == other.key
+
+    def __hash__(self):
+        return self.zobrist
+
+    @property
+    def matrix(self):
+        """
+        Unlike the arbiter board, each infostate entry is a [floor, ceiling]
+        pair, with red ranks offset by Ranking.SPY. The nested matrix is built
+        from the arrays on first access.
+        """
+        if self._matrix is None:
+            pairs = self._rank_pairs()
+            self._matrix = [pairs[i:i + Board.COLUMNS]
+                            for i in range(0, Board.SQUARES, Board.COLUMNS)]
+        return self._matrix
+
+    @property
+    def abstracted_board(self):
+        """
+        This is a nested view of the pieces as InfostatePiece objects, kept for
+        callers that index the infostate by row and column. Changes to the view
+        are not reflected in the infostate.
+        """
+        pieces = [InfostatePiece(color=color, rank_floor=floor,
+                                 rank_ceiling=ceiling)
+                  for color, floor, ceiling in zip(self.colors, self.floors,
+                                                   self.ceilings)]
+        return [pieces[i:i + Board.COLUMNS]
+                for i in range(0, Board.SQUARES, Board.COLUMNS)]
+
+    def _rank_pairs(self):
+        """
+        This lists the [floor, ceiling] pair of every square, with red ranks
+        offset by Ranking.SPY and blanks as [0, 0].
+        """
+        pairs = []
+        for color, floor, ceiling in zip(self.colors, self.floors,
+                                         self.ceilings):
+            if color == Player.RED:
+                pairs.append([floor + Ranking.SPY, ceiling + Ranking.SPY])
+            elif color == Player.BLUE:
+                pairs.append([floor, ceiling])
+            else:
+                pairs.append([0, 0])
+
+        return pairs
 
     def print_state(self, *args, **kwargs):
         """
@@ -827,181 +1410,94 @@ class Infostate(Board):
         printer = InfostatePrinter(params=StatePrinterParams(infostate=self))
         printer.print_state()
 
-    @staticmethod
-    def to_matrix(infostate_board: list[list[InfostatePiece]]):
-        """
-        Converts a 2D list of InfostatePiece objects into a matrix 
-        representation. Each element in the resulting matrix is a list of two 
-        integers representing the rank floor and rank ceiling of the piece. The 
-        values are adjusted based on the color of the piece:
-        - For Player.BLUE, the rank floor and rank ceiling are used as-is.
-        - For Player.RED, the rank floor and rank ceiling are incremented by the
-          value of Ranking.SPY.
-        Args:
-            infostate_board (list[list[InfostatePiece]]): A 2D list representing 
-            the board state, where each element is an InfostatePiece object.
-        Returns:
-            list[list[list[int]]]: A 2D matrix where each element is a list of 
-            two integers representing the rank floor and rank ceiling of the 
-            piece.
-        """
-
-        infostate_matrix = [[[0, 0] for col in range(Board.COLUMNS)]
-                            for row in range(Board.ROWS)]
-        for i, row in enumerate(infostate_board):
-            for j, piece in enumerate(row):
-                if piece.color == Player.BLUE:
-                    infostate_matrix[i][j] = [piece.rank_floor,
-                                              piece.rank_ceiling]
-                elif piece.color == Player.RED:
-                    infostate_matrix[i][j] = [piece.rank_floor + Ranking.SPY,
-                                              piece.rank_ceiling + Ranking.SPY]
-
-        return infostate_matrix
-
     @staticmethod
     def at_start(owner: int, board: Board) -> 'Infostate':
         """
         This creates the starting infostate for either of the players.
         """
-        infostate_board = copy.deepcopy(board.matrix)  # Initialize the board
+        # Blank squares are left with the arbiter color and zero ranks
+        colors, floors, ceilings = (bytearray(Board.SQUARES),
+                                    bytearray(Board.SQUARES),
+                                    bytearray(Board.SQUARES))
         opponent = (Player.RED if owner == Player.BLUE else Player.BLUE)
         offset = 0 if owner == Player.BLUE else Ranking.SPY  # For red pieces
-        for i, row in enumerate(board.matrix):
-            for j, entry in enumerate(row):
-                # Set initial value bounds for the pieces
-                if entry == Ranking.BLANK:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=Player.ARBITER, rank_floor=Ranking.BLANK,
-                        rank_ceiling=Ranking.BLANK)
-                elif Infostate.get_piece_affiliation(piece=entry) == owner:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=owner, rank_floor=entry - offset,
-                        rank_ceiling=entry - offset
-                    )
-                elif Infostate.get_piece_affiliation(piece=entry) != owner:
-                    infostate_board[i][j] = InfostatePiece(
-                        color=opponent, rank_floor=Ranking.FLAG,
-                        rank_ceiling=Ranking.SPY
-                    )
-
-        return Infostate(abstracted_board=infostate_board, owner=owner,
-                         player_to_move=Player.BLUE, anticipating=False)
-
-    @staticmethod
-    def _remove_piece(board: list[list[InfostatePiece]],
-                      entry_location: tuple[int]):
-        entry_row, entry_col = entry_location
-
-        board[entry_row][entry_col] = InfostatePiece(color=Player.ARBITER,
-                                                     rank_floor=Ranking.BLANK,
-                                                     rank_ceiling=Ranking.BLANK)
+        for square, entry in enumerate(board.squares):
+            # Set initial value bounds for the pieces
+            if entry == Ranking.BLANK:
+                continue
+            if Infostate.get_piece_affiliation(piece=entry) == owner:
+                colors[square] = owner
+                floors[square] = ceilings[square] = entry - offset
+            else:
+                colors[square] = opponent
+                floors[square], ceilings[square] = Ranking.FLAG, Ranking.SPY
 
-        return board
+        return Infostate(colors=colors, floors=floors, ceilings=ceilings,
+                         owner=owner, player_to_move=Player.BLUE,
+                         anticipating=False)
 
     @staticmethod
-    def _remove_pieces(board: list[list[InfostatePiece]],
-                       locs: tuple[tuple[int]]):
-        start_row, start_col = locs[0]
-        dest_row, dest_col = locs[1]
-
-        matrix = Infostate._remove_piece(board=board, entry_location=(
-            start_row,
-            start_col))
-        matrix = Infostate._remove_piece(board=board, entry_location=(
-            dest_row,
-            dest_col
-        ))
-        return matrix
-
-    def _move_piece(self, board: list[list[InfostatePiece]],
-                    start: tuple[int], end: tuple[int]):
-        """
-        This reflects a move in an infostate in an infostate matrix.
-        """
-        start_row, start_col = start[0], start[1]
-        dest_row, dest_col = end[0], end[1]
-
-        board[dest_row][dest_col].rank_floor = board[
-            start_row][start_col].rank_floor
-        board[dest_row][dest_col].rank_ceiling = board[
-            start_row][start_col].rank_ceiling
-        board[dest_row][dest_col].color = board[start_row][
-            start_col].color
-        board[start_row][start_col] = InfostatePiece(color=Player.ARBITER,
-                                                     rank_floor=Ranking.BLANK,
-                                                     rank_ceiling=Ranking.BLANK)
-
-        return board
-
-    def _piece_is_owned(self, row: int, col: int):
+    def _remove_piece(pieces: tuple[bytearray, bytearray, bytearray],
+                      square: int):
         """
-        Determines if the piece at the specified row and column in the infostate 
-        belongs to the owner of the infostate.
+        This blanks a square in copies of the infostate arrays.
         """
-        return self.abstracted_board[row][col].color == self.owner
+        for array in pieces:
+            array[square] = Ranking.BLANK
 
     @staticmethod
-    def _update_val(board: list[list[InfostatePiece]], to_update: tuple[int],
-                    source: tuple[int]):
+    def _move_piece(pieces: tuple[bytearray, bytearray, bytearray],
+                    start: int, dest: int):
         """
-        This sets a new value to the range of an unidentified piece in a copy of 
-        the infostate piece board. This value is calculated from the value of 
-        the associated opposing piece involved in the action.
+        This reflects a move in copies of the infostate arrays.
         """
+        for array in pieces:
+            array[dest] = array[start]
+            array[start] = Ranking.BLANK
 
-        update_row, update_col, source_row, source_col = (to_update[0],
-                                                          to_update[1],
-                                                          source[0], source[1])
-
-        # Deal with the SPY vs PRIVATE edge cases
-        if board[source_row][source_col].rank_floor == Ranking.SPY:
-            board[update_row][update_col].rank_floor = Ranking.PRIVATE
-            board[update_row][update_col].rank_ceiling = Ranking.PRIVATE
-        else:
-            board[update_row][update_col].rank_floor = (
-                board[source_row][source_col].rank_ceiling + 1)
-
-        return board
-
-    def _find_flag(self, board: list[list[InfostatePiece]]):
+    @staticmethod
+    def _update_val(pieces: tuple[bytearray, bytearray, bytearray],
+                    to_update: int, source: int):
         """
-        This finds the infostate owner's flag, useful for setting the
-        anticipating attribute.
+        This sets a new value to the range of an unidentified piece in copies of
+        the infostate arrays. This value is calculated from the value of the
+        associated opposing piece involved in the action.
         """
-        for i, row in enumerate(board):
-            for j, piece in enumerate(row):
-                if (piece.color == self.owner
-                        and piece.rank_floor == Ranking.FLAG):
-                    return (i, j)
+        _, floors, ceilings = pieces
 
-        return None
+        # Deal with the SPY vs PRIVATE edge cases
+        if floors[source] == Ranking.SPY:
+            floors[to_update] = ceilings[to_update] = Ranking.PRIVATE
+        else:
+            floors[to_update] = ceilings[source] + 1
 
     @staticmethod
-    def _is_vacant(column_number: int, end_row: list[InfostatePiece], direction: int):
+    def _is_vacant(column_number: int, end_row: bytes, direction: int):
         """
-        Checks if the square in the given direction of a column in a row is blank.
+        Checks if the square in the given direction of a column in a row of
+        colors is blank.
         """
-        return end_row[column_number + direction].color == Player.ARBITER
+        return end_row[column_number + direction] == Player.ARBITER
 
     @staticmethod
-    def is_vacant_to_the_right(column_number: int, end_row: list[InfostatePiece]):
+    def is_vacant_to_the_right(column_number: int, end_row: bytes):
         """
         Checks if the square to the right of a given column in a row is blank.
         """
         return Infostate._is_vacant(column_number, end_row, direction=1)
 
     @staticmethod
-    def is_vacant_to_the_left(column_number: int, end_row: list[InfostatePiece]):
+    def is_vacant_to_the_left(column_number: int, end_row: bytes):
         """
         Checks if the square to the left of a given column in a row is blank.
         """
         return Infostate._is_vacant(column_number, end_row, direction=-1)
 
     @staticmethod
-    def has_none_adjacent(column_number: int, end_row: list[InfostatePiece]):
+    def has_none_adjacent(column_number: int, end_row: bytes):
         """
-        This checks if a given column in a row has blank square neighbors.
+        This checks if a given column in a row of colors has blank square
+        neighbors.
         """
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.DEBUG)
@@ -1029,121 +1525,296 @@ class Infostate(Board):
         This enumerates the possible actions of the player to move in the game
         state.
         """
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
-
         valid_actions = []  # Initialize return value
-        bottom_row_number = leftmost_column_number = 0
-
-        for row in range(Infostate.ROWS):
-            for column in range(Infostate.COLUMNS):
-                entry = self.abstracted_board[row][column]
-                # Define change in coordinates per direction (up, down, left,
-                # and right)
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                for direction in directions:
-                    direction_row, direction_column = direction
-                    new_row, new_column = (row + direction_row,
-                                           column + direction_column)
-
-                    if (bottom_row_number <= new_row < Infostate.ROWS
-                        and leftmost_column_number <= new_column < Infostate.COLUMNS
-                        and entry.color != Player.ARBITER
-                        and entry.color == self.player_to_move
-                            and self.abstracted_board[
-                                new_row][new_column].color != self.player_to_move):
-                        valid_actions.append(
-                            f"{row}{column}{new_row}{new_column}")
+        player_to_move = self.player_to_move
+        colors = self.colors
+
+        for square, color in enumerate(colors):
+            if color != player_to_move:
+                continue
+            # The moves are listed in the up, down, left and right order
+            for destination, action in Action.MOVES[square]:
+                if colors[destination] != player_to_move:
+                    valid_actions.append(action)
 
         return valid_actions
 
-    def transition(self, action: str, *args, **kwargs):
+    def transition(self, action: int, *args, **kwargs):
         """
         This obtains the next infostate based on the provided action and the
         result classification of the action.
         """
         _ = args  # Stops the linter's complaints
-        new_board = copy.deepcopy(self.abstracted_board)
-        start_row, start_col, dest_row, dest_col = (
-            map(int, action)
-        )
+        start, dest = Board._action_squares(action)
+        pieces = colors, floors, ceilings = (
+            self.colors[:], self.floors[:], self.ceilings[:])
         # Find the action's result in the keyword arguments
         result = kwargs['result'] if 'result' in kwargs else None
+        owned_start = self.colors[start] == self.owner
+        owned_dest = self.colors[dest] == self.owner
 
         if result == Result.DRAW:
-            new_board = Infostate._remove_pieces(board=new_board, locs=(
-                (start_row, start_col), (dest_row, dest_col)))
-
-        elif (result == Result.WIN
-              and self._piece_is_owned(row=start_row, col=start_col)):
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
-
-        elif (result == Result.WIN
-              and not self._piece_is_owned(row=start_row, col=start_col)):
-            new_board = Infostate._update_val(board=new_board,
-                                              to_update=(start_row, start_col),
-                                              source=(dest_row, dest_col))
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
+            Infostate._remove_piece(pieces, start)
+            Infostate._remove_piece(pieces, dest)
+
+        elif result == Result.WIN and owned_start:
+            Infostate._move_piece(pieces, start, dest)
+
+        elif result == Result.WIN and not owned_start:
+            Infostate._update_val(pieces, to_update=start, source=dest)
+            Infostate._move_piece(pieces, start, dest)
 
         elif result == Result.OCCUPY:
-            new_board = self._move_piece(board=new_board, start=(
-                start_row, start_col), end=(dest_row, dest_col))
-
-        elif (result == Result.LOSS
-              and self._piece_is_owned(dest_row, dest_col)):
-            new_board = Infostate._remove_piece(
-                board=new_board, entry_location=(start_row, start_col))
-
-        elif (result == Result.LOSS
-              and not self._piece_is_owned(row=dest_row, col=dest_col)):
-            new_board = Infostate._update_val(board=new_board,
-                                              to_update=(dest_row, dest_col),
-                                              source=(start_row, start_col))
-            new_board = Infostate._remove_piece(
-                board=new_board, entry_location=(start_row, start_col))
+            Infostate._move_piece(pieces, start, dest)
+
+        elif result == Result.LOSS and owned_dest:
+            Infostate._remove_piece(pieces, start)
+
+        elif result == Result.LOSS and not owned_dest:
+            Infostate._update_val(pieces, to_update=dest, source=start)
+            Infostate._remove_piece(pieces, start)
+
+        # Only a flag on the start or destination square can be affected
+        flag = self.flag
+        if flag in (start, dest):
+            flag = (dest if colors[dest] == self.owner
+                    and floors[dest] == Ranking.FLAG else -1)
 
         anticipation = self.anticipating
-        flag_loc = self._find_flag(board=new_board)
-        if flag_loc is None:
+        if flag < 0:
             anticipation = False
-        elif (self.owner == Player.BLUE and flag_loc[0] == Infostate.ROWS - 1
+        elif (self.owner == Player.BLUE and flag >= Board.RED_END
               and not self.anticipating
-              and self.has_none_adjacent(column_number=flag_loc[1],
-                                         end_row=new_board[-1])):
+              and self.has_none_adjacent(column_number=flag - Board.RED_END,
+                                         end_row=colors[Board.RED_END:])):
             anticipation = True
-        elif (self.owner == Player.RED and flag_loc[0] == 0
+        elif (self.owner == Player.RED and flag < Board.COLUMNS
               and not self.anticipating
-              and self.has_none_adjacent(column_number=flag_loc[1],
-                                         end_row=new_board[0])):
+              and self.has_none_adjacent(column_number=flag,
+                                         end_row=colors[:Board.COLUMNS])):
             anticipation = True
 
-        return Infostate(abstracted_board=new_board, owner=self.owner,
-                         player_to_move=(
-                             Player.RED if self.player_to_move == Player.BLUE
-                             else Player.BLUE), anticipating=anticipation)
+        # Only the start and destination squares can change
+        zobrist = self.zobrist ^ Zobrist.RED_TO_MOVE
+        for square in (start, dest):
+            zobrist ^= (
+                Infostate._square_zobrist(square, self.colors[square],
+                                          self.floors[square],
+                                          self.ceilings[square])
+                ^ Infostate._square_zobrist(square, colors[square],
+                                            floors[square], ceilings[square]))
+        if anticipation != self.anticipating:
+            zobrist ^= Zobrist.ANTICIPATING
+
+        new_infostate = Infostate.__new__(Infostate)
+        new_infostate.colors, new_infostate.floors, new_infostate.ceilings = (
+            pieces)
+        new_infostate.owner = self.owner
+        new_infostate.player_to_move = (
+            Player.RED if self.player_to_move == Player.BLUE else Player.BLUE)
+        new_infostate.blue_anticipating = new_infostate.red_anticipating = False
+        new_infostate.anticipating = anticipation
+        new_infostate.flag = flag
+        new_infostate.zobrist = zobrist
+        new_infostate._matrix = new_infostate._key = new_infostate._vector = None
+
+        return new_infostate
 
     def flatten(self):
         """
         This converts the infostate matrix to a list.
         """
         flattened = [
-            rank_range for row in self.matrix
-            for piece in row for rank_range in piece]
+            rank_range for pair in self._rank_pairs() for rank_range in pair]
 
         return flattened
 
     def __str__(self):
-        flattened_matrix = self.flatten()
-        flattened_matrix.append(self.player_to_move)
-        flattened_matrix.append(self.owner)
-        if self.anticipating:
-            flattened_matrix.append(1)
-        else:
-            flattened_matrix.append(0)
+        return " ".join(map(str, self.vector))
 
-        return " ".join(list(map(str, flattened_matrix)))
+
+class RankBeliefs:
+    """
+    This tracks the ranks that each opponent piece of an infostate can still
+    have, as a bitmask with bit rank - 1 set for every possible rank. Challenges
+    narrow a mask with a single bitwise and, and once all the pieces of a rank
+    are identified (see Ranking.SORTED_FORMATION for the counts), that rank is
+    ruled out for every other opponent piece. This gives tighter rank bounds
+    than the [floor, ceiling] intervals of the infostate.
+    """
+    __slots__ = ('owner', 'masks', 'captured')
+
+    FULL = (1 << Ranking.SPY) - 1  # Any rank from Ranking.FLAG to Ranking.SPY
+    COUNTS = [Ranking.SORTED_FORMATION.count(rank)
+              for rank in range(Ranking.SPY + 1)]
+    COUNTS[Ranking.BLANK] = 0
+    # Masks of the opponent ranks consistent with each result, indexed by
+    # result and by the rank of the owner's piece involved in the challenge
+    AS_CHALLENGER = [[0]*(Ranking.SPY + 1) for _ in range(Result.LOSS + 1)]
+    AS_DEFENDER = [[0]*(Ranking.SPY + 1) for _ in range(Result.LOSS + 1)]
+
+    for _owned in range(Ranking.FLAG, Ranking.SPY + 1):
+        for _rank in range(Ranking.FLAG, Ranking.SPY + 1):
+            # The results are seen from the challenger's side
+            for _table, _challenger, _defender in [
+                    (AS_CHALLENGER, _rank, _owned),
+                    (AS_DEFENDER, _owned, _rank)]:
+                if defeats(_challenger, _defender):
+                    _result = Result.WIN
+                elif _challenger == _defender:
+                    _result = Result.DRAW
+                else:
+                    _result = Result.LOSS
+                _table[_result][_owned] |= 1 << (_rank - 1)
+    del _owned, _rank, _table, _challenger, _defender, _result
+
+    def __init__(self, owner: int, masks: list[int],
+                 captured: bytearray = None):
+        """
+        The masks are indexed like the squares of the arbiter board, and are
+        zero on squares without an opponent piece. The captured counts are of
+        the opponent pieces that were identified before being removed, indexed
+        by rank.
+        """
+        self.owner = owner
+        self.masks = masks
+        if captured is None:
+            captured = bytearray(Ranking.SPY + 1)
+        self.captured = captured
+
+    @staticmethod
+    def from_infostate(infostate: Infostate) -> 'RankBeliefs':
+        """
+        This creates the beliefs from the rank intervals of an infostate.
+        """
+        masks = [0]*Board.SQUARES
+        for square, color in enumerate(infostate.colors):
+            if color not in (infostate.owner, Player.ARBITER):
+                # Bits floor - 1 to ceiling - 1
+                masks[square] = ((1 << infostate.ceilings[square])
+                                 - (1 << (infostate.floors[square] - 1)))
+        beliefs = RankBeliefs(owner=infostate.owner, masks=masks)
+        for rank in range(Ranking.FLAG, Ranking.SPY + 1):
+            RankBeliefs._propagate(masks, beliefs.captured, rank)
+
+        return beliefs
+
+    @staticmethod
+    def is_identified(mask: int):
+        """
+        This checks if a mask allows exactly one rank.
+        """
+        return mask != 0 and mask & (mask - 1) == 0
+
+    @staticmethod
+    def _propagate(masks: list[int], captured: bytearray, rank: int):
+        """
+        This rules out a rank for the unidentified pieces once all the pieces
+        of that rank are identified, and repeats for any piece identified in
+        the process.
+        """
+        bit = 1 << (rank - 1)
+        if captured[rank] + masks.count(bit) < RankBeliefs.COUNTS[rank]:
+            return
+        for square, mask in enumerate(masks):
+            if mask & bit and mask != bit:
+                masks[square] = mask = mask & ~bit
+                if RankBeliefs.is_identified(mask):
+                    RankBeliefs._propagate(masks, captured, mask.bit_length())
+
+    @staticmethod
+    def _narrow(masks: list[int], captured: bytearray, square: int,
+                allowed: int):
+        """
+        This keeps only the allowed ranks of the piece on a square.
+        """
+        mask = masks[square]
+        masks[square] = narrowed = mask & allowed
+        if narrowed != mask and RankBeliefs.is_identified(narrowed):
+            RankBeliefs._propagate(masks, captured, narrowed.bit_length())
+
+    @staticmethod
+    def _capture(masks: list[int], captured: bytearray, square: int):
+        """
+        This removes an opponent piece, keeping count of it if it was
+        identified.
+        """
+        if RankBeliefs.is_identified(masks[square]):
+            captured[masks[square].bit_length()] += 1
+        masks[square] = 0
+
+    def transition(self, infostate: Infostate, action: int, result: int):
+        """
+        This obtains the beliefs after an action, given the infostate before
+        the action and the result classification of the action.
+        """
+        start, dest = Board._action_squares(action)
+        masks, captured = self.masks[:], self.captured[:]
+        owned_start = infostate.colors[start] == self.owner
+        owned_dest = infostate.colors[dest] == self.owner
+
+        if owned_start:
+            # The owner's piece challenged the opponent piece, if any
+            if result != Result.OCCUPY:
+                allowed = RankBeliefs.AS_DEFENDER[result][
+                    infostate.floors[start]]
+                RankBeliefs._narrow(masks, captured, dest, allowed)
+            if result in (Result.WIN, Result.DRAW):
+                RankBeliefs._capture(masks, captured, dest)
+        else:
+            if owned_dest:
+                allowed = RankBeliefs.AS_CHALLENGER[result][
+                    infostate.floors[dest]]
+                RankBeliefs._narrow(masks, captured, start, allowed)
+            if result in (Result.WIN, Result.OCCUPY):
+                masks[dest], masks[start] = masks[start], 0
+            else:
+                RankBeliefs._capture(masks, captured, start)
+
+        return RankBeliefs(owner=self.owner, masks=masks, captured=captured)
+
+    def rank_bounds(self, square: int):
+        """
+        This obtains the lowest and highest possible ranks of the opponent
+        piece on a square.
+        """
+        mask = self.masks[square]
+        return (mask & -mask).bit_length(), mask.bit_length()
+
+    def narrowed(self, infostate: Infostate) -> Infostate:
+        """
+        This obtains the infostate with the rank intervals of the opponent
+        pieces tightened to the beliefs. The infostate itself is returned if
+        none of them change, and otherwise only the changed squares are copied
+        into its hash.
+        """
+        floors = ceilings = None
+        zobrist = infostate.zobrist
+        for square, mask in enumerate(self.masks):
+            if not mask:
+                continue
+            floor, ceiling = self.rank_bounds(square)
+            old_floor, old_ceiling = (infostate.floors[square],
+                                      infostate.ceilings[square])
+            floor, ceiling = max(floor, old_floor), min(ceiling, old_ceiling)
+            if (floor, ceiling) == (old_floor, old_ceiling):
+                continue
+            if floors is None:
+                floors, ceilings = infostate.floors[:], infostate.ceilings[:]
+            color = infostate.colors[square]
+            zobrist ^= (Infostate._square_zobrist(square, color, old_floor,
+                                                  old_ceiling)
+                        ^ Infostate._square_zobrist(square, color, floor,
+                                                    ceiling))
+            floors[square], ceilings[square] = floor, ceiling
+
+        if floors is None:
+            return infostate
+
+        return Infostate(colors=infostate.colors[:], floors=floors,
+                         ceilings=ceilings, owner=infostate.owner,
+                         player_to_move=infostate.player_to_move,
+                         anticipating=infostate.anticipating, zobrist=zobrist)
 
 
 @dataclass
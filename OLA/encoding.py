@@ -0,0 +1,96 @@
+"""
+This contains the encoding of infostates into NumPy arrays for model training
+and inference. NumPy is only needed when this module or the CFR trainers
+are used.
+"""
+
+import numpy as np
+
+from OLA.core import Board, Infostate, Player
+from OLA.constants import Ranking
+
+# The flattened [floor, ceiling] pairs, then the player to move, the owner and
+# the anticipating flag, as in the infostate string
+FLAT_WIDTH = Board.SQUARES*2 + 3
+# The rank floors and the rank ceilings as two planes of the board
+PLANES_SHAPE = (2, Board.ROWS, Board.COLUMNS)
+# Length of Infostate.key: three arrays of squares and three trailing values
+KEY_WIDTH = Board.SQUARES*3 + 3
+
+
+def _key_matrix(infostates: list[Infostate]):
+    """
+    This stacks the cached keys of the infostates into an (N, KEY_WIDTH)
+    array of bytes, and splits it into the colors, floors, ceilings and
+    trailing values. Red ranks are offset by Ranking.SPY as in the infostate
+    matrix.
+    """
+    keys = np.frombuffer(b"".join([infostate.key for infostate in infostates]),
+                         dtype=np.uint8).reshape(len(infostates), KEY_WIDTH)
+    colors = keys[:, :Board.SQUARES]
+    offsets = np.where(colors == Player.RED, Ranking.SPY, 0).astype(np.uint8)
+    floors = keys[:, Board.SQUARES:Board.SQUARES*2] + offsets
+    ceilings = keys[:, Board.SQUARES*2:Board.SQUARES*3] + offsets
+
+    return floors, ceilings, keys[:, Board.SQUARES*3:]
+
+
+def _prepare_output(infostates, out: np.ndarray, shape: tuple[int],
+                    dtype):
+    """
+    This normalizes the infostates into a list, and checks or allocates the
+    output array of the given per-infostate shape.
+    """
+    single = isinstance(infostates, Infostate)
+    if single:
+        infostates = [infostates]
+    else:
+        infostates = list(infostates)
+
+    if out is None:
+        out = np.empty((len(infostates),) + shape, dtype=dtype)
+    elif single and out.shape == shape:
+        out = out[np.newaxis]
+    elif out.shape[1:] != shape or out.shape[0] < len(infostates):
+        raise ValueError(
+            f"Expected an output array of shape (>={len(infostates)}, "
+            f"{', '.join(map(str, shape))}), got {out.shape}")
+
+    return infostates, out, single
+
+
+def encode_flat(infostates, out: np.ndarray = None, dtype=np.float32):
+    """
+    This writes infostates into rows of FLAT_WIDTH values, matching the
+    integers of the infostate string. A single infostate gives a single row,
+    while N infostates fill the first N rows of the output. The output can be
+    preallocated and reused across batches.
+    """
+    infostates, out, single = _prepare_output(infostates, out, (FLAT_WIDTH,),
+                                              dtype)
+    count = len(infostates)
+    if count:
+        floors, ceilings, trailing = _key_matrix(infostates)
+        out[:count, 0:Board.SQUARES*2:2] = floors
+        out[:count, 1:Board.SQUARES*2:2] = ceilings
+        out[:count, Board.SQUARES*2:] = trailing
+
+    return out[0] if single else out[:count]
+
+
+def encode_planes(infostates, out: np.ndarray = None, dtype=np.float32):
+    """
+    This writes infostates into PLANES_SHAPE arrays, with the rank floors in
+    the first plane and the rank ceilings in the second. This is the channel
+    first layout of the convolutional model. A single infostate gives a
+    single array, while N infostates fill the first N entries of the output.
+    """
+    infostates, out, single = _prepare_output(infostates, out, PLANES_SHAPE,
+                                              dtype)
+    count = len(infostates)
+    if count:
+        floors, ceilings, _ = _key_matrix(infostates)
+        out[:count, 0] = floors.reshape(count, Board.ROWS, Board.COLUMNS)
+        out[:count, 1] = ceilings.reshape(count, Board.ROWS, Board.COLUMNS)
+
+    return out[0] if single else out[:count]
@@ -5,27 +5,158 @@ cdef int PRIVATE = 2
 cdef int SPY = 15
 cdef int RED_OFFSET = SPY
 cdef int BOARD_ROWS = 8
+cdef int BOARD_COLUMNS = 9
 cdef int FORWARD_WEIGHT = 2
 
-cpdef int evaluation(list matrix):
+cpdef int evaluation(const unsigned char[::1] squares):
     cdef int blue_sum = 0
     cdef int red_sum = 0
-    cdef int i, j, piece
+    cdef int square, i, piece, piece_val
     cdef int forward_bonus
 
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            piece = matrix[i][j]
+    for square in range(squares.shape[0]):
+        piece = squares[square]
+        i = square // BOARD_COLUMNS  # Row of the square
 
-            if PRIVATE <= piece <= SPY:
-                blue_sum += piece
-                forward_bonus = min(i * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT)
-                blue_sum += forward_bonus * piece
+        if PRIVATE <= piece <= SPY:
+            blue_sum += piece
+            forward_bonus = min(i * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT)
+            blue_sum += forward_bonus * piece
 
-            elif PRIVATE + RED_OFFSET <= piece <= 2 * RED_OFFSET:
-                piece_val = piece - RED_OFFSET
-                red_sum += piece_val
-                forward_bonus = min((BOARD_ROWS - 1 - i) * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT)
-                red_sum += forward_bonus * piece_val
+        elif PRIVATE + RED_OFFSET <= piece <= 2 * RED_OFFSET:
+            piece_val = piece - RED_OFFSET
+            red_sum += piece_val
+            forward_bonus = min((BOARD_ROWS - 1 - i) * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT)
+            red_sum += forward_bonus * piece_val
 
     return blue_sum - red_sum
+
+
+cdef int FLAG = 1
+cdef int RED_END = 63
+cdef int WIN_VALUE = 1000000
+# See Result class for details
+cdef int DRAW = 0
+cdef int WIN = 1
+cdef int OCCUPY = 2
+cdef int LOSS = 3
+
+
+cdef inline int piece_value(int square, int piece):
+    # Signed contribution of a piece to the evaluation (positive for blue)
+    cdef int i = square // BOARD_COLUMNS
+    if PRIVATE <= piece <= SPY:
+        return piece * (1 + min(i * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT))
+    if PRIVATE + RED_OFFSET <= piece <= 2 * RED_OFFSET:
+        return -(piece - RED_OFFSET) * (
+            1 + min((BOARD_ROWS - 1 - i) * FORWARD_WEIGHT, 5 * FORWARD_WEIGHT))
+    return 0
+
+
+cdef inline bint has_none_adjacent(const unsigned char[::1] squares,
+                                   int row_start, int column, int start,
+                                   int dest, int new_dest):
+    # Reads the end row as it is after the move
+    cdef int neighbor, square, piece
+    for neighbor in (column - 1, column + 1):
+        if neighbor < 0 or neighbor >= BOARD_COLUMNS:
+            continue
+        square = row_start + neighbor
+        if square == dest:
+            piece = new_dest
+        elif square == start:
+            piece = 0
+        else:
+            piece = squares[square]
+        if piece:
+            return False
+    return True
+
+
+cpdef tuple evaluate_children(const unsigned char[::1] squares, list actions,
+                              list origins, list destinations,
+                              bint blue_to_move, bint blue_anticipating,
+                              bint red_anticipating, int blue_flag,
+                              int red_flag, int blue_value, int red_value):
+    # See helpers.evaluate_children for the pure Python twin
+    cdef list values = [], terminals = [], results = []
+    cdef int action, start, dest, moved, target, new_dest, result
+    cdef int challenger, defender, advantage
+    cdef int new_blue_flag, new_red_flag, blue_flag_column, red_flag_column
+    cdef bint terminal
+
+    for action in actions:
+        start = origins[action]
+        dest = destinations[action]
+        moved = squares[start]
+        target = squares[dest]
+
+        if target == 0:
+            result = OCCUPY
+        else:
+            if blue_to_move:
+                challenger, defender = moved, target - RED_OFFSET
+            else:
+                challenger, defender = moved - RED_OFFSET, target
+            if challenger == PRIVATE and defender == SPY:
+                result = WIN
+            elif challenger == SPY and defender == PRIVATE:
+                result = LOSS
+            elif challenger > defender or (challenger == FLAG and defender == FLAG):
+                result = WIN
+            elif challenger < defender:
+                result = LOSS
+            else:
+                result = DRAW
+
+        if result == WIN or result == OCCUPY:
+            new_dest = moved
+        elif result == LOSS:
+            new_dest = target
+        else:
+            new_dest = 0
+
+        advantage = (blue_value - red_value - piece_value(start, moved)
+                     - piece_value(dest, target) + piece_value(dest, new_dest))
+
+        new_blue_flag, new_red_flag = blue_flag, red_flag
+        if new_blue_flag == start or new_blue_flag == dest:
+            new_blue_flag = dest if new_dest == FLAG else -1
+        if new_red_flag == start or new_red_flag == dest:
+            new_red_flag = dest if new_dest == FLAG + RED_OFFSET else -1
+        blue_flag_column = new_blue_flag - RED_END if new_blue_flag >= RED_END else -1
+        red_flag_column = new_red_flag if 0 <= new_red_flag < BOARD_COLUMNS else -1
+
+        # This mirrors Board.is_terminal
+        if new_blue_flag < 0 or new_red_flag < 0:
+            terminal = True
+        elif blue_flag_column >= 0:
+            terminal = blue_anticipating or has_none_adjacent(
+                squares, RED_END, blue_flag_column, start, dest, new_dest)
+        elif red_flag_column >= 0:
+            terminal = red_anticipating or has_none_adjacent(
+                squares, 0, red_flag_column, start, dest, new_dest)
+        else:
+            terminal = False
+
+        # This mirrors Board.reward
+        if terminal:
+            if new_blue_flag < 0:
+                advantage = -WIN_VALUE
+            elif new_red_flag < 0:
+                advantage = WIN_VALUE
+            elif blue_flag_column >= 0 and (blue_anticipating or has_none_adjacent(
+                    squares, RED_END, blue_flag_column, start, dest, new_dest)):
+                advantage = WIN_VALUE
+            elif red_flag_column >= 0 and (red_anticipating or has_none_adjacent(
+                    squares, 0, red_flag_column, start, dest, new_dest)):
+                advantage = -WIN_VALUE
+            else:
+                advantage = 0
+
+        # The children have red to move after a blue move
+        values.append(-advantage if blue_to_move else advantage)
+        terminals.append(terminal)
+        results.append(result)
+
+    return values, terminals, results
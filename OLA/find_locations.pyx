@@ -1,9 +1,5 @@
-from libc.stdlib cimport malloc, free
-from cpython cimport array
-cimport cython
+# cython: boundscheck=False, wraparound=False
 
-@cython.boundscheck(False)  # turn off bounds-checking for speed
-@cython.wraparound(False)   # turn off negative indexing
 def find_unique_locations(list unique_values, list matrix):
     """
     Returns a list of (row, col) tuples where each value in unique_values appears in the matrix.
@@ -27,3 +23,25 @@ def find_unique_locations(list unique_values, list matrix):
                     return [locations[v] for v in unique_values]
 
     return None
+
+
+cpdef list find_unique_squares(list unique_values, const unsigned char[::1] squares):
+    """
+    Returns a list of the square indices where each value in unique_values
+    appears in the flat squares, with -1 for a missing value.
+    """
+    cdef int square, value, index
+    cdef int remaining = len(unique_values)
+    cdef list locations = [-1] * remaining
+
+    for square in range(squares.shape[0]):
+        value = squares[square]
+        if value in unique_values:
+            index = unique_values.index(value)
+            if locations[index] < 0:
+                locations[index] = square
+                remaining -= 1
+                if not remaining:
+                    break
+
+    return locations
@@ -85,8 +85,7 @@ def find_unique_value(matrix: list[list[int]], target: int):
 def defeats(attacker: int, defender: int):
     """
     Determines if the first (attacker) piece rank defeats the second (defender)
-    piece rank. A draw is considered a defeat for the attacker. This function
-    is intended to be used with the access point heuristic in the evaluation.
+    piece rank. A draw is considered a defeat for the attacker.
     """
     if attacker == defender:
         if attacker == Ranking.FLAG:
@@ -120,3 +119,181 @@ def find_unique_locations(unique_values: list[int], matrix: list[list[int]]):
                     return [locations[v] for v in unique_values]
 
     return None
+
+
+def find_unique_squares(unique_values: list[int], squares):
+    """
+    This returns a list of the square indices of each of the values in the
+    provided list, with -1 for a value that is missing from the flat squares.
+    It is the flat counterpart of find_unique_locations, and the pure Python
+    twin of find_locations.find_unique_squares.
+    """
+    locations = [-1]*len(unique_values)
+    remaining = len(unique_values)
+    for square, value in enumerate(squares):
+        if value in unique_values:
+            index = unique_values.index(value)
+            if locations[index] < 0:
+                locations[index] = square
+                remaining -= 1
+                if not remaining:
+                    break
+
+    return locations
+
+
+def get_zobrist_keys(squares: int, values: int, seed: int):
+    """
+    This returns a table of random 64-bit keys for Zobrist hashing, with a row
+    of keys for every square and a key for every value the square can hold. The
+    first key of every row is zero, so that blank squares leave hashes as is. A
+    dedicated random generator keeps the keys fixed across runs without
+    disturbing the global random state.
+    """
+    generator = random.Random(seed)
+    return [[0] + [generator.getrandbits(64) for _ in range(values - 1)]
+            for _ in range(squares)]
+
+
+def _end_row_has_none_adjacent(squares, row_start: int, column: int,
+                               changed: tuple[int, int, int]):
+    """
+    This checks if the neighbors of a column in an end row are blank, reading
+    the squares as they are after a move. The move is given as (start square,
+    destination square, piece left at the destination), since the start square
+    is always left blank.
+    """
+    start, dest, new_dest = changed
+    columns = 9
+    for neighbor in (column - 1, column + 1):
+        if not 0 <= neighbor < columns:
+            continue
+        square = row_start + neighbor
+        if square == dest:
+            piece = new_dest
+        elif square == start:
+            piece = Ranking.BLANK
+        else:
+            piece = squares[square]
+        if piece:
+            return False
+    return True
+
+
+def _piece_value(square: int, piece: int):
+    """
+    This returns the signed contribution of a piece on a square to the naive
+    evaluation (positive for blue), matching fasteval.
+    """
+    columns, rows, forward_weight, max_forward_rows = 9, 8, 2, 5
+    row = square // columns
+    if Ranking.PRIVATE <= piece <= Ranking.SPY:
+        return piece*(1 + forward_weight*min(row, max_forward_rows))
+    if Ranking.PRIVATE + Ranking.SPY <= piece <= Ranking.SPY*2:
+        return -(piece - Ranking.SPY)*(1 + forward_weight*min(
+            rows - 1 - row, max_forward_rows))
+    return 0
+
+
+def evaluation(squares):
+    """
+    This is the pure Python twin of fasteval.evaluation, which sums the values
+    of the blue pieces minus those of the red pieces on the flat squares.
+    """
+    return sum(_piece_value(square, piece)
+               for square, piece in enumerate(squares))
+
+
+def evaluate_children(squares, actions: list[int], origins: list[int],
+                      destinations: list[int], blue_to_move: bool,
+                      blue_anticipating: bool, red_anticipating: bool,
+                      blue_flag: int, red_flag: int, blue_value: int,
+                      red_value: int):
+    """
+    This is the pure Python twin of fasteval.evaluate_children, used when the
+    compiled extension is unavailable. It scores the children of a board
+    without building them, returning a list each of the children's
+    evaluations (from the perspective of their player to move), terminal
+    flags and action results. The anticipation flags are those of the
+    children, while the flag squares and the evaluation components are those
+    of the parent board.
+    """
+    # Constants are spelled out since this module cannot import the core
+    columns, red_end, win_value = 9, 63, 1000000
+    draw, win, occupy, loss = 0, 1, 2, 3  # See Result class for details
+    red_flag_piece = Ranking.FLAG + Ranking.SPY
+    values, terminals, results = [], [], []
+
+    for action in actions:
+        start, dest = origins[action], destinations[action]
+        moved, target = squares[start], squares[dest]
+
+        if target == Ranking.BLANK:
+            result = occupy
+        else:
+            # Red ranks are offset by Ranking.SPY
+            challenger, defender = ((moved, target - Ranking.SPY)
+                                    if blue_to_move else
+                                    (moved - Ranking.SPY, target))
+            if challenger == Ranking.PRIVATE and defender == Ranking.SPY:
+                result = win
+            elif challenger == Ranking.SPY and defender == Ranking.PRIVATE:
+                result = loss
+            elif (challenger > defender
+                  or (challenger == Ranking.FLAG and defender == Ranking.FLAG)):
+                result = win
+            elif challenger < defender:
+                result = loss
+            else:
+                result = draw
+        new_dest = (moved if result in (win, occupy)
+                    else target if result == loss else Ranking.BLANK)
+        changed = (start, dest, new_dest)
+
+        advantage = (blue_value - red_value - _piece_value(start, moved)
+                     - _piece_value(dest, target) + _piece_value(dest, new_dest))
+
+        new_blue_flag, new_red_flag = blue_flag, red_flag
+        if new_blue_flag in (start, dest):
+            new_blue_flag = dest if new_dest == Ranking.FLAG else -1
+        if new_red_flag in (start, dest):
+            new_red_flag = dest if new_dest == red_flag_piece else -1
+        blue_flag_column = (new_blue_flag - red_end
+                            if new_blue_flag >= red_end else -1)
+        red_flag_column = new_red_flag if 0 <= new_red_flag < columns else -1
+
+        # This mirrors Board.is_terminal
+        if new_blue_flag < 0 or new_red_flag < 0:
+            terminal = True
+        elif blue_flag_column >= 0:
+            terminal = blue_anticipating or _end_row_has_none_adjacent(
+                squares, red_end, blue_flag_column, changed)
+        elif red_flag_column >= 0:
+            terminal = red_anticipating or _end_row_has_none_adjacent(
+                squares, 0, red_flag_column, changed)
+        else:
+            terminal = False
+
+        # This mirrors Board.reward
+        if terminal:
+            if new_blue_flag < 0:
+                advantage = -win_value
+            elif new_red_flag < 0:
+                advantage = win_value
+            elif blue_flag_column >= 0 and (
+                    blue_anticipating or _end_row_has_none_adjacent(
+                        squares, red_end, blue_flag_column, changed)):
+                advantage = win_value
+            elif red_flag_column >= 0 and (
+                    red_anticipating or _end_row_has_none_adjacent(
+                        squares, 0, red_flag_column, changed)):
+                advantage = -win_value
+            else:
+                advantage = 0
+
+        # The children have red to move after a blue move
+        values.append(-advantage if blue_to_move else advantage)
+        terminals.append(terminal)
+        results.append(result)
+
+    return values, terminals, results
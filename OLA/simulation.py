@@ -4,12 +4,9 @@ This contains the logic for simulating a GG match.
 
 import random
 
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MultipleLocator
-
 from OLA.constants import Ranking, POV, Controller
 from OLA.helpers import get_blank_matrix
-from OLA.core import Player, Board, Infostate
+from OLA.core import Player, Board, Infostate, Action, RankBeliefs
 
 
 class MatchSimulator:
@@ -184,21 +181,53 @@ class MatchSimulator:
         This is for obtaining the controller's chosen action, be it human or
         bot.
         """
-        action = ""  # Initialize variable for storing chosen action
+        action = None  # Initialize variable for storing chosen action
         valid_actions = arbiter_board.actions()
         if self.get_current_controller(arbiter_board) == Controller.RANDOM:
             action = random.choice(valid_actions)
         elif self.get_current_controller(arbiter_board) == Controller.HUMAN:
             while action not in valid_actions:
-                action = input("Choose a move: ")
+                # Moves are typed as strings such as "2131"
+                action = Action.IDS.get(input("Choose a move: "))
 
         return action
 
+    @staticmethod
+    def _starting_beliefs(blue_infostate: Infostate, red_infostate: Infostate):
+        """
+        This creates the rank beliefs of both players, which are kept and
+        updated for the whole game (see RankBeliefs class).
+        """
+        return (RankBeliefs.from_infostate(blue_infostate),
+                RankBeliefs.from_infostate(red_infostate))
+
+    @staticmethod
+    def _update_beliefs(beliefs: tuple[RankBeliefs, RankBeliefs],
+                        blue_infostate: Infostate, red_infostate: Infostate,
+                        action: int, result: str):
+        """
+        This obtains the rank beliefs of both players after an action, given
+        their infostates before the action.
+        """
+        blue_beliefs, red_beliefs = beliefs
+
+        return (blue_beliefs.transition(blue_infostate, action, result),
+                red_beliefs.transition(red_infostate, action, result))
+
     @staticmethod
     def _update_infostates(blue_infostate: Infostate, red_infostate: Infostate,
-                           action: str, result: str):
+                           action: int, result: str,
+                           beliefs: tuple[RankBeliefs, RankBeliefs] = None):
+        """
+        This obtains the infostates of both players after an action. Given the
+        rank beliefs of both players after the action, the rank intervals of
+        the opponent pieces are tightened to them.
+        """
         blue_infostate = blue_infostate.transition(action, result=result)
         red_infostate = red_infostate.transition(action, result=result)
+        if beliefs is not None:
+            blue_infostate = beliefs[0].narrowed(blue_infostate)
+            red_infostate = beliefs[1].narrowed(red_infostate)
 
         return blue_infostate, red_infostate
 
@@ -248,6 +277,8 @@ class MatchSimulator:
 
             blue_infostate, red_infostate = MatchSimulator._starting_infostates(
                 arbiter_board)
+            beliefs = MatchSimulator._starting_beliefs(blue_infostate,
+                                                       red_infostate)
 
             turn_number = 1
             while not arbiter_board.is_terminal():
@@ -263,15 +294,18 @@ class MatchSimulator:
 
                 action = ""  # Initialize variable for storing chosen action
                 action = self.get_controller_input(arbiter_board)
-                print(f"Chosen Move: {action}")
+                print(f"Chosen Move: {Action.to_string(action)}")
                 if self.save_data:
-                    self.game_history.append(action)
+                    self.game_history.append(Action.to_string(action))
 
-                new_arbiter_board = arbiter_board.transition(action)
-                result = arbiter_board.classify_action_result(action,
-                                                              new_arbiter_board)
+                new_arbiter_board, result = arbiter_board.transition_with_result(
+                    action)
+                beliefs = MatchSimulator._update_beliefs(
+                    beliefs, blue_infostate, red_infostate, action=action,
+                    result=result)
                 blue_infostate, red_infostate = MatchSimulator._update_infostates(
-                    blue_infostate, red_infostate, action=action, result=result
+                    blue_infostate, red_infostate, action=action, result=result,
+                    beliefs=beliefs
                 )
                 arbiter_board = new_arbiter_board
                 turn_number += 1
@@ -279,6 +313,11 @@ class MatchSimulator:
 
             MatchSimulator._print_result(arbiter_board)
 
+        # Plotting is only imported when needed, so that headless workers start
+        # quickly
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MultipleLocator
+
         for line_data in branching_lists:
             x, y = zip(*line_data)
             plt.scatter(x, y)
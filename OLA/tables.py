@@ -0,0 +1,293 @@
+"""
+This contains the storage of the regret and strategy tables of the CFR
+trainers in NumPy arrays.
+"""
+
+import numpy as np
+
+from OLA.core import Infostate
+
+
+class TableStore:
+    """
+    This stores the regrets, accumulated strategy and current profile of every
+    node as rows of contiguous floats in three growable slabs. A node is an
+    infostate together with the actions searched from it, which may be only
+    some of its valid actions. Each node is given an id in the order it is
+    added, and its rows start at the same offset of every slab, with one entry
+    per searched action. A fourth slab holds the action ids of the entries.
+
+    The nodes are keyed by the compact key of the infostate followed by the
+    bytes of the action ids, so that the infostate objects themselves are not
+    kept alive by the store. Slabs are reallocated as they grow, so the views
+    returned for a row are only valid until the next row is added.
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        """
+        The capacity is the initial number of floats in each slab, which is
+        doubled whenever it runs out.
+        """
+        self.ids = {}
+        self.lookups = None  # Set to a set to record the keys looked up
+        self.updated = None  # Set to a set to record the ids of updated rows
+        self.keys = []
+        self.offsets = []
+        self.widths = []
+        self.used = 0
+        self.regret_slab = np.zeros(capacity)
+        self.strategy_slab = np.zeros(capacity)
+        self.profile_slab = np.zeros(capacity)
+        self.action_slab = np.zeros(capacity, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def node_key(infostate: Infostate, actions: list[int]):
+        """
+        This builds the key of an infostate and its searched actions. Action
+        ids are below 256, so each fits in a byte.
+        """
+        return infostate.key + bytes(actions)
+
+    def row(self, infostate: Infostate, actions: list[int]):
+        """
+        This obtains the id of the node, or None if it has no rows yet.
+        """
+        key = TableStore.node_key(infostate, actions)
+        if self.lookups is not None:
+            self.lookups.add(key)
+
+        return self.ids.get(key)
+
+    def add(self, infostate: Infostate, actions: list[int]):
+        """
+        This obtains the id of the node, adding rows for its actions if
+        needed. New regrets and strategies are zero, and new profiles are
+        uniform.
+        """
+        key = TableStore.node_key(infostate, actions)
+        if self.lookups is not None:
+            self.lookups.add(key)
+
+        return self._add_key(key, actions)
+
+    def _add_key(self, key: bytes, actions: list[int]):
+        row = self.ids.get(key)
+        if row is not None:
+            return row
+        width = len(actions)
+
+        if self.used + width > len(self.regret_slab):
+            self._grow(self.used + width)
+        row = self.ids[key] = len(self.keys)
+        self.keys.append(key)
+        self.offsets.append(self.used)
+        self.widths.append(width)
+        self.profile_slab[self.used:self.used + width] = 1/width
+        self.action_slab[self.used:self.used + width] = actions
+        self.used += width
+
+        return row
+
+    def _grow(self, needed: int):
+        """
+        This reallocates the slabs with at least the needed number of floats.
+        """
+        capacity = len(self.regret_slab)
+        while capacity < needed:
+            capacity *= 2
+        for name in ["regret_slab", "strategy_slab", "profile_slab",
+                     "action_slab"]:
+            slab = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            slab[:self.used] = getattr(self, name)[:self.used]
+            setattr(self, name, slab)
+
+    def _span(self, row: int):
+        start = self.offsets[row]
+        return slice(start, start + self.widths[row])
+
+    def actions(self, row: int):
+        """
+        This obtains a view of the action ids of a node's entries.
+        """
+        return self.action_slab[self._span(row)]
+
+    def regrets(self, row: int):
+        """
+        This obtains a view of the cumulative regrets of a node.
+        """
+        return self.regret_slab[self._span(row)]
+
+    def strategy(self, row: int):
+        """
+        This obtains a view of the cumulative strategy of a node.
+        """
+        return self.strategy_slab[self._span(row)]
+
+    def profile(self, row: int):
+        """
+        This obtains a view of the current profile of a node.
+        """
+        return self.profile_slab[self._span(row)]
+
+    def update(self, row: int, profile: list[float], utilities: list[float],
+               node_utility: float, opponent_probability: float,
+               player_probability: float):
+        """
+        This accumulates the counterfactual regrets and the strategy of a
+        node, weighted by the reach probabilities, and sets its next
+        profile by nonnegative regret matching.
+        """
+        span = self._span(row)
+        self.regret_slab[span] += opponent_probability*(
+            np.asarray(utilities) - node_utility)
+        self.strategy_slab[span] += player_probability*np.asarray(profile)
+        if self.updated is not None:
+            self.updated.add(row)
+
+        self._match(span)
+
+    def _match(self, span: slice):
+        """
+        This sets the profile of a node by regret matching.
+        """
+        regrets = self.regret_slab[span]
+        positive_regrets = np.maximum(regrets, 0.0)
+        positive_regret_sum = positive_regrets.sum()
+        if positive_regret_sum > 0:
+            np.divide(positive_regrets, positive_regret_sum,
+                      out=self.profile_slab[span])
+        else:
+            # Fall back to the uniform distribution
+            self.profile_slab[span] = 1/len(positive_regrets)
+
+    def accumulate_strategy(self, row: int, profile: list[float],
+                            weight: float):
+        """
+        This adds a weighted profile to the cumulative strategy of a node,
+        for the trainers that sample the nodes of the opponent.
+        """
+        self.strategy_slab[self._span(row)] += weight*np.asarray(profile)
+        if self.updated is not None:
+            self.updated.add(row)
+
+    def discount(self, rows: set[int], floor_regrets: bool = False,
+                 regret_discounts: tuple[float, float] = None,
+                 strategy_discount: float = 1.0):
+        """
+        This applies the end of iteration step of an update rule to the given
+        rows at once: flooring the regrets at zero, or discounting the
+        positive and negative regrets and the strategy. Neither changes the
+        profiles given by regret matching.
+        """
+        if not rows:
+            return
+        rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        widths = np.array(self.widths, dtype=np.int64)[rows]
+        row_starts = np.cumsum(widths) - widths
+        entries = np.repeat(
+            np.array(self.offsets, dtype=np.int64)[rows] - row_starts,
+            widths) + np.arange(widths.sum())
+
+        if floor_regrets:
+            self.regret_slab[entries] = np.maximum(
+                self.regret_slab[entries], 0.0)
+        elif regret_discounts is not None:
+            positive_discount, negative_discount = regret_discounts
+            regrets = self.regret_slab[entries]
+            self.regret_slab[entries] = regrets*np.where(
+                regrets > 0, positive_discount, negative_discount)
+        if strategy_discount != 1.0:
+            self.strategy_slab[entries] *= strategy_discount
+
+    def snapshot(self, keys: list[bytes] = None):
+        """
+        This copies out the regrets, strategy and profile of the nodes with
+        the given keys that have rows (or of every node), by key.
+        """
+        if keys is None:
+            keys = self.keys
+        snapshot = {}
+        for key in keys:
+            row = self.ids.get(key)
+            if row is not None:
+                span = self._span(row)
+                snapshot[key] = (self.regret_slab[span].copy(),
+                                 self.strategy_slab[span].copy(),
+                                 self.profile_slab[span].copy())
+
+        return snapshot
+
+    def load(self, snapshot: dict):
+        """
+        This sets the rows of the nodes in a snapshot, adding them if needed.
+        The action ids are the last bytes of every key.
+        """
+        for key, (regrets, strategy, profile) in snapshot.items():
+            span = self._span(self._add_key(key, list(key[-len(regrets):])))
+            self.regret_slab[span] = regrets
+            self.strategy_slab[span] = strategy
+            self.profile_slab[span] = profile
+
+    def deltas(self, snapshot: dict):
+        """
+        This lists the changes of the regrets and strategy of every node since
+        the snapshot, as (key, regret delta, strategy delta), in id order.
+        Nodes added since then count from zero, and unchanged nodes are left
+        out.
+        """
+        changes = []
+        for key, offset, width in zip(self.keys, self.offsets, self.widths):
+            span = slice(offset, offset + width)
+            regret_delta = self.regret_slab[span].copy()
+            strategy_delta = self.strategy_slab[span].copy()
+            if key in snapshot:
+                regret_delta -= snapshot[key][0]
+                strategy_delta -= snapshot[key][1]
+                if not regret_delta.any() and not strategy_delta.any():
+                    continue
+            changes.append((key, regret_delta, strategy_delta))
+
+        return changes
+
+    def merge(self, changes: list[tuple]):
+        """
+        This adds the changes listed by deltas() to the nodes, in order, and
+        sets their profiles by regret matching.
+        """
+        for key, regret_delta, strategy_delta in changes:
+            span = self._span(self._add_key(key, list(
+                key[-len(regret_delta):])))
+            self.regret_slab[span] += regret_delta
+            self.strategy_slab[span] += strategy_delta
+            if self.updated is not None:
+                self.updated.add(self.ids[key])
+            self._match(span)
+
+    def export(self):
+        """
+        This copies out the keys of the nodes in id order, the offsets and
+        widths of their rows, and the used part of each slab.
+        """
+        return {
+            "keys": list(self.keys),
+            "offsets": np.array(self.offsets, dtype=np.int64),
+            "widths": np.array(self.widths, dtype=np.int64),
+            "regrets": self.regret_slab[:self.used].copy(),
+            "strategies": self.strategy_slab[:self.used].copy(),
+            "profiles": self.profile_slab[:self.used].copy(),
+            "actions": self.action_slab[:self.used].copy(),
+        }
+
+    def to_dict(self, slab: str):
+        """
+        This lists the rows of one of the slabs ("regrets", "strategies" or
+        "profiles") by node key.
+        """
+        values = {"regrets": self.regret_slab, "strategies": self.strategy_slab,
+                  "profiles": self.profile_slab}[slab]
+        return {key: values[offset:offset + width].tolist()
+                for key, offset, width in zip(self.keys, self.offsets,
+                                              self.widths)}
@@ -5,20 +5,28 @@ This contains definitions relevant to the training of an AI for GG.
 import random
 import csv
 import time
-import copy
 import shutil
 import os
+import pickle
+import signal
+import multiprocessing
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import wait
+from typing import TYPE_CHECKING
 
-import tkinter as tk
-from anytree import Node
-from anytree.exporter import UniqueDotExporter  # Graphviz has to be installed
-
-from OLA.core import Board, Infostate, Player
+from OLA.core import Action, Board, Infostate, Player, RankBeliefs
 from OLA.simulation import MatchSimulator
-from OLA.constants import Ranking, Result
+from OLA.constants import Ranking, Result, UpdateRule, POV
+from OLA.transposition import TranspositionTable
+
+# The GUI, tree visualization and NumPy dependencies are only imported when
+# used, so that headless workers and the data tools start quickly
+if TYPE_CHECKING:
+    from anytree import Node
+    from OLA.arena import TreeArena
 
 
 class MatrixApp:
@@ -30,6 +38,8 @@ class MatrixApp:
         self.create_widgets()
 
     def create_widgets(self):
+        import tkinter as tk
+
         rows = len(self.matrix)
         cols = len(self.matrix[0])
 
@@ -117,48 +127,34 @@ class TimelessBoard:
         game for all the players.
         """
 
-        valid_actions = []  # Initialize return value
-        bottom_row_number = leftmost_column_number = 0
-
-        for row in range(Board.ROWS):
-            for column in range(Board.COLUMNS):
-                # Define change in coordinates per direction (up, down, left,
-                # and right)
-                directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                for direction in directions:
-                    direction_row, direction_column = direction
-                    new_row, new_column = (row + direction_row,
-                                           column + direction_column)
-
-                    if (bottom_row_number <= new_row < Board.ROWS
-                            and leftmost_column_number <= new_column < Board.COLUMNS):
-                        valid_actions.append(
-                            f"{row}{column}{new_row}{new_column}")
+        # The action ids are defined in this same order (see Action class)
+        return list(Action.STRINGS)
 
-        return valid_actions
 
-
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CFRParameters:
     """
     This is for storing the parameters needed by the counterfactual regret
-    minimization algorithm.
+    minimization algorithm. Each call of the algorithm gets its own record,
+    so the records are immutable, and the parameters of a child call are
+    derived with dataclasses.replace instead of copying.
     """
     abstraction: Abstraction
-    current_player: int
+    current_player: int  # None when both players are updated in one pass
     iteration: int
     blue_probability: float
     red_probability: float
     turn_number: int
     depth: int = None
-    previous_action: str = None
+    previous_action: int = None
     previous_result: str = None
     attack_location: tuple[int, int] = None
     actions_filter: 'ActionsFilter' = None
     visualize: bool = False
-    data_node: Node = None
-    parent_data_node: Node = None
-    action_taken: str = None
+    parent_data_node: 'Node' = None
+    action_taken: int = None
+    sample_probability: float = 1.0  # For outcome sampling
+    split: bool = False  # For splitting the children across the workers
 
 
 @dataclass
@@ -172,18 +168,16 @@ class Probabilities:
 
 
 @dataclass
-class Tables:
+class DiscountParameters:
     """
-    A class used to represent tables for storing regrets and strategies.
-    Attributes
-    ----------
-    regret_table : list of float
-        A list to store regret values.
-    strategy_table : list of float
-        A list to store strategy probabilities.
+    This is for storing the discounts of Discounted CFR, which multiplies the
+    cumulative positive regrets by t^alpha/(t^alpha + 1), the negative regrets
+    by t^beta/(t^beta + 1) and the strategies by (t/(t + 1))^gamma after
+    every iteration t.
     """
-    regret_table: list[float]
-    strategy_table: list[float]
+    alpha: float = 1.5
+    beta: float = 0.0
+    gamma: float = 2.0
 
 
 @dataclass
@@ -193,12 +187,13 @@ class UpdateTablesParams:
     tables.
     """
     state: Board
-    tables: Tables
+    actions: list[int]
     profile: list[float]
     utilities: list[float]
     node_utility: float
     probabilities: Probabilities
     infostate: Infostate
+    iteration: int = 0
 
 
 @dataclass
@@ -241,75 +236,77 @@ class ActionsFilter:
 
         return filtered_actions
 
-    def _to_include(self, action: str):
+    def _to_include(self, action: int):
         """
         This method checks if an action is valid.
         """
         is_included = False  # Initialize the return value
+        start_row, start_col, dest_row, dest_col = Action.COORDINATES[
+            Action.to_id(action)]
         # If the action's starting or destination square is in the whitelist
-        if ((int(action[0]), int(action[1])) in self.square_whitelist
-                or (int(action[2]), int(action[3])) in self.square_whitelist):
+        if ((start_row, start_col) in self.square_whitelist
+                or (dest_row, dest_col) in self.square_whitelist):
             is_included = True
         else:
             return False
 
         # Blue's forward moves are those that increase the row number
         if (self.state.player_to_move == Player.BLUE
-                and int(action[0]) < int(action[2]) and self.directions.forward):
+                and start_row < dest_row and self.directions.forward):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[0]) < int(action[2]) and not self.directions.forward):
+                and start_row < dest_row and not self.directions.forward):
             is_included = False
 
         if (self.state.player_to_move == Player.BLUE
-                and int(action[0]) > int(action[2]) and self.directions.back):
+                and start_row > dest_row and self.directions.back):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[0]) > int(action[2]) and not self.directions.back):
+                and start_row > dest_row and not self.directions.back):
             is_included = False
 
         # Blue's right moves are those that decrease the column number
         if (self.state.player_to_move == Player.BLUE
-                and int(action[1]) > int(action[3]) and self.directions.right):
+                and start_col > dest_col and self.directions.right):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[1]) > int(action[3]) and not self.directions.right):
+                and start_col > dest_col and not self.directions.right):
             is_included = False
 
         if (self.state.player_to_move == Player.BLUE
-                and int(action[1]) < int(action[3]) and self.directions.left):
+                and start_col < dest_col and self.directions.left):
             is_included = True
         elif (self.state.player_to_move == Player.BLUE
-                and int(action[1]) < int(action[3]) and not self.directions.left):
+                and start_col < dest_col and not self.directions.left):
             is_included = False
 
         # Flip the logic for red player
         if (self.state.player_to_move == Player.RED
-                and int(action[0]) > int(action[2]) and self.directions.forward):
+                and start_row > dest_row and self.directions.forward):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[0]) > int(action[2]) and not self.directions.forward):
+                and start_row > dest_row and not self.directions.forward):
             is_included = False
 
         if (self.state.player_to_move == Player.RED
-                and int(action[0]) < int(action[2]) and self.directions.back):
+                and start_row < dest_row and self.directions.back):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[0]) < int(action[2]) and not self.directions.back):
+                and start_row < dest_row and not self.directions.back):
             is_included = False
 
         if (self.state.player_to_move == Player.RED
-                and int(action[1]) < int(action[3]) and self.directions.right):
+                and start_col < dest_col and self.directions.right):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[1]) < int(action[3]) and not self.directions.right):
+                and start_col < dest_col and not self.directions.right):
             is_included = False
 
         if (self.state.player_to_move == Player.RED and self.directions.left
-                and int(action[1]) > int(action[3])):
+                and start_col > dest_col):
             is_included = True
         elif (self.state.player_to_move == Player.RED
-                and int(action[1]) > int(action[3]) and not self.directions.left):
+                and start_col > dest_col and not self.directions.left):
             is_included = False
         return is_included
 
@@ -320,45 +317,128 @@ class CFRTrainer:
     counterfactual regret minimization algorithm.
     """
 
-    def __init__(self):
-        self.regret_tables = {}
-        self.strategy_tables = {}
-        self.profiles = {}
+    def __init__(self, in_place: bool = False,
+                 update_rule: int = UpdateRule.VANILLA,
+                 discounts: DiscountParameters = None,
+                 simultaneous: bool = False):
+        """
+        With in_place set, the tree is walked with a single mutable board that
+        is moved with make() and restored with unmake(), instead of creating a
+        new board for every child node.
+
+        The update rule selects vanilla CFR, CFR+, Linear CFR or Discounted
+        CFR (see UpdateRule class for details), with the discounts only used
+        by the latter.
+
+        With simultaneous set, every iteration walks the tree once and updates
+        the tables of whichever player is to move at each node, instead of
+        walking it once for each player. Both players then regret against the
+        same profiles, which halves the work of an iteration.
+        """
+        from OLA.tables import TableStore
+        self.tables = TableStore()
+        self.update_rule = update_rule
+        if discounts is None:
+            discounts = DiscountParameters()
+        self.discounts = discounts
+        self.in_place = in_place
+        self.simultaneous = simultaneous
+
+    @property
+    def regret_tables(self):
+        """
+        This lists the cumulative regrets by node key (see TableStore class
+        for details).
+        """
+        return self.tables.to_dict("regrets")
+
+    @property
+    def strategy_tables(self):
+        """
+        This lists the cumulative strategies by node key.
+        """
+        return self.tables.to_dict("strategies")
+
+    @property
+    def profiles(self):
+        """
+        This lists the current profiles by node key.
+        """
+        return self.tables.to_dict("profiles")
+
+    def cumulative_strategy(self, infostate: Infostate, actions: list[int]):
+        """
+        This obtains the cumulative strategy of an infostate over the given
+        searched actions as a list.
+        """
+        return self.tables.strategy(self.tables.row(infostate, actions)).tolist()
+
+    def _traversing_players(self):
+        """
+        This lists the current_player of each traversal of an iteration, where
+        None stands for a single traversal updating both players.
+        """
+        if self.simultaneous:
+            return [None]
+
+        return [Player.BLUE, Player.RED]
+
+    @staticmethod
+    def _is_updated(state: Board, current_player: int):
+        """
+        This checks if the tables of the player to move are updated at the
+        node in the current traversal.
+        """
+        return current_player is None or state.player_to_move == current_player
 
     @staticmethod
-    def _initialize_utilities(state: Board):
+    def _initialize_utilities(actions: list[int]):
         node_utility = 0
-        utilities = [0.0 for action in state.actions()]
+        utilities = [0.0]*len(actions)
 
         return node_utility, utilities
 
-    def _get_tables(self, state: Board, infostate: Infostate):
-        if str(infostate) not in self.regret_tables:
-            regret_table = [0.0 for action in state.actions()]
-        else:
-            regret_table = self.regret_tables[str(infostate)]
-
-        if str(infostate) not in self.strategy_tables:
-            strategy_table = [0.0 for action in state.actions()]
-        else:
-            strategy_table = self.strategy_tables[str(infostate)]
-
-        if str(infostate) not in self.profiles:
-            profile = [1.0/len(state.actions()) for action in state.actions()]
-        else:
-            profile = self.profiles[str(infostate)]
+    def _get_profile(self, infostate: Infostate, actions: list[int]):
+        """
+        This copies out the current profile of the infostate over the searched
+        actions, which is uniform until its tables are first updated.
+        """
+        row = self.tables.row(infostate, actions)
+        if row is None:
+            return [1.0/len(actions)]*len(actions)
 
-        return regret_table, strategy_table, profile
+        return self.tables.profile(row).tolist()
 
     @staticmethod
-    def _get_next(state: Board, infostate: Infostate, action: str):
-        next_state = state.transition(action=action)
-        result = state.classify_action_result(action=action,
-                                              new_board=next_state)
+    def _get_next(state: Board, infostate: Infostate, action: int):
+        next_state, result = state.transition_with_result(action=action)
         next_infostate = infostate.transition(action=action, result=result)
 
         return next_state, next_infostate
 
+    def _advance(self, state: Board, infostate: Infostate, action: int):
+        """
+        This obtains the child state, infostate and action result for the
+        traversal, along with an undo record when moving in place.
+        """
+        if self.in_place:
+            undo = state.make(action)
+            result = state.made_action_result(undo)
+            return state, infostate.transition(action=action, result=result), result, undo
+
+        next_state, result = state.transition_with_result(action=action)
+        next_infostate = infostate.transition(action=action, result=result)
+
+        return next_state, next_infostate, result, None
+
+    @staticmethod
+    def _retreat(state: Board, undo: tuple):
+        """
+        This restores the state after its child has been traversed in place.
+        """
+        if undo is not None:
+            state.unmake(undo)
+
     @staticmethod
     def _update_probabilities(state: Board, profile: list[float],
                               blue_probability: float, red_probability: float,
@@ -383,42 +463,25 @@ class CFRTrainer:
 
         return player_probability, opponent_probability
 
-    @staticmethod
-    def _regret_match(state: Board, regret_table: list[float]):
-        # Calculate next profile using nonnegative regret matching
-        next_profile = [0.0 for _ in state.actions()]
-
-        if all(r <= 0 for r in regret_table):
-            next_profile = [1 / len(state.actions()) for _ in state.actions()]
-        else:
-            positive_regret_sum = sum(r for r in regret_table if r > 0)
-            if positive_regret_sum > 0:
-                for r, regret in enumerate(regret_table):
-                    if regret > 0:
-                        next_profile[r] = regret / positive_regret_sum
-            else:
-                # Fallback to uniform distribution if positive_regret_sum is 0
-                next_profile = [1 / len(state.actions())
-                                for _ in state.actions()]
-
-        return next_profile
-
-    def _cfr_children(self, parameters: CFRParameters, profile: list[float], utilities: list[float],
+    def _cfr_children(self, parameters: CFRParameters, actions: list[int],
+                      profile: list[float], utilities: list[float],
                       node_utility: float):
         state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
-        for a, action in enumerate(state.actions()):
-            next_state, next_infostate = CFRTrainer._get_next(
-                state=state, infostate=infostate, action=action)
-
+        for a, action in enumerate(actions):
+            # The probabilities are updated before the state moves in place
             new_blue_probability, new_red_probability = (
                 CFRTrainer._update_probabilities(
                     state=state, profile=profile, blue_probability=parameters.blue_probability,
                     red_probability=parameters.red_probability, action_index=a))
+
+            next_state, next_infostate, _, undo = self._advance(
+                state=state, infostate=infostate, action=action)
             new_parameters = CFRParameters(abstraction=Abstraction(
                 state=next_state, infostate=next_infostate),
                 current_player=parameters.current_player, iteration=parameters.iteration,
                 blue_probability=new_blue_probability, red_probability=new_red_probability)
             utilities[a] = -self.cfr(params=new_parameters)
+            CFRTrainer._retreat(state=state, undo=undo)
 
             node_utility += profile[a]*utilities[a]
 
@@ -436,51 +499,79 @@ class CFRTrainer:
         if abstraction.state.is_terminal():
             return self._terminal_state_utility(abstraction.state, current_player)
 
-        node_utility, utilities = CFRTrainer._initialize_utilities(
-            state=abstraction.state)
-        regret_table, strategy_table, profile = self._get_tables(
-            state=abstraction.state, infostate=abstraction.infostate)
+        actions = abstraction.state.actions()
+        node_utility, utilities = CFRTrainer._initialize_utilities(actions)
+        profile = self._get_profile(infostate=abstraction.infostate,
+                                    actions=actions)
         player_probability, opponent_probability = CFRTrainer._probabilities(
-            current_player=current_player, blue_probability=blue_probability,
-            red_probability=red_probability)
+            current_player=abstraction.state.player_to_move,
+            blue_probability=blue_probability, red_probability=red_probability)
 
-        node_utility = self._cfr_children(parameters=params, profile=profile,
-                                          utilities=utilities, node_utility=node_utility)
+        node_utility = self._cfr_children(parameters=params, actions=actions,
+                                          profile=profile, utilities=utilities,
+                                          node_utility=node_utility)
 
-        if abstraction.state.player_to_move == current_player:
+        if CFRTrainer._is_updated(abstraction.state, current_player):
             self._update_tables(
                 UpdateTablesParams(
-                    state=abstraction.state,
-                    tables=Tables(
-                        regret_table=regret_table,
-                        strategy_table=strategy_table), profile=profile, utilities=utilities,
+                    state=abstraction.state, actions=actions, profile=profile,
+                    utilities=utilities,
                     node_utility=node_utility,
                     probabilities=Probabilities(
                         opponent_probability=opponent_probability,
-                        player_probability=player_probability), infostate=abstraction.infostate))
+                        player_probability=player_probability), infostate=abstraction.infostate,
+                    iteration=params.iteration))
 
         return node_utility
 
     def _terminal_state_utility(self, state: Board, current_player: int):
-        if state.player_to_move == current_player:
+        if current_player is None or state.player_to_move == current_player:
             return state.reward()
 
         return -state.reward()
 
-    def _update_tables(self, params: UpdateTablesParams):
-        for a in range(len(params.state.actions())):
-            params.tables.regret_table[a] += params.probabilities.opponent_probability * \
-                (params.utilities[a] - params.node_utility)
-            params.tables.strategy_table[a] += params.probabilities.player_probability * \
-                params.profile[a]
+    def _update_weights(self, iteration: int):
+        """
+        This obtains the weights of the regrets and the strategy added in the
+        given iteration (counted from zero), according to the update rule.
+        """
+        t = iteration + 1
+        if self.update_rule == UpdateRule.CFR_PLUS:
+            return 1.0, t
+        if self.update_rule == UpdateRule.LINEAR:
+            return t, t
 
-        self.regret_tables[str(params.infostate)] = params.tables.regret_table
-        self.strategy_tables[str(params.infostate)
-                             ] = params.tables.strategy_table
+        return 1.0, 1.0
 
-        next_profile = CFRTrainer._regret_match(
-            state=params.state, regret_table=params.tables.regret_table)
-        self.profiles[str(params.infostate)] = next_profile
+    def _end_iteration(self, iteration: int):
+        """
+        This applies the end of an iteration (counted from zero) to the rows
+        updated so far by the current solve, according to the update rule:
+        CFR+ floors the regrets at zero, and Discounted CFR discounts the
+        positive and negative regrets and the strategy. Every such row is then
+        adjusted exactly once per iteration, however many times it was updated
+        in the iteration, while the rows left from earlier searches are kept
+        as they are.
+        """
+        t = iteration + 1
+        if self.update_rule == UpdateRule.CFR_PLUS:
+            self.tables.discount(self.tables.updated, floor_regrets=True)
+        elif self.update_rule == UpdateRule.DISCOUNTED:
+            alpha, beta, gamma = (self.discounts.alpha, self.discounts.beta,
+                                  self.discounts.gamma)
+            self.tables.discount(
+                self.tables.updated,
+                regret_discounts=(t**alpha/(t**alpha + 1), t**beta/(t**beta + 1)),
+                strategy_discount=(t/(t + 1))**gamma)
+
+    def _update_tables(self, params: UpdateTablesParams):
+        row = self.tables.add(params.infostate, params.actions)
+        regret_weight, strategy_weight = self._update_weights(params.iteration)
+        self.tables.update(
+            row, profile=params.profile, utilities=params.utilities,
+            node_utility=params.node_utility,
+            opponent_probability=regret_weight*params.probabilities.opponent_probability,
+            player_probability=strategy_weight*params.probabilities.player_probability)
 
     def solve(self, abstraction: Abstraction, turn_number: int,
               iterations: int = 100000):
@@ -488,12 +579,19 @@ class CFRTrainer:
         This runs the counterfactual regret minimization algorithm to produce
         the tables needed by the AI.
         """
+        if self.in_place:
+            # Keep the caller's board untouched while moving in place
+            abstraction = Abstraction(state=abstraction.state.copy(),
+                                      infostate=abstraction.infostate)
+        self.tables.updated = set()  # The rows of this solve, for discounting
+
         for i in range(iterations):
-            for player in [Player.BLUE, Player.RED]:
+            for player in self._traversing_players():
                 arguments = CFRParameters(abstraction=abstraction, current_player=player,
                                           iteration=i, blue_probability=1, red_probability=1,
                                           turn_number=turn_number)
                 self.cfr(params=arguments)
+            self._end_iteration(i)
 
 
 class DepthLimitedCFRTrainer(CFRTrainer):
@@ -501,14 +599,49 @@ class DepthLimitedCFRTrainer(CFRTrainer):
     This implements a modified CFR that recurses only to a specified depth and
     uses heuristic reward evaluations.
     """
+    SOLVE_ITERATIONS = 11  # Iterations per move of the CFRTrainingSimulator
+
+    def __init__(self, in_place: bool = False,
+                 transposition_table: TranspositionTable = None,
+                 update_rule: int = UpdateRule.VANILLA,
+                 discounts: DiscountParameters = None,
+                 simultaneous: bool = False, use_arena: bool = False,
+                 workers: int = 1, min_parallel_actions: int = 8,
+                 verbose: bool = True):
+        """
+        The transposition table caches node utilities within a bounded amount
+        of memory, and is kept across the searches of a game.
 
-    def __init__(self):
-        super().__init__()
+        With use_arena set, every search walks its tree once into a TreeArena,
+        and the iterations are run as array passes over the arena instead of
+        walking the boards and infostates again (see TreeArena class for
+        details).
+
+        With more than one worker, the subtrees of the root's children are
+        split across a pool of processes, as long as the root has at least
+        min_parallel_actions searched actions (see _split_cfr_children() for
+        details). The pool is started by the first parallel search and kept
+        until close() is called. The arena always runs serially.
+
+        With verbose set, the iteration numbers of every search are printed.
+        """
+        super().__init__(in_place=in_place, update_rule=update_rule,
+                         discounts=discounts, simultaneous=simultaneous)
+        self.use_arena = use_arena
+        self.workers = workers
+        self.min_parallel_actions = min_parallel_actions
+        self.verbose = verbose
+        self.executor = None
+        self.subtree_keys = None  # Table keys looked up below each root child
         self.vanilla_cfr = CFRTrainer()  # For accessing original implementation
-        self.memo_cache = {}
+        self.root_data_node = None  # Root of the last visualized tree
+        self.root_actions = None  # Searched actions of the last solved root
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self.transposition_table = transposition_table
 
     @staticmethod
-    def _get_actions_filter(arbiter_board: Board, previous_action: str, previous_result: str,
+    def _get_actions_filter(arbiter_board: Board, previous_action: int, previous_result: str,
                             attack_location: tuple[int, int]):
         reduced_branching, radius = 0, 1
         while reduced_branching <= 0:
@@ -516,7 +649,7 @@ class DepthLimitedCFRTrainer(CFRTrainer):
             if previous_result in [Result.WIN, Result.LOSS]:
                 center = attack_location
             elif attack_location is None:
-                center = (int(previous_action[0]), int(previous_action[1]))
+                center = Action.COORDINATES[Action.to_id(previous_action)][:2]
             else:
                 return None
 
@@ -527,11 +660,14 @@ class DepthLimitedCFRTrainer(CFRTrainer):
             reduced_branching = len(actions_filter.filter())
         return actions_filter
 
-    def _cfr_children(self, parameters: CFRParameters, profile: list[float], utilities: list[float],
-                      node_utility: float
-                      ):
-        state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
-        win_value = 1000000
+    @staticmethod
+    def _get_searched_actions(parameters: CFRParameters):
+        """
+        This obtains the filter of the node's actions, if any, and the actions
+        that pass it in the order of state.actions(). Only these actions are
+        searched and given rows in the tables.
+        """
+        state = parameters.abstraction.state
 
         actions_filter = None
         # Get new actions filter
@@ -550,33 +686,41 @@ class DepthLimitedCFRTrainer(CFRTrainer):
                                   for x in range(Board.ROWS)])
 
         if actions_filter is not None:
-            filtered_actions = actions_filter.filter()
-        else:
-            filtered_actions = None
+            return actions_filter, actions_filter.filter()
+        return None, state.actions()
 
-        for a, action in enumerate(state.actions()):
-            if filtered_actions is not None and action not in filtered_actions:
-                # Consider other actions to be losing
-                utilities[a] = -win_value
-                continue
-
-            new_state = state.transition(action)
-            result = state.classify_action_result(
-                action, new_state)
+    def _cfr_children(self, parameters: CFRParameters, actions: list[int],
+                      profile: list[float], utilities: list[float],
+                      node_utility: float, actions_filter: ActionsFilter = None):
+        state, infostate = parameters.abstraction.state, parameters.abstraction.infostate
 
-            if result in [Result.WIN, Result.LOSS]:
-                attack_location = (int(action[2]), int(action[3]))
-            else:
-                attack_location = None
+        if parameters.depth == 1 and not parameters.visualize:
+            # The children are leaves, so score them all without building them
+            return self._evaluate_leaf_children(
+                state=state, actions=actions, profile=profile,
+                utilities=utilities, node_utility=node_utility)
 
-            next_state, next_infostate = CFRTrainer._get_next(
-                state=state, infostate=infostate, action=action)
+        if parameters.split and len(actions) >= self.min_parallel_actions:
+            return self._split_cfr_children(
+                parameters=parameters, actions=actions, profile=profile,
+                utilities=utilities, node_utility=node_utility,
+                actions_filter=actions_filter)
 
+        for a, action in enumerate(actions):
+            # The probabilities are updated before the state moves in place
             new_blue_probability, new_red_probability = (
                 CFRTrainer._update_probabilities(
                     state=state, profile=profile, blue_probability=parameters.blue_probability,
                     red_probability=parameters.red_probability, action_index=a))
 
+            next_state, next_infostate, result, undo = self._advance(
+                state=state, infostate=infostate, action=action)
+
+            if result in [Result.WIN, Result.LOSS]:
+                attack_location = Action.COORDINATES[Action.to_id(action)][2:]
+            else:
+                attack_location = None
+
             arguments = CFRParameters(abstraction=Abstraction(
                 state=next_state, infostate=next_infostate),
                 current_player=parameters.current_player, iteration=parameters.iteration,
@@ -587,7 +731,149 @@ class DepthLimitedCFRTrainer(CFRTrainer):
                 parent_data_node=parameters.parent_data_node, action_taken=action)
 
             utilities[a] = -self.cfr(params=arguments)
+            CFRTrainer._retreat(state=state, undo=undo)
+
+            node_utility += profile[a]*utilities[a]
+
+        return node_utility, utilities
+
+    def _child(self, params: CFRParameters, action: int,
+               actions_filter: ActionsFilter, **changes):
+        """
+        This moves to the child of the node reached by the action, returning
+        the parameters of the child call and the undo record for _retreat.
+        The keyword arguments override the parameters of the child call.
+        """
+        state, infostate = params.abstraction.state, params.abstraction.infostate
+        next_state, next_infostate, result, undo = self._advance(
+            state=state, infostate=infostate, action=action)
+
+        if result in [Result.WIN, Result.LOSS]:
+            attack_location = Action.COORDINATES[action][2:]
+        else:
+            attack_location = None
+
+        arguments = replace(
+            params, abstraction=Abstraction(state=next_state,
+                                            infostate=next_infostate),
+            depth=params.depth - 1, actions_filter=actions_filter,
+            previous_action=action, previous_result=result,
+            attack_location=attack_location,
+            turn_number=params.turn_number + 1, action_taken=action, **changes)
+
+        return arguments, undo
+
+    def _split_cfr_children(self, parameters: CFRParameters, actions: list[int],
+                            profile: list[float], utilities: list[float],
+                            node_utility: float, actions_filter: ActionsFilter):
+        """
+        This traverses the children of the root with the pool of workers. The
+        children are cut into one contiguous chunk per worker, and each worker
+        gets copies of the child states and a snapshot of the table rows its
+        subtrees look up. The workers return the utilities of the children and
+        the changes of the rows, which are merged in chunk order, so the
+        result does not depend on the timing of the workers.
+
+        The rows looked up below every child are recorded by traversing the
+        children serially the first time in every search. Subtrees reading
+        rows that other chunks update see them as of the start of the
+        traversal.
+        """
+        state = parameters.abstraction.state
+
+        children = []
+        for a, action in enumerate(actions):
+            new_blue_probability, new_red_probability = (
+                CFRTrainer._update_probabilities(
+                    state=state, profile=profile, blue_probability=parameters.blue_probability,
+                    red_probability=parameters.red_probability, action_index=a))
+            arguments, undo = self._child(
+                parameters, action, actions_filter,
+                blue_probability=new_blue_probability,
+                red_probability=new_red_probability, split=False)
+            if undo is not None:
+                # The children need boards of their own
+                arguments = replace(arguments, abstraction=Abstraction(
+                    state=arguments.abstraction.state.copy(),
+                    infostate=arguments.abstraction.infostate))
+                CFRTrainer._retreat(state=state, undo=undo)
+            children.append(arguments)
+
+        if self.subtree_keys is None:
+            self.subtree_keys = []
+            for a, arguments in enumerate(children):
+                self.tables.lookups = set()
+                utilities[a] = -self.cfr(params=arguments)
+                self.subtree_keys.append(self.tables.lookups)
+            self.tables.lookups = None
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            settings = {"in_place": self.in_place,
+                        "update_rule": self.update_rule,
+                        "discounts": self.discounts,
+                        "simultaneous": self.simultaneous}
+            bounds = [len(children)*w//self.workers
+                      for w in range(self.workers + 1)]
+            chunks = [(start, end) for start, end in zip(bounds, bounds[1:])
+                      if start < end]
+            futures = [self.executor.submit(
+                DepthLimitedCFRTrainer._solve_subtrees, type(self), settings,
+                self.tables.snapshot(set().union(*self.subtree_keys[start:end])),
+                children[start:end]) for start, end in chunks]
+
+            for (start, end), future in zip(chunks, futures):
+                chunk_utilities, changes, lookups = future.result()
+                utilities[start:end] = chunk_utilities
+                self.tables.merge(changes)
+                for a, keys in enumerate(lookups, start=start):
+                    self.subtree_keys[a] |= keys
+
+        for a in range(len(actions)):
+            node_utility += profile[a]*utilities[a]
+
+        return node_utility, utilities
+
+    @staticmethod
+    def _solve_subtrees(trainer_class: type, settings: dict, snapshot: dict,
+                        children: list[CFRParameters]):
+        """
+        This traverses a chunk of the root's children in a worker process,
+        with a trainer whose tables start from the snapshot. It returns the
+        utilities of the children, the changes of the tables and the table
+        keys looked up below every child.
+        """
+        trainer = trainer_class(**settings)
+        trainer.tables.load(snapshot)
+
+        utilities, lookups = [], []
+        for arguments in children:
+            trainer.tables.lookups = set()
+            utilities.append(-trainer.cfr(params=arguments))
+            lookups.append(trainer.tables.lookups)
 
+        return utilities, trainer.tables.deltas(snapshot), lookups
+
+    def close(self):
+        """
+        This shuts down the pool of workers, if it was started.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    @staticmethod
+    def _evaluate_leaf_children(state: Board, actions: list[int],
+                                profile: list[float], utilities: list[float],
+                                node_utility: float):
+        """
+        This fills in the utilities of the children of a node one step above
+        the depth limit, whose values are just their evaluations.
+        """
+        values = state.evaluate_children(actions)[0]
+
+        for a, value in enumerate(values):
+            utilities[a] = -value
             node_utility += profile[a]*utilities[a]
 
         return node_utility, utilities
@@ -601,83 +887,144 @@ class DepthLimitedCFRTrainer(CFRTrainer):
             params.red_probability, params.depth
         )
 
-        key = (abstraction.infostate, depth, abstraction.state.player_to_move)
-        if params.iteration > 1 and key in self.memo_cache:
-            return self.memo_cache[key]
+        # The infostate hash also covers the player to move
+        zobrist = abstraction.infostate.zobrist
+        if params.iteration > 1:
+            cached_utility = self.transposition_table.get(zobrist, depth)
+            if cached_utility is not None:
+                return cached_utility
 
         player_probability, opponent_probability = CFRTrainer._probabilities(
             current_player=abstraction.state.player_to_move, blue_probability=blue_probability,
             red_probability=red_probability)
 
+        data_node = None  # Node of the visualized tree, if any
+        if params.visualize:
+            from anytree import Node
+
         if params.visualize and params.parent_data_node is not None:
             data_node = Node(
                 f"Utility: Unknown\n{opponent_probability*100}%",
                 parent=params.parent_data_node
             )
-            params.data_node = data_node
         elif params.visualize and params.parent_data_node is None:
             data_node = Node(
                 f"Utility: Unknown\n{opponent_probability*100}%"
             )
-            params.data_node = data_node
+            self.root_data_node = data_node
 
         if abstraction.state.is_terminal():
             node_utility = abstraction.state.reward()
 
-            if (params.visualize and params.data_node is not None
-                    and params.action_taken is not None):
-                params.data_node.name = (
-                    f"{params.action_taken}\n"
+            if data_node is not None and params.action_taken is not None:
+                data_node.name = (
+                    f"{Action.to_string(params.action_taken)}\n"
                     f"Utility: {node_utility:.2f}\n{opponent_probability*100}%")
 
-            self.memo_cache[key] = node_utility
+            self.transposition_table.store(zobrist, depth, node_utility)
             return node_utility
 
         if depth == 0:
             node_utility = abstraction.state.evaluation()
 
-            if params.visualize and params.data_node is not None:
-                params.data_node.name = (
-                    f"{params.action_taken}\n"
+            if data_node is not None:
+                data_node.name = (
+                    f"{Action.to_string(params.action_taken)}\n"
                     f"Utility: {node_utility:.2f}\n{opponent_probability*100}%")
 
-            self.memo_cache[key] = node_utility
+            self.transposition_table.store(zobrist, depth, node_utility)
             return node_utility
 
-        node_utility, utilities = CFRTrainer._initialize_utilities(
-            state=abstraction.state)
+        actions_filter, actions = DepthLimitedCFRTrainer._get_searched_actions(
+            params)
+        node_utility, utilities = CFRTrainer._initialize_utilities(actions)
 
-        regret_table, strategy_table, profile = self._get_tables(
-            state=abstraction.state, infostate=abstraction.infostate)
+        profile = self._get_profile(infostate=abstraction.infostate,
+                                    actions=actions)
 
-        new_params = copy.deepcopy(params)
-        if params.visualize and params.data_node is not None:
-            new_params.parent_data_node = data_node
+        # Only the parent node of the visualized tree changes for the children
+        new_params = params
+        if data_node is not None:
+            new_params = replace(params, parent_data_node=data_node)
 
-        node_utility, utilities = self._cfr_children(parameters=new_params, profile=profile,
-                                                     utilities=utilities, node_utility=node_utility)
+        node_utility, utilities = self._cfr_children(
+            parameters=new_params, actions=actions, profile=profile,
+            utilities=utilities, node_utility=node_utility,
+            actions_filter=actions_filter)
 
-        if abstraction.state.player_to_move == current_player:
+        if CFRTrainer._is_updated(abstraction.state, current_player):
             self._update_tables(
                 UpdateTablesParams(
-                    state=abstraction.state,
-                    tables=Tables(
-                        regret_table=regret_table,
-                        strategy_table=strategy_table), profile=profile, utilities=utilities,
-                    node_utility=node_utility,
+                    state=abstraction.state, actions=actions, profile=profile,
+                    utilities=utilities, node_utility=node_utility,
                     probabilities=Probabilities(
                         opponent_probability=opponent_probability,
-                        player_probability=player_probability), infostate=abstraction.infostate))
+                        player_probability=player_probability), infostate=abstraction.infostate,
+                    iteration=params.iteration))
 
-        if params.visualize and params.data_node is not None:
-            params.data_node.name = f"Utility: {node_utility:.2f}\n{opponent_probability*100}%"
+        if data_node is not None:
+            data_node.name = f"Utility: {node_utility:.2f}\n{opponent_probability*100}%"
 
             if params.action_taken is not None:
-                params.data_node.name = f"{params.action_taken}\n" + \
-                    params.data_node.name
+                data_node.name = f"{Action.to_string(params.action_taken)}\n" + \
+                    data_node.name
 
         return node_utility
 
+    def _materialize(self, params: CFRParameters, arena: 'TreeArena',
+                     parent: int = -1, index: int = 0):
+        """
+        This adds the node and its subtree to the arena, with the same actions
+        filters, depth limit and leaf values as cfr(), and gives every
+        decision node its rows in the tables.
+        """
+        state, infostate = params.abstraction.state, params.abstraction.infostate
+
+        if state.is_terminal():
+            arena.add(parent, index, state.player_to_move, value=state.reward())
+            return
+        if params.depth == 0:
+            arena.add(parent, index, state.player_to_move,
+                      value=state.evaluation())
+            return
+
+        actions_filter, actions = DepthLimitedCFRTrainer._get_searched_actions(
+            params)
+        node = arena.add(parent, index, state.player_to_move,
+                         row=self.tables.add(infostate, actions))
+
+        if params.depth == 1:
+            # The children are leaves, so score them all without building them
+            for a, value in enumerate(state.evaluate_children(actions)[0]):
+                arena.add(node, a, Player.ARBITER, value=value)
+            return
+
+        for a, action in enumerate(actions):
+            arguments, undo = self._child(params, action, actions_filter)
+            self._materialize(arguments, arena, parent=node, index=a)
+            CFRTrainer._retreat(state=state, undo=undo)
+
+    def _solve_arena(self, arguments: CFRParameters, iterations: int):
+        """
+        This runs the iterations of a search as passes over its arena.
+        """
+        from OLA.arena import TreeArena
+        arena = TreeArena()
+        self._materialize(arguments, arena)
+        arena.freeze(self.tables)
+
+        for i in range(iterations):
+            if self.verbose:
+                print(f"{i} ", end='', flush=True)
+            regret_weight, strategy_weight = self._update_weights(i)
+            for player in self._traversing_players():
+                arena.iterate(self.tables, current_player=player,
+                              regret_weight=regret_weight,
+                              strategy_weight=strategy_weight)
+            self._end_iteration(i)
+        if self.verbose:
+            print()
+
     def _depth_limited_utility(self, state: Board, current_player: int):
         if state.player_to_move == current_player:
             return state.evaluation()
@@ -685,7 +1032,7 @@ class DepthLimitedCFRTrainer(CFRTrainer):
 
     def solve(self, abstraction: Abstraction, turn_number: int,
               iterations: int = 10, depth: int = 2,
-              actions_filter: ActionsFilter = None, previous_action: str = None,
+              actions_filter: ActionsFilter = None, previous_action: int = None,
               previous_result: str = None, attack_location: tuple[int, int] = None):
         """
         This runs the counterfactual regret minimization algorithm to produce
@@ -694,14 +1041,29 @@ class DepthLimitedCFRTrainer(CFRTrainer):
 
         visualize = False
 
-        # To avoid running out of memory
-        self.memo_cache = {}
+        if self.in_place:
+            # Keep the caller's board untouched while moving in place
+            abstraction = Abstraction(state=abstraction.state.copy(),
+                                      infostate=abstraction.infostate)
+        self.tables.updated = set()  # The rows of this solve, for discounting
+
+        self.subtree_keys = None  # The tree differs between searches
+        if self.use_arena:
+            arguments = CFRParameters(abstraction=abstraction, current_player=None,
+                                      iteration=0, blue_probability=1, red_probability=1,
+                                      depth=depth, actions_filter=actions_filter,
+                                      turn_number=turn_number, previous_action=previous_action,
+                                      previous_result=previous_result,
+                                      attack_location=attack_location)
+            self._solve_arena(arguments, iterations)
+            self.root_actions = DepthLimitedCFRTrainer._get_searched_actions(
+                arguments)[1]
+            return
 
         for i in range(iterations):
-            depth = 2
-
-            print(f"{i} ", end='', flush=True)
-            for player in [Player.BLUE, Player.RED]:
+            if self.verbose:
+                print(f"{i} ", end='', flush=True)
+            for player in self._traversing_players():
 
                 if (i == iterations - 1
                         and abstraction.state.player_to_move == player):
@@ -714,16 +1076,227 @@ class DepthLimitedCFRTrainer(CFRTrainer):
                                           turn_number=turn_number, previous_action=previous_action,
                                           previous_result=previous_result,
                                           attack_location=attack_location,
-                                          visualize=visualize)
+                                          visualize=visualize,
+                                          split=self.workers > 1 and not visualize)
 
                 self.cfr(params=arguments)
+                self.root_actions = DepthLimitedCFRTrainer._get_searched_actions(
+                    arguments)[1]
 
                 if (visualize and i == iterations - 1
                         and abstraction.state.player_to_move == player):
-                    UniqueDotExporter(arguments.data_node).to_picture(
+                    # Graphviz has to be installed
+                    from anytree.exporter import UniqueDotExporter
+                    UniqueDotExporter(self.root_data_node).to_picture(
                         "/home/romlor/Desktop/cfr.png")
+            self._end_iteration(i)
 
-        print()
+        if self.verbose:
+            print()
+
+
+class MCCFRTrainer(DepthLimitedCFRTrainer):
+    """
+    This is the base of the Monte Carlo CFR trainers, which sample actions
+    instead of expanding every action at every node. They share the actions
+    filters, depth limit and evaluation leaves of the depth-limited trainer,
+    so far more iterations fit in the same time. Sampling is defined per
+    traversing player, so these always alternate the players and never use
+    the arena.
+    """
+    SOLVE_ITERATIONS = 200
+
+    def _update_sampled_regrets(self, row: int, profile: list[float],
+                                utilities: list[float], node_utility: float,
+                                iteration: int):
+        """
+        This updates the regrets of a node of the traversing player with
+        sampled values, which are already weighted by the opponent's policy,
+        following the update rule.
+        """
+        regret_weight, _ = self._update_weights(iteration)
+        self.tables.update(row, profile=profile, utilities=utilities,
+                           node_utility=node_utility,
+                           opponent_probability=regret_weight,
+                           player_probability=0.0)
+
+    def _accumulate_sampled_strategy(self, row: int, profile: list[float],
+                                     weight: float, iteration: int):
+        """
+        This accumulates the strategy of a node of the opponent, following the
+        update rule.
+        """
+        _, strategy_weight = self._update_weights(iteration)
+        self.tables.accumulate_strategy(row, profile=profile,
+                                        weight=strategy_weight*weight)
+
+    @staticmethod
+    def _sample(weights: list[float]):
+        """
+        This samples the index of an action weighted by the given policy.
+        """
+        return random.choices(range(len(weights)), weights=weights, k=1)[0]
+
+    def solve(self, abstraction: Abstraction, turn_number: int,
+              iterations: int = SOLVE_ITERATIONS, depth: int = 2,
+              actions_filter: ActionsFilter = None, previous_action: int = None,
+              previous_result: str = None, attack_location: tuple[int, int] = None):
+        """
+        This runs the sampling iterations, alternating the traversing player,
+        to produce the tables needed by the AI.
+        """
+        if self.in_place:
+            # Keep the caller's board untouched while moving in place
+            abstraction = Abstraction(state=abstraction.state.copy(),
+                                      infostate=abstraction.infostate)
+        self.tables.updated = set()  # The rows of this solve, for discounting
+
+        for i in range(iterations):
+            for player in [Player.BLUE, Player.RED]:
+                arguments = CFRParameters(abstraction=abstraction, current_player=player,
+                                          iteration=i, blue_probability=1, red_probability=1,
+                                          depth=depth, actions_filter=actions_filter,
+                                          turn_number=turn_number, previous_action=previous_action,
+                                          previous_result=previous_result,
+                                          attack_location=attack_location)
+                self.cfr(params=arguments)
+            self._end_iteration(i)
+
+        self.root_actions = DepthLimitedCFRTrainer._get_searched_actions(
+            arguments)[1]
+
+
+class ExternalSamplingCFRTrainer(MCCFRTrainer):
+    """
+    This implements external sampling MCCFR. Every action of the traversing
+    player is expanded, while a single action of the opponent is sampled from
+    the current profile, whose average is accumulated on the way.
+    """
+
+    def cfr(self, params: CFRParameters):
+        """
+        This samples the counterfactual values of one traversal, returning the
+        utility of the node for the player to move.
+        """
+        state, infostate = params.abstraction.state, params.abstraction.infostate
+
+        if state.is_terminal():
+            return state.reward()
+        if params.depth == 0:
+            return state.evaluation()
+
+        actions_filter, actions = DepthLimitedCFRTrainer._get_searched_actions(
+            params)
+        profile = self._get_profile(infostate=infostate, actions=actions)
+
+        if state.player_to_move != params.current_player:
+            self._accumulate_sampled_strategy(
+                self.tables.add(infostate, actions), profile=profile,
+                weight=1.0, iteration=params.iteration)
+            action = actions[MCCFRTrainer._sample(profile)]
+            arguments, undo = self._child(params, action, actions_filter)
+            node_utility = -self.cfr(params=arguments)
+            CFRTrainer._retreat(state=state, undo=undo)
+            return node_utility
+
+        node_utility, utilities = CFRTrainer._initialize_utilities(actions)
+        if params.depth == 1:
+            node_utility, utilities = self._evaluate_leaf_children(
+                state=state, actions=actions, profile=profile,
+                utilities=utilities, node_utility=node_utility)
+        else:
+            for a, action in enumerate(actions):
+                arguments, undo = self._child(params, action, actions_filter)
+                utilities[a] = -self.cfr(params=arguments)
+                CFRTrainer._retreat(state=state, undo=undo)
+                node_utility += profile[a]*utilities[a]
+
+        self._update_sampled_regrets(
+            self.tables.add(infostate, actions), profile=profile,
+            utilities=utilities, node_utility=node_utility,
+            iteration=params.iteration)
+
+        return node_utility
+
+
+class OutcomeSamplingCFRTrainer(MCCFRTrainer):
+    """
+    This implements outcome sampling MCCFR. A single action is sampled at
+    every node, so each traversal follows one path to a leaf. The traversing
+    player explores with probability epsilon, and the sampled values are
+    corrected by the probability of sampling the path.
+    """
+    SOLVE_ITERATIONS = 2000
+
+    def __init__(self, in_place: bool = False,
+                 transposition_table: TranspositionTable = None,
+                 update_rule: int = UpdateRule.VANILLA,
+                 discounts: DiscountParameters = None, epsilon: float = 0.6,
+                 verbose: bool = True):
+        super().__init__(in_place=in_place,
+                         transposition_table=transposition_table,
+                         update_rule=update_rule, discounts=discounts,
+                         verbose=verbose)
+        self.epsilon = epsilon
+
+    def cfr(self, params: CFRParameters):
+        """
+        This samples one path from the node, returning the utility of the leaf
+        for the player to move divided by the probability of sampling the
+        path, and the probability of the current profile playing the path from
+        the node.
+        """
+        state, infostate = params.abstraction.state, params.abstraction.infostate
+
+        if state.is_terminal():
+            return state.reward()/params.sample_probability, 1.0
+        if params.depth == 0:
+            return state.evaluation()/params.sample_probability, 1.0
+
+        actions_filter, actions = DepthLimitedCFRTrainer._get_searched_actions(
+            params)
+        profile = self._get_profile(infostate=infostate, actions=actions)
+        traversing = state.player_to_move == params.current_player
+
+        if traversing:
+            exploration = self.epsilon/len(actions)
+            policy = [exploration + (1 - self.epsilon)*probability
+                      for probability in profile]
+        else:
+            policy = profile
+        a = MCCFRTrainer._sample(policy)
+
+        blue_probability, red_probability = CFRTrainer._update_probabilities(
+            state=state, profile=profile, blue_probability=params.blue_probability,
+            red_probability=params.red_probability, action_index=a)
+        arguments, undo = self._child(
+            params, actions[a], actions_filter, blue_probability=blue_probability,
+            red_probability=red_probability,
+            sample_probability=params.sample_probability*policy[a])
+        child_utility, tail_probability = self.cfr(params=arguments)
+        CFRTrainer._retreat(state=state, undo=undo)
+        node_utility = -child_utility
+
+        _, opponent_probability = CFRTrainer._probabilities(
+            current_player=params.current_player,
+            blue_probability=params.blue_probability,
+            red_probability=params.red_probability)
+        row = self.tables.add(infostate, actions)
+        if traversing:
+            # Only the sampled action has a nonzero sampled value
+            value = node_utility*opponent_probability*tail_probability
+            utilities = [0.0]*len(actions)
+            utilities[a] = value
+            self._update_sampled_regrets(
+                row, profile=profile, utilities=utilities,
+                node_utility=value*profile[a], iteration=params.iteration)
+        else:
+            self._accumulate_sampled_strategy(
+                row, profile=profile,
+                weight=opponent_probability/params.sample_probability,
+                iteration=params.iteration)
+
+        return node_utility, tail_probability*profile[a]
 
 
 class RepetitionDetector:
@@ -746,6 +1319,40 @@ class RepetitionDetector:
         self.recent_sequences.clear()
 
 
+@dataclass
+class GameProgress:
+    """
+    This is for storing a game of the CFRTrainingSimulator in progress, along
+    with the trainer whose tables and the rank beliefs that are carried
+    across its moves.
+    """
+    arbiter_board: Board
+    blue_infostate: Infostate
+    red_infostate: Infostate
+    detector: RepetitionDetector
+    trainer: DepthLimitedCFRTrainer = None
+    beliefs: tuple[RankBeliefs, RankBeliefs] = None
+    turn_number: int = 1
+    previous_action: int = None
+    previous_result: str = None
+    attack_location: tuple[int, int] = None
+
+
+@dataclass
+class GenerationCheckpoint:
+    """
+    This is for storing the progress of a data generation run: the number of
+    samples generated, the state of the random number generator and the size
+    of the output file, beyond which rows are discarded when resuming. The
+    game in progress is only stored by the checkpoints that include the
+    tables.
+    """
+    sampled: int
+    random_state: tuple
+    output_size: int
+    game: GameProgress = None
+
+
 class CFRTrainingSimulator(MatchSimulator):
     """
     This handles the game simulations for generating the AI's training data. The
@@ -754,9 +1361,30 @@ class CFRTrainingSimulator(MatchSimulator):
     """
 
     def __init__(self, formations: list[list[int]], controllers: list[int],
-                 save_data: bool, pov: int):
+                 save_data: bool, pov: int,
+                 trainer_class: type = DepthLimitedCFRTrainer,
+                 output_path: str = "training_data.csv", verbose: bool = True,
+                 checkpoint_path: str = None, checkpoint_interval: int = 100,
+                 checkpoint_tables: bool = False):
+        """
+        The trainer class chooses between the full-width depth-limited trainer
+        and the sampling trainers, each solving every move with its own
+        SOLVE_ITERATIONS. The samples are appended to the CSV file at the
+        output path, and the games are only printed when verbose is set.
+
+        With a checkpoint path, the progress is pickled there about every
+        interval of samples (see generate() for details). Checkpoints that
+        include the tables also store the game in progress with its trainer,
+        so they can be taken in the middle of a game, at the cost of size.
+        """
         super().__init__(formations, controllers, save_data, pov)
         self.controllers = None
+        self.trainer_class = trainer_class
+        self.output_path = output_path
+        self.verbose = verbose
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_tables = checkpoint_tables
 
     @staticmethod
     def _distill_strategy(raw_strategy: list[float]):
@@ -773,8 +1401,26 @@ class CFRTrainingSimulator(MatchSimulator):
 
         return normalized_strategy
 
+    @staticmethod
+    def _prune_strategy(strategy: list[float], bottom_k: int = 3):
+        """
+        This sets the bottom_k lowest nonzero probabilities of a strategy to 0,
+        always keeping the most likely action, and normalizes the rest.
+        """
+        nonzero = sorted((probability, i) for i, probability in enumerate(strategy)
+                         if probability > 0)
+        pruned = strategy[:]
+        for _, i in nonzero[:min(bottom_k, len(nonzero) - 1)]:
+            pruned[i] = 0.0
+
+        normalizing_sum = sum(pruned)
+        if normalizing_sum > 0:
+            pruned = [probability/normalizing_sum for probability in pruned]
+
+        return pruned
+
     def get_cfr_input(self, abstraction: Abstraction, turn_number: int,
-                      actions_filter: ActionsFilter = None, previous_action: str = None,
+                      actions_filter: ActionsFilter = None, previous_action: int = None,
                       previous_result: str = None, attack_location: tuple[int, int] = None,
                       trainer: DepthLimitedCFRTrainer = None):
         """This is for obtaining the CFR controller's chosen action"""
@@ -783,22 +1429,22 @@ class CFRTrainingSimulator(MatchSimulator):
         action = ""
 
         if trainer is None:
-            trainer = DepthLimitedCFRTrainer()
+            trainer = self.trainer_class(verbose=self.verbose)
 
-        trainer.solve(abstraction, iterations=11, actions_filter=actions_filter,
+        trainer.solve(abstraction, iterations=trainer.SOLVE_ITERATIONS,
+                      actions_filter=actions_filter,
                       turn_number=turn_number, previous_action=previous_action,
                       previous_result=previous_result, attack_location=attack_location)
 
-        strategy = CFRTrainingSimulator._distill_strategy(
-            trainer.strategy_tables[str(abstraction.infostate)])
-
-        # Set the bottom_k lowest probabilities to 0
-        bottom_k = 3
-        for _ in range(bottom_k):
-            threshold = min(strategy)
-            for i, probability in enumerate(strategy):
-                if probability <= threshold:
-                    strategy[i] = 0
+        # The tables only cover the searched actions, which are pruned before
+        # being spread over the valid actions
+        searched_strategy = CFRTrainingSimulator._prune_strategy(
+            CFRTrainingSimulator._distill_strategy(
+                trainer.cumulative_strategy(abstraction.infostate,
+                                            trainer.root_actions)))
+        strategy = [0.0]*len(valid_actions)
+        for action, probability in zip(trainer.root_actions, searched_strategy):
+            strategy[valid_actions.index(action)] = probability
 
         normalizing_sum = sum(strategy)
         if normalizing_sum > 0:
@@ -839,7 +1485,7 @@ class CFRTrainingSimulator(MatchSimulator):
             if previous_result in [Result.WIN, Result.LOSS]:
                 center = attack_location
             elif attack_location is None:
-                center = (int(previous_action[0]), int(previous_action[1]))
+                center = Action.COORDINATES[Action.to_id(previous_action)][:2]
             else:
                 return None
 
@@ -858,129 +1504,403 @@ class CFRTrainingSimulator(MatchSimulator):
             self.game_history.append(arbiter_board.matrix)
         return arbiter_board
 
-    def _process_action(self, arbiter_board: Board, action: str):
-        new_arbiter_board = arbiter_board.transition(action)
-        result = arbiter_board.classify_action_result(
-            action, new_arbiter_board)
+    def _process_action(self, arbiter_board: Board, action: int):
+        new_arbiter_board, result = arbiter_board.transition_with_result(action)
         if result in [Result.WIN, Result.LOSS]:
-            attack_location = (int(action[2]), int(action[3]))
+            attack_location = Action.COORDINATES[Action.to_id(action)][2:]
         else:
             attack_location = None
         return new_arbiter_board, result, attack_location
 
     @staticmethod
     def _save_strategy_to_csv(current_abstraction: Abstraction,
-                              trainer: DepthLimitedCFRTrainer):
-        # Map the strategy to all possible actions
-        fullgame_actions = TimelessBoard.actions()
+                              trainer: DepthLimitedCFRTrainer,
+                              output_path: str = "training_data.csv"):
+        # Map the strategy to all possible actions, whose columns are ordered
+        # by action id
         strategy = CFRTrainingSimulator._distill_strategy(
-            raw_strategy=trainer.strategy_tables[str(current_abstraction.infostate)])
+            raw_strategy=trainer.cumulative_strategy(
+                current_abstraction.infostate, trainer.root_actions))
         # Initialize the full size strategy
-        full_strategy = [0.0 for a in range(len(fullgame_actions))]
-        for action in current_abstraction.state.actions():
-            full_strategy[fullgame_actions.index(action)] = strategy[
-                current_abstraction.state.actions().index(action)]
+        full_strategy = [0.0 for a in range(Action.COUNT)]
+        for a, action in enumerate(trainer.root_actions):
+            full_strategy[action] = strategy[a]
 
         # Store the infostate string with the corresponding strategy in a CSV file
-        with open("training_data.csv", "a", encoding="utf-8") as training_data:
+        with open(output_path, "a", encoding="utf-8") as training_data:
             writer = csv.writer(training_data)
-            # Split the infostate string
-            infostate_split = list(
-                map(int, str(current_abstraction.infostate).split(" ")))
-            writer.writerow(infostate_split + full_strategy)
+            # The integers of the infostate string, without building it
+            writer.writerow(list(current_abstraction.infostate.vector)
+                            + full_strategy)
 
-    def start(self, iterations: int = 1, target: int = None):
+    @staticmethod
+    def _sample_count(sampled: int, counter: 'multiprocessing.Value' = None):
         """
-        This method simulates a GG match generating training data, using the
-        counterfactual regret minimization algorithm.
+        This obtains the number of samples generated so far, by all the
+        workers sharing the counter if there is one.
         """
-        trainer = None
-        start = time.time()
-        _ = iterations  # Not used in this subclass
-        sampled = 0  # Initialize data sample count
+        if counter is None:
+            return sampled
 
-        while target is not None and sampled < target:
-            self.blue_formation = list(
-                Player.get_sensible_random_formation(
-                    piece_list=Ranking.SORTED_FORMATION)
-            )
-            self.red_formation = self._place_in_red_range(list(
-                Player.get_sensible_random_formation(
-                    piece_list=Ranking.SORTED_FORMATION))
-            )
+        return counter.value
 
-            arbiter_board = self._initialize_arbiter_board()
-            blue_infostate, red_infostate = MatchSimulator._starting_infostates(
-                arbiter_board)
+    def _new_game(self):
+        """
+        This samples the formations of a new game and sets up its board.
+        """
+        self.blue_formation = list(
+            Player.get_sensible_random_formation(
+                piece_list=Ranking.SORTED_FORMATION)
+        )
+        self.red_formation = self._place_in_red_range(list(
+            Player.get_sensible_random_formation(
+                piece_list=Ranking.SORTED_FORMATION))
+        )
 
-            action, result, previous_action, previous_result, attack_location = (
-                "", "", None, None, None)  # Initialize needed values
-            trainer = None
-            turn_number = 1
+        arbiter_board = self._initialize_arbiter_board()
+        blue_infostate, red_infostate = MatchSimulator._starting_infostates(
+            arbiter_board)
 
-            detector = RepetitionDetector()  # For detecting repetition of moves
+        # The repetition detector catches de facto draws
+        return GameProgress(arbiter_board=arbiter_board,
+                            blue_infostate=blue_infostate,
+                            red_infostate=red_infostate,
+                            detector=RepetitionDetector(),
+                            beliefs=MatchSimulator._starting_beliefs(
+                                blue_infostate, red_infostate))
 
-            while not arbiter_board.is_terminal():
-                MatchSimulator._print_game_status(turn_number, arbiter_board, infostates=[
-                    blue_infostate, red_infostate],
-                    pov=self.pov)
+    def _write_checkpoint(self, sampled: int, game: 'GameProgress' = None):
+        """
+        This atomically replaces the checkpoint with the current progress,
+        after making the rows written so far durable.
+        """
+        output_size = 0
+        if os.path.exists(self.output_path):
+            with open(self.output_path, "a", encoding="utf-8") as training_data:
+                os.fsync(training_data.fileno())
+            output_size = os.path.getsize(self.output_path)
+        checkpoint = GenerationCheckpoint(
+            sampled=sampled, random_state=random.getstate(),
+            output_size=output_size, game=game)
+
+        temporary_path = self.checkpoint_path + ".tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _load_checkpoint(self):
+        """
+        This restores the random number generator from the checkpoint, if
+        there is one, and discards the rows written after it. It returns the
+        checkpoint, or None if there is none.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "rb") as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
 
-                print(f"Naive Evaluation: {arbiter_board.evaluation()}")
+        random.setstate(checkpoint.random_state)
+        if os.path.exists(self.output_path):
+            os.truncate(self.output_path, checkpoint.output_size)
+
+        return checkpoint
+
+    def generate(self, target: int, counter: 'multiprocessing.Value' = None,
+                 stop: 'multiprocessing.Event' = None, resume: bool = False):
+        """
+        This plays games until the target number of samples is reached,
+        finishing the game in progress, and returns the number of samples it
+        generated. The workers of a SelfPlayCoordinator instead share a
+        counter, reserving a sample from it before every move, and stop in the
+        middle of a game once the target is reached or the stop event is set.
+
+        With a checkpoint path, the progress is checkpointed when generation
+        starts, at the end of the first game after every interval of samples,
+        or right after the sample if the checkpoints include the tables, and
+        when generation stops. Without the tables, a game stopped in the middle
+        is not checkpointed, and is replayed from the checkpoint before it. With
+        resume set, generation continues from the checkpoint, if there is one,
+        and the samples already generated count towards the target.
+        """
+        sampled, game, checkpoint = 0, None, None  # Initialize data sample count
+        if resume and self.checkpoint_path is not None:
+            checkpoint = self._load_checkpoint()
+            if checkpoint is not None:
+                sampled, game = checkpoint.sampled, checkpoint.game
+        if self.checkpoint_path is not None and checkpoint is None:
+            # Replaces any checkpoint of an earlier run
+            self._write_checkpoint(sampled)
+        checkpointed = sampled  # Sample count of the last checkpoint
+
+        while game is not None or (
+                target is not None
+                and CFRTrainingSimulator._sample_count(sampled, counter) < target
+                and (stop is None or not stop.is_set())):
+            if game is None:
+                game = self._new_game()
+
+            interrupted = False
+            while not game.arbiter_board.is_terminal():
+                if stop is not None and stop.is_set():
+                    interrupted = True
+                    break
+                if counter is not None:
+                    with counter.get_lock():
+                        interrupted = counter.value >= target
+                        if not interrupted:
+                            counter.value += 1
+                    if interrupted:
+                        break
+
+                arbiter_board = game.arbiter_board
+                if self.verbose:
+                    MatchSimulator._print_game_status(game.turn_number, arbiter_board, infostates=[
+                        game.blue_infostate, game.red_infostate],
+                        pov=self.pov)
+
+                    print(f"Naive Evaluation: {arbiter_board.evaluation()}")
 
                 action = ""  # Initialize variable for storing chosen action
-                current_infostate = (blue_infostate if arbiter_board.player_to_move == Player.BLUE
-                                     else red_infostate)
+                current_infostate = (game.blue_infostate if arbiter_board.player_to_move == Player.BLUE
+                                     else game.red_infostate)
                 current_abstraction = Abstraction(
                     state=arbiter_board, infostate=current_infostate)
 
                 # For the first turns of each player, choose a forward move
-                if turn_number in [1, 2]:
+                if game.turn_number in [1, 2]:
                     actions_filter = ActionsFilter(state=arbiter_board, directions=DirectionFilter(
                         back=False, right=False, left=False),
                         square_whitelist=[(x, y) for y in range(Board.COLUMNS)
                                           for x in range(Board.ROWS)])
                 else:
                     actions_filter = CFRTrainingSimulator._get_actions_filter(
-                        arbiter_board, previous_action, previous_result, attack_location)
+                        arbiter_board, game.previous_action, game.previous_result,
+                        game.attack_location)
 
-                action, trainer, chance = self.get_cfr_input(abstraction=current_abstraction,
-                                                             actions_filter=actions_filter,
-                                                             turn_number=turn_number,
-                                                             previous_action=previous_action,
-                                                             previous_result=previous_result,
-                                                             attack_location=attack_location,
-                                                             trainer=trainer)
+                action, game.trainer, chance = self.get_cfr_input(
+                    abstraction=current_abstraction, actions_filter=actions_filter,
+                    turn_number=game.turn_number, previous_action=game.previous_action,
+                    previous_result=game.previous_result,
+                    attack_location=game.attack_location, trainer=game.trainer)
 
-                print(f"Chosen Move: {action}")
-                print(f"{chance*100:.5f}% chance")
+                if self.verbose:
+                    print(f"Chosen Move: {Action.to_string(action)}")
+                    print(f"{chance*100:.5f}% chance")
 
-                previous_action = action  # Store for the next iteration
+                game.previous_action = action  # Store for the next iteration
 
-                arbiter_board, result, attack_location = self._process_action(
+                game.arbiter_board, result, game.attack_location = self._process_action(
                     arbiter_board, action)
 
-                previous_result = result  # Store for the next iteration
+                game.previous_result = result  # Store for the next iteration
 
-                blue_infostate, red_infostate = MatchSimulator._update_infostates(
-                    blue_infostate, red_infostate, action=action, result=result
+                game.beliefs = MatchSimulator._update_beliefs(
+                    game.beliefs, game.blue_infostate, game.red_infostate,
+                    action=action, result=result)
+                game.blue_infostate, game.red_infostate = MatchSimulator._update_infostates(
+                    game.blue_infostate, game.red_infostate, action=action, result=result,
+                    beliefs=game.beliefs
                 )
 
-                turn_number += 1
-                sampled += 1
-                print(f"Sampled: {sampled}/{target}")
+                game.turn_number += 1
 
                 self._save_strategy_to_csv(current_abstraction=current_abstraction,
-                                           trainer=trainer)
+                                           trainer=game.trainer,
+                                           output_path=self.output_path)
+                sampled += 1
+                if self.verbose:
+                    print(f"Sampled: {CFRTrainingSimulator._sample_count(sampled, counter)}"
+                          f"/{target}")
 
-                if detector.add_move(action):
-                    print("De facto draw by repetition")
+                if game.detector.add_move(action):
+                    if self.verbose:
+                        print("De facto draw by repetition")
                     break
 
-            MatchSimulator._print_result(arbiter_board)
+                if (self.checkpoint_path is not None and self.checkpoint_tables
+                        and sampled - checkpointed >= self.checkpoint_interval):
+                    self._write_checkpoint(sampled, game=game)
+                    checkpointed = sampled
+
+            if interrupted:
+                break
+            if self.verbose:
+                MatchSimulator._print_result(game.arbiter_board)
+            game = None
+
+            if (self.checkpoint_path is not None
+                    and sampled - checkpointed >= self.checkpoint_interval):
+                self._write_checkpoint(sampled)
+                checkpointed = sampled
+
+        if self.checkpoint_path is not None and (
+                game is None or self.checkpoint_tables):
+            self._write_checkpoint(sampled, game=game)
+
+        return sampled
+
+    def start(self, iterations: int = 1, target: int = None,
+              resume: bool = False,
+              copy_dir: str = None):
+        """
+        This method simulates a GG match generating training data, using the
+        counterfactual regret minimization algorithm. With resume set, it
+        continues from the checkpoint. The output is copied to the copy
+        directory if one is given, such as "../drive/MyDrive/Training_Data"
+        for Google Drive on Colab.
+        """
+        start = time.time()
+        _ = iterations  # Not used in this subclass
+
+        self.generate(target, resume=resume)
 
         end = time.time()
         print(f"{(end - start)/60/60:.2f} hours elapsed.")
 
-        # Copy to ../drive/MyDrive/Training_Data
-        os.makedirs("../drive/MyDrive/Training_Data", exist_ok=True)
-        shutil.copy("training_data.csv", "../drive/MyDrive/Training_Data")
+        if copy_dir is not None:
+            os.makedirs(copy_dir, exist_ok=True)
+            shutil.copy(self.output_path, copy_dir)
+
+
+class SelfPlayCoordinator:
+    """
+    This generates training data with several independent CFRTrainingSimulator
+    workers, each in a process of its own with its own random seed, and so its
+    own formations, appending to its own shard of the output. The workers
+    reserve their samples from a shared counter, so that together they
+    generate exactly the target number of samples. Every worker checkpoints
+    its progress next to its shard, so that a stopped run can be resumed.
+    """
+    INDEX_NAME = "index.csv"
+
+    def __init__(self, workers: int, output_dir: str = "training_data",
+                 seed: int = None, trainer_class: type = DepthLimitedCFRTrainer,
+                 checkpoint_interval: int = 100):
+        """
+        The seeds of the workers are drawn from the given seed, so that the
+        shards can be reproduced, or from the system's entropy if it is None.
+        """
+        self.workers = workers
+        self.output_dir = output_dir
+        self.seed = seed
+        self.trainer_class = trainer_class
+        self.checkpoint_interval = checkpoint_interval
+
+    def shard_paths(self):
+        """
+        This lists the paths of the output shards, in worker order.
+        """
+        return [os.path.join(self.output_dir, f"shard_{w:03d}.csv")
+                for w in range(self.workers)]
+
+    @staticmethod
+    def checkpoint_path(shard_path: str):
+        """
+        This obtains the path of the checkpoint of a worker from its shard.
+        """
+        return os.path.splitext(shard_path)[0] + ".ckpt"
+
+    def _checkpointed_samples(self):
+        """
+        This adds up the samples recorded by the checkpoints of the workers.
+        """
+        sampled = 0
+        for shard_path in self.shard_paths():
+            checkpoint_path = SelfPlayCoordinator.checkpoint_path(shard_path)
+            if os.path.exists(checkpoint_path):
+                with open(checkpoint_path, "rb") as checkpoint_file:
+                    sampled += pickle.load(checkpoint_file).sampled
+
+        return sampled
+
+    @staticmethod
+    def _run_worker(seed: int, output_path: str, target: int,
+                    trainer_class: type, checkpoint_interval: int,
+                    counter: 'multiprocessing.Value',
+                    stop: 'multiprocessing.Event', resume: bool):
+        # Interrupts are handled by the coordinator, which sets the stop event
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        random.seed(seed)  # Replaced by the state in the checkpoint on resume
+        simulator = CFRTrainingSimulator(
+            formations=[None, None], controllers=None, save_data=False,
+            pov=POV.WORLD, trainer_class=trainer_class,
+            output_path=output_path, verbose=False,
+            checkpoint_path=SelfPlayCoordinator.checkpoint_path(output_path),
+            checkpoint_interval=checkpoint_interval)
+        simulator.generate(target, counter=counter, stop=stop, resume=resume)
+
+    def start(self, target: int, progress_interval: float = 10.0,
+              resume: bool = False):
+        """
+        This runs the workers until the target number of samples is reached,
+        printing the progress every interval of seconds, then writes the index
+        of the shards and returns the number of samples generated. On an
+        interrupt, the workers are stopped after their current move. With
+        resume set, every worker continues from its checkpoint, and the
+        samples already generated count towards the target.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        seeds = random.Random(self.seed)
+        context = multiprocessing.get_context()
+        counter, stop = context.Value("q", 0), context.Event()
+        if resume:
+            counter.value = self._checkpointed_samples()
+        processes = [context.Process(
+            target=SelfPlayCoordinator._run_worker,
+            args=(seeds.getrandbits(64), output_path, target,
+                  self.trainer_class, self.checkpoint_interval, counter, stop,
+                  resume))
+            for output_path in self.shard_paths()]
+
+        start = time.time()
+        for process in processes:
+            process.start()
+        try:
+            running = processes
+            while running:
+                wait([process.sentinel for process in running],
+                     timeout=progress_interval)
+                running = [process for process in running if process.is_alive()]
+                print(f"Sampled: {counter.value}/{target}")
+        except KeyboardInterrupt:
+            print("Stopping the workers")
+            stop.set()
+        finally:
+            for process in processes:
+                process.join()
+
+        print(f"{(time.time() - start)/60/60:.2f} hours elapsed.")
+        self.write_index()
+
+        return counter.value
+
+    def write_index(self):
+        """
+        This writes the path and number of rows of every shard to the index
+        file of the output directory, returning the rows.
+        """
+        index = []
+        for output_path in self.shard_paths():
+            rows = 0
+            if os.path.exists(output_path):
+                with open(output_path, encoding="utf-8") as shard:
+                    rows = sum(1 for _ in shard)
+            index.append([os.path.basename(output_path), rows])
+
+        with open(os.path.join(self.output_dir, SelfPlayCoordinator.INDEX_NAME),
+                  "w", encoding="utf-8") as index_file:
+            csv.writer(index_file).writerows(index)
+
+        return index
+
+    def merge(self, output_path: str):
+        """
+        This concatenates the shards in worker order into a single CSV file.
+        """
+        with open(output_path, "w", encoding="utf-8") as merged:
+            for shard_path in self.shard_paths():
+                if os.path.exists(shard_path):
+                    with open(shard_path, encoding="utf-8") as shard:
+                        shutil.copyfileobj(shard, merged)
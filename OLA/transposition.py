@@ -0,0 +1,111 @@
+"""
+This contains the bounded transposition table for caching node utilities
+across the searches of a game.
+"""
+
+from collections import OrderedDict
+
+from OLA.constants import Replacement
+
+
+class TranspositionTable:
+    """
+    This caches values by the Zobrist hash of an infostate and the remaining
+    search depth, within a fixed budget of bytes. The hash also covers the
+    player to move, so it does not have to be part of the key.
+
+    With the Replacement.LRU policy, the least recently used entry is evicted
+    when the table is full. With the Replacement.BUCKETS policy, each hash maps
+    to a bucket of two slots: one kept for the deepest entry seen, and one that
+    is always replaced. Buckets never grow, so their memory is allocated up
+    front, but colliding entries may be lost before the table is full.
+    """
+    # Rough CPython costs of an entry, including its integer key and float
+    # value, as measured with tracemalloc
+    LRU_ENTRY_BYTES = 160
+    BUCKET_ENTRY_BYTES = 88
+    DEPTH_BITS = 8  # Depths are packed below the hash in the LRU keys
+
+    def __init__(self, max_bytes: int = 64*1024*1024,
+                 policy: int = Replacement.LRU):
+        self.policy = policy
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        if policy == Replacement.LRU:
+            self.capacity = max(
+                1, max_bytes // TranspositionTable.LRU_ENTRY_BYTES)
+        elif policy == Replacement.BUCKETS:
+            # Every bucket holds a depth-preferred and an always-replace slot
+            self.buckets = max(
+                1, max_bytes // (2*TranspositionTable.BUCKET_ENTRY_BYTES))
+            self.capacity = self.buckets*2
+        else:
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.clear()
+
+    def clear(self):
+        """
+        This empties the table, keeping the hit and miss counts.
+        """
+        if self.policy == Replacement.LRU:
+            self.entries = OrderedDict()
+        else:
+            self.hashes = [None]*self.capacity
+            self.depths = [-1]*self.capacity
+            self.values = [None]*self.capacity
+
+    def __len__(self):
+        if self.policy == Replacement.LRU:
+            return len(self.entries)
+        return self.capacity - self.hashes.count(None)
+
+    def get(self, zobrist: int, depth: int):
+        """
+        This obtains the value stored for the infostate hash and depth, or None
+        if there is none.
+        """
+        if self.policy == Replacement.LRU:
+            key = (zobrist << TranspositionTable.DEPTH_BITS) | depth
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+        else:
+            value = None
+            slot = (zobrist % self.buckets)*2
+            for slot in (slot, slot + 1):
+                if (self.hashes[slot] == zobrist
+                        and self.depths[slot] == depth):
+                    value = self.values[slot]
+                    break
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def store(self, zobrist: int, depth: int, value: float):
+        """
+        This stores a value for the infostate hash and depth, evicting or
+        replacing another entry if needed.
+        """
+        if self.policy == Replacement.LRU:
+            key = (zobrist << TranspositionTable.DEPTH_BITS) | depth
+            entries = self.entries
+            if key in entries:
+                entries.move_to_end(key)
+            elif len(entries) >= self.capacity:
+                entries.popitem(last=False)
+            entries[key] = value
+            return
+
+        slot = (zobrist % self.buckets)*2
+        if (self.hashes[slot + 1] == zobrist
+                and self.depths[slot + 1] == depth):
+            # Update the entry where it is
+            slot += 1
+        elif self.hashes[slot] is not None and depth < self.depths[slot]:
+            # Shallower entries never displace the deepest one
+            slot += 1
+        self.hashes[slot], self.depths[slot], self.values[slot] = (
+            zobrist, depth, value)
@@ -0,0 +1,56 @@
+"""
+This measures the startup time of importing OLA.training in a fresh
+interpreter, as paid by short-lived worker processes. Run it from the
+repository root with `python benchmarks/startup.py`.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dependencies that should only be imported when their features are used
+OPTIONAL_MODULES = ["tkinter", "anytree", "matplotlib", "numpy"]
+
+
+def time_command(code: str, runs: int):
+    """
+    This runs the given code in fresh interpreters and returns the wall clock
+    time of each run in milliseconds.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        timings.append((time.perf_counter() - start)*1000)
+    return timings
+
+
+def main():
+    """
+    This prints the median startup time with and without the import, and the
+    optional dependencies that the import pulled in.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    bare = statistics.median(time_command("pass", args.runs))
+    loaded = statistics.median(time_command("import OLA.training", args.runs))
+    print(f"Interpreter startup: {bare:.1f} ms")
+    print(f"import OLA.training: {loaded:.1f} ms "
+          f"(+{loaded - bare:.1f} ms over {args.runs} runs)")
+
+    check = ("import sys, OLA.training; "
+             f"print(' '.join(m for m in {OPTIONAL_MODULES!r} "
+             "if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", check], cwd=ROOT,
+                            check=True, capture_output=True, text=True)
+    print(f"Optional modules imported: {output.stdout.strip() or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
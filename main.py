@@ -2,17 +2,36 @@
 This is the entry point for interacting with the OLA engine.
 """
 
+import logging
+import os
+
 from OLA.constants import Ranking, Controller
 from OLA.core import Player, POV
 from OLA.simulation import MatchSimulator
-from OLA.training import CFRTrainingSimulator
+from OLA.training import CFRTrainingSimulator, SelfPlayCoordinator
+
+
+def ask_resume(checkpoint_paths: list[str]):
+    """
+    This asks whether to continue from the checkpoints of an earlier run, if
+    there are any, rather than starting a new run.
+    """
+    if not any(os.path.exists(path) for path in checkpoint_paths):
+        return False
+
+    choice = input("1 - Resume from the checkpoint\n2 - Start a new run\n>> ")
+    return choice == "1"
 
 
 def main():
     """
     Here we simulate a GG match.
     """
-    choice = input("1 - Simulate match\n2 - Generate training data\n>> ")
+    # Configure the logging here rather than on import of the package
+    logging.basicConfig(level=logging.WARNING)
+
+    choice = input("1 - Simulate match\n2 - Generate training data\n"
+                   "3 - Generate training data in parallel\n>> ")
 
     if choice == "1":
         print("Selected match simulation.")
@@ -32,8 +51,16 @@ def main():
         print("Selected data generation.")
         simulator = CFRTrainingSimulator(formations=[None, None],
                                          controllers=None, save_data=False,
-                                         pov=POV.WORLD)
-        simulator.start(target=20000)
+                                         pov=POV.WORLD,
+                                         checkpoint_path="training_data.ckpt")
+        simulator.start(target=20000,
+                        resume=ask_resume([simulator.checkpoint_path]))
+    elif choice == "3":
+        print("Selected parallel data generation.")
+        coordinator = SelfPlayCoordinator(workers=os.cpu_count())
+        coordinator.start(target=20000, resume=ask_resume(
+            [SelfPlayCoordinator.checkpoint_path(shard)
+             for shard in coordinator.shard_paths()]))
 
 
 if __name__ == "__main__":
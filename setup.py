@@ -2,5 +2,6 @@ from setuptools import setup
 from Cython.Build import cythonize
 
 setup(
-    ext_modules=cythonize("OLA/fasteval.pyx", language_level=3)
+    ext_modules=cythonize(["OLA/fasteval.pyx", "OLA/find_locations.pyx"],
+                          language_level=3)
 )
@@ -6,6 +6,7 @@ operational throughout continued development.
 import sys
 import os
 import random
+import importlib
 
 import unittest
 from unittest.mock import patch
@@ -13,8 +14,11 @@ from unittest.mock import patch
 
 from OLA.helpers import (get_random_permutation, get_blank_matrix,
                          get_hex_uppercase_string)
+from OLA import helpers, backend
 from OLA.constants import Result, Ranking
-from OLA.core import Board, Infostate, Player, BoardPrinter
+from OLA.core import (Action, AccessPointPieces, Board, Infostate, Player,
+                      BoardPrinter, RankBeliefs)
+from OLA.simulation import MatchSimulator
 
 
 testdir = os.path.dirname(__file__)
@@ -98,6 +102,57 @@ class TestHexUppercaseString(unittest.TestCase):
         self.assertEqual(get_hex_uppercase_string(255), 'FF')
 
 
+class TestBackend(unittest.TestCase):
+    """
+    This tests the selection between the compiled extensions and their pure
+    Python twins.
+    """
+
+    def test_python_fallback(self):
+        """
+        This verifies that the backend falls back to the pure Python versions
+        when the extensions cannot be imported.
+        """
+        with patch.dict(sys.modules, {'OLA.fasteval': None,
+                                      'OLA.find_locations': None}):
+            importlib.reload(backend)
+            self.assertEqual(backend.BACKEND, "python")
+            self.assertIs(backend.evaluation, helpers.evaluation)
+            self.assertIs(backend.find_unique_locations,
+                          helpers.find_unique_locations)
+            self.assertIs(backend.find_unique_squares,
+                          helpers.find_unique_squares)
+        importlib.reload(backend)
+
+    def test_equivalence(self):
+        """
+        This verifies that the active backend agrees with the pure Python
+        versions.
+        """
+        random.seed(6)
+        for _ in range(20):
+            squares = bytearray(random.choice(
+                [Ranking.BLANK]*6 + list(range(Ranking.SPY*2 + 1)))
+                for _ in range(Board.SQUARES))
+            self.assertEqual(backend.evaluation(squares),
+                             helpers.evaluation(squares))
+            values = [Ranking.FLAG, Ranking.FLAG + Ranking.SPY, Ranking.SPY]
+            self.assertEqual(backend.find_unique_squares(values, squares),
+                             helpers.find_unique_squares(values, squares))
+            matrix = [list(squares[i:i + Board.COLUMNS])
+                      for i in range(0, Board.SQUARES, Board.COLUMNS)]
+            self.assertEqual(backend.find_unique_locations(values, matrix),
+                             helpers.find_unique_locations(values, matrix))
+        self.assertEqual(helpers.find_unique_squares(
+            [Ranking.FLAG, Ranking.SPY], bytearray([0, 15, 1, 1])), [2, 1])
+        self.assertEqual(helpers.find_unique_squares(
+            [Ranking.FLAG], bytearray(4)), [-1])
+        self.assertEqual(helpers.find_unique_locations(
+            [Ranking.FLAG, Ranking.SPY], [[0, 15], [1, 1]]), [(1, 0), (0, 1)])
+        self.assertIsNone(helpers.find_unique_locations(
+            [Ranking.FLAG], [[0, 0], [0, 0]]))
+
+
 class TestBoard(unittest.TestCase):
     """
     This tests the Board class, which represents the game state as seen by the
@@ -267,6 +322,264 @@ class TestBoard(unittest.TestCase):
         next_board = sample_board.transition(action="3222")
         self.assertTrue(next_board.is_terminal())
 
+    def test_flat_squares(self):
+        """
+        This verifies that the board is backed by flat squares that match the
+        matrix view, and that transitions leave the original squares intact.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        self.assertEqual(len(sample_board.squares), Board.SQUARES)
+        self.assertEqual(sample_board.squares[2*Board.COLUMNS + 5], 9)
+        self.assertEqual(sample_board.matrix, sample_state_matrix)
+
+        next_board = sample_board.transition(action="2535")
+        self.assertEqual(sample_board.matrix, sample_state_matrix)
+        self.assertEqual(next_board.squares[3*Board.COLUMNS + 5], 9)
+        self.assertEqual(next_board.squares[2*Board.COLUMNS + 5],
+                         Ranking.BLANK)
+
+    def test_make_unmake(self):
+        """
+        This verifies that moving in place matches the transition, and that
+        undoing the move restores the board exactly.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 16, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 17, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        for player in [Player.BLUE, Player.RED]:
+            sample_board = Board(sample_state_matrix, player_to_move=player,
+                                 blue_anticipating=False,
+                                 red_anticipating=False)
+            for action in sample_board.actions():
+                next_board = sample_board.transition(action)
+                result = sample_board.classify_action_result(action,
+                                                             next_board)
+                undo = sample_board.make(action)
+                self.assertEqual(sample_board.squares, next_board.squares)
+                self.assertEqual(sample_board.player_to_move,
+                                 next_board.player_to_move)
+                self.assertEqual(sample_board.made_action_result(undo), result)
+                sample_board.unmake(undo)
+                self.assertEqual(sample_board.matrix, sample_state_matrix)
+                self.assertEqual(sample_board.player_to_move, player)
+
+    def test_transition_with_result(self):
+        """
+        This verifies that the result returned along with the transition
+        matches the classification from diffing the boards.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 17, 0, 0],
+            [0, 0, 16, 2, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 17, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        results = set()
+        for player in [Player.BLUE, Player.RED]:
+            sample_board = Board(sample_state_matrix, player_to_move=player,
+                                 blue_anticipating=False,
+                                 red_anticipating=False)
+            for action in sample_board.actions():
+                next_board, result = sample_board.transition_with_result(
+                    action)
+                self.assertEqual(next_board, sample_board.transition(action))
+                self.assertEqual(result, sample_board.classify_action_result(
+                    action, next_board))
+                results.add(result)
+        self.assertEqual(results, {Result.OCCUPY, Result.WIN, Result.LOSS,
+                                   Result.DRAW})
+
+    def test_incremental_evaluation(self):
+        """
+        This verifies that the evaluation components carried through
+        transitions and in-place moves match a full recomputation.
+        """
+        random.seed(4)
+        blue_formation, red_formation = (
+            Player.get_sensible_random_formation(Ranking.SORTED_FORMATION),
+            Player.get_sensible_random_formation(Ranking.SORTED_FORMATION))
+        # Blue occupies the first three rows and red the last three
+        sample_state_matrix = (
+            [list(blue_formation[i:i + Board.COLUMNS])
+             for i in range(0, len(blue_formation), Board.COLUMNS)]
+            + [[Ranking.BLANK]*Board.COLUMNS for _ in range(2)]
+            + [[piece + Ranking.SPY if piece else Ranking.BLANK
+                for piece in red_formation[i:i + Board.COLUMNS]]
+               for i in range(0, len(red_formation), Board.COLUMNS)])
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        for _ in range(30):
+            if sample_board.is_terminal():
+                break
+            for action in sample_board.actions():
+                next_board = sample_board.transition(action)
+                rebuilt = Board.from_squares(
+                    next_board.squares[:], next_board.player_to_move,
+                    next_board.blue_anticipating, next_board.red_anticipating)
+                self.assertEqual((next_board.blue_value, next_board.red_value),
+                                 (rebuilt.blue_value, rebuilt.red_value))
+                undo = sample_board.make(action)
+                self.assertEqual(sample_board.evaluation(),
+                                 rebuilt.evaluation())
+                sample_board.unmake(undo)
+            sample_board = sample_board.transition(
+                random.choice(sample_board.actions()))
+
+    def test_evaluate_children(self):
+        """
+        This verifies that scoring the children without building them matches
+        the transitions, for both the compiled and the pure Python versions.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 17, 0, 0],
+            [0, 0, 16, 2, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 17, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        for player in [Player.BLUE, Player.RED]:
+            sample_board = Board(sample_state_matrix, player_to_move=player,
+                                 blue_anticipating=False,
+                                 red_anticipating=False)
+            actions = sample_board.actions()
+            expected = ([], [], [])
+            for action in actions:
+                next_board, result = sample_board.transition_with_result(
+                    action)
+                expected[0].append(next_board.evaluation())
+                expected[1].append(next_board.is_terminal())
+                expected[2].append(result)
+            self.assertEqual(sample_board.evaluate_children(actions),
+                             expected)
+            blue_anticipating, red_anticipating = (
+                sample_board._next_anticipations())
+            self.assertEqual(helpers.evaluate_children(
+                sample_board.squares, actions, Action.ORIGINS,
+                Action.DESTINATIONS, player == Player.BLUE, blue_anticipating,
+                red_anticipating, sample_board.blue_flag,
+                sample_board.red_flag, sample_board.blue_value,
+                sample_board.red_value), expected)
+
+    def test_flag_tracking(self):
+        """
+        This verifies that transitions keep the flag squares and the terminal
+        status consistent with a board built from the same squares.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 16, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        self.assertEqual((sample_board.blue_flag, sample_board.red_flag),
+                         (12, 30))
+        for action in ["1323", "3334", "2324", "3424"]:
+            next_board = sample_board.transition(action)
+            rebuilt = Board.from_squares(
+                next_board.squares[:], next_board.player_to_move,
+                next_board.blue_anticipating, next_board.red_anticipating)
+            self.assertEqual((next_board.blue_flag, next_board.red_flag),
+                             (rebuilt.blue_flag, rebuilt.red_flag))
+            self.assertEqual(next_board.is_terminal(), rebuilt.is_terminal())
+            self.assertEqual(next_board.reward(), rebuilt.reward())
+            sample_board = next_board
+        # The red flag challenged the blue flag and captured it
+        self.assertEqual((sample_board.blue_flag, sample_board.red_flag),
+                         (-1, 22))
+        self.assertTrue(sample_board.is_terminal())
+
+    def test_access_values(self):
+        """
+        This checks the lookups of the pieces guarding each flag, where
+        opposing pieces count as blanks and the board edges as None.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 20, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 2, 0, 0, 0, 0],
+            [0, 0, 0, 5, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 17],
+            [0, 0, 0, 0, 0, 0, 0, 3, 16],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        self.assertEqual(sample_board.flag_locations(), ((1, 3), (7, 8)))
+        blue_access, red_access = sample_board.access_values()
+        self.assertEqual(blue_access, AccessPointPieces(
+            front=5, back=Ranking.BLANK, left=2, right=Ranking.BLANK))
+        self.assertEqual(red_access, AccessPointPieces(
+            front=Ranking.PRIVATE, back=None, left=Ranking.BLANK, right=None))
+
+        # A captured flag has no access values
+        sample_state_matrix[7][8] = 0
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        self.assertEqual(sample_board.flag_locations(), ((1, 3), None))
+        self.assertIsNone(sample_board.access_values()[1])
+
+    def test_hash(self):
+        """
+        This verifies that boards reached by different move orders are equal,
+        hash alike and carry the same incrementally updated hash as a board
+        built from scratch.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0, 2, 0, 0],
+            [0, 0, 15, 0, 0, 9, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        first_order = sample_board.transition("2535").transition(
+            "4333").transition("1626").transition("6555")
+        second_order = sample_board.transition("1626").transition(
+            "6555").transition("2535").transition("4333")
+        rebuilt = Board(first_order.matrix, player_to_move=Player.BLUE,
+                        blue_anticipating=False, red_anticipating=False)
+
+        self.assertEqual(first_order, second_order)
+        self.assertEqual(first_order.zobrist, rebuilt.zobrist)
+        self.assertEqual(len({first_order, second_order, rebuilt}), 1)
+        self.assertNotEqual(first_order, sample_board)
+
 
 class TestInfostate(unittest.TestCase):
     """
@@ -380,6 +693,73 @@ class TestInfostate(unittest.TestCase):
         self.assertEqual(next_infostate.abstracted_board[0][0].rank_floor, 1)
         self.assertTrue(next_infostate.anticipating)
 
+    def test_hash(self):
+        """
+        This verifies that infostates reached by different move orders are
+        equal and can be used interchangeably as dictionary keys.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 17, 1, 0, 0, 2, 30, 0],
+            [0, 0, 15, 0, 0, 9, 15, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 6, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=sample_board)
+        moves = [("2535", Result.OCCUPY), ("4344", Result.OCCUPY),
+                 ("1626", Result.OCCUPY), ("6555", Result.OCCUPY)]
+        first_order, second_order = infostate, infostate
+        for move in moves:
+            first_order = first_order.transition(move[0], result=move[1])
+        for move in moves[2:] + moves[:2]:
+            second_order = second_order.transition(move[0], result=move[1])
+
+        self.assertEqual(first_order, second_order)
+        self.assertEqual(hash(first_order), hash(second_order))
+        self.assertEqual({first_order: 1}[second_order], 1)
+        self.assertNotEqual(first_order, infostate)
+        self.assertNotEqual(
+            infostate, Infostate.at_start(owner=Player.RED, board=sample_board))
+
+    def test_arrays(self):
+        """
+        This verifies that transitions leave the parent's arrays untouched, and
+        that the lazy matrix and piece views agree with the arrays.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 17, 1, 0, 0, 2, 30, 0],
+            [0, 0, 15, 0, 0, 9, 15, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 6, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        infostate = Infostate.at_start(owner=Player.BLUE, board=sample_board)
+        before = (bytes(infostate.colors), bytes(infostate.floors),
+                  bytes(infostate.ceilings), str(infostate))
+        next_infostate = infostate.transition("4353", result=Result.WIN)
+        self.assertEqual((bytes(infostate.colors), bytes(infostate.floors),
+                          bytes(infostate.ceilings), str(infostate)), before)
+        self.assertEqual(next_infostate.colors[4*Board.COLUMNS + 3],
+                         Player.ARBITER)
+        self.assertEqual(next_infostate.floors[5*Board.COLUMNS + 3], 7)
+        for row in range(Board.ROWS):
+            for column in range(Board.COLUMNS):
+                piece = next_infostate.abstracted_board[row][column]
+                offset = Ranking.SPY if piece.color == Player.RED else 0
+                self.assertEqual(next_infostate.matrix[row][column],
+                                 [piece.rank_floor + offset,
+                                  piece.rank_ceiling + offset])
+
     def test_flatten(self):
         """
         This confirms whether the infostate is properly flattened on its way to 
@@ -409,6 +789,191 @@ class TestInfostate(unittest.TestCase):
         infostate_split = list(
             map(int, str(sample_blue_infostate).split(" ")))
         self.assertEqual(len(infostate_split), 147)
+        self.assertEqual(list(sample_blue_infostate.vector), infostate_split)
+
+    def test_key(self):
+        """
+        This verifies that the cached key tells infostates apart exactly when
+        their strings differ.
+        """
+        sample_state_matrix = [
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 17, 1, 0, 0, 2, 30, 0],
+            [0, 0, 15, 0, 0, 9, 15, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 23, 0, 29, 0, 0, 0],
+            [0, 0, 0, 6, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 16, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                             blue_anticipating=False, red_anticipating=False)
+        infostates = [Infostate.at_start(owner=owner, board=sample_board)
+                      for owner in [Player.BLUE, Player.RED]]
+        for action, result in [("4353", Result.WIN), ("4353", Result.LOSS),
+                               ("1222", Result.DRAW), ("2535", Result.OCCUPY)]:
+            infostates.append(infostates[0].transition(action, result=result))
+        for first in infostates:
+            for second in infostates:
+                self.assertEqual(first.key == second.key,
+                                 str(first) == str(second))
+        self.assertIs(infostates[0].key, infostates[0].key)
+
+
+class TestRankBeliefs(unittest.TestCase):
+    """
+    This tests the bitmask tracking of the opponent's possible ranks.
+    """
+
+    def setUp(self):
+        sample_state_matrix = [
+            [1, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 14, 0, 14, 0, 0],
+            [0, 0, 0, 0, 30, 0, 30, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [17, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 16],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.RED,
+                             blue_anticipating=False, red_anticipating=False)
+        self.infostate = Infostate.at_start(owner=Player.BLUE,
+                                            board=sample_board)
+        self.beliefs = RankBeliefs.from_infostate(self.infostate)
+
+    def test_challenges(self):
+        """
+        This checks that challenges narrow the masks according to the ranks of
+        the owner's pieces.
+        """
+        self.assertEqual(self.beliefs.rank_bounds(5*Board.COLUMNS),
+                         (Ranking.FLAG, Ranking.SPY))
+        self.assertEqual(self.beliefs.rank_bounds(0), (0, 0))
+        # Only a spy beats the five-star general
+        beliefs = self.beliefs.transition(self.infostate, "3424",
+                                          result=Result.WIN)
+        self.assertEqual(beliefs.masks[3*Board.COLUMNS + 4], 0)
+        self.assertEqual(beliefs.rank_bounds(2*Board.COLUMNS + 4),
+                         (Ranking.SPY, Ranking.SPY))
+        # A draw reveals the challenger's rank before it is removed
+        beliefs = self.beliefs.transition(self.infostate, "3626",
+                                          result=Result.DRAW)
+        self.assertEqual(beliefs.masks[3*Board.COLUMNS + 6], 0)
+        self.assertEqual(beliefs.captured[Ranking.GENERAL_OF_THE_ARMY], 1)
+        self.assertEqual(beliefs.rank_bounds(5*Board.COLUMNS),
+                         (Ranking.FLAG, Ranking.SPY))
+        self.assertFalse(beliefs.masks[5*Board.COLUMNS] & (
+            1 << (Ranking.GENERAL_OF_THE_ARMY - 1)))
+        # A piece that survives the five-star general's challenge is a spy
+        beliefs = self.beliefs.transition(self.infostate, "2434",
+                                          result=Result.LOSS)
+        self.assertEqual(beliefs.rank_bounds(3*Board.COLUMNS + 4),
+                         (Ranking.SPY, Ranking.SPY))
+
+    def test_piece_counts(self):
+        """
+        This checks that a rank is ruled out for every other piece once all of
+        its pieces are identified.
+        """
+        infostate = self.infostate
+        beliefs = self.beliefs
+        for action in ["3424", "3626"]:
+            beliefs = beliefs.transition(infostate, action, result=Result.WIN)
+            infostate = infostate.transition(action, result=Result.WIN)
+        for square in [5*Board.COLUMNS, Board.SQUARES - 1]:
+            self.assertEqual(beliefs.rank_bounds(square),
+                             (Ranking.FLAG, Ranking.GENERAL_OF_THE_ARMY))
+        narrowed = beliefs.narrowed(infostate)
+        self.assertEqual(narrowed.ceilings[5*Board.COLUMNS],
+                         Ranking.GENERAL_OF_THE_ARMY)
+        self.assertEqual(narrowed.floors[2*Board.COLUMNS + 6], Ranking.SPY)
+        self.assertEqual(narrowed, Infostate(
+            colors=narrowed.colors, floors=narrowed.floors,
+            ceilings=narrowed.ceilings, owner=Player.BLUE,
+            player_to_move=infostate.player_to_move))
+
+    def test_simulated_infostates(self):
+        """
+        This checks that the beliefs kept through a simulated game still count
+        a captured spy, so that the other spy being identified later rules out
+        the spy for every other piece.
+        """
+        sample_state_matrix = [
+            [1, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 2, 0, 0, 0, 0],
+            [0, 0, 0, 0, 14, 0, 14, 0, 0],
+            [0, 0, 0, 0, 30, 0, 30, 0, 0],
+            [2, 0, 0, 0, 0, 0, 0, 0, 0],
+            [16, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ]
+        sample_board = Board(sample_state_matrix, player_to_move=Player.RED,
+                             blue_anticipating=False, red_anticipating=False)
+        infostates = MatchSimulator._starting_infostates(sample_board)
+        beliefs = MatchSimulator._starting_beliefs(*infostates)
+        # A spy beats a five-star general and is captured by a private, then
+        # the other spy beats the other five-star general
+        for action in ["3424", "1424", "3626"]:
+            beliefs = MatchSimulator._update_beliefs(
+                beliefs, *infostates, action=action, result=Result.WIN)
+            infostates = MatchSimulator._update_infostates(
+                *infostates, action=action, result=Result.WIN, beliefs=beliefs)
+        blue_infostate, blue_beliefs = infostates[0], beliefs[0]
+        self.assertEqual(blue_beliefs.captured[Ranking.SPY], 1)
+        self.assertEqual(blue_infostate.ceilings[5*Board.COLUMNS],
+                         Ranking.GENERAL_OF_THE_ARMY)
+        self.assertEqual(blue_infostate.floors[2*Board.COLUMNS + 6],
+                         Ranking.SPY)
+        # Only a flag or a spy loses to a private, so this is the flag
+        beliefs = MatchSimulator._update_beliefs(
+            beliefs, *infostates, action="4050", result=Result.WIN)
+        self.assertEqual(beliefs[0].captured[Ranking.FLAG], 1)
+
+
+class TestAction(unittest.TestCase):
+    """
+    This is for testing the integer encoding of actions.
+    """
+
+    def test_round_trip(self):
+        """
+        This checks that every action id maps to its string and back, and that
+        the lookup tables agree with the string.
+        """
+        self.assertEqual(Action.COUNT, 254)
+        for action in range(Action.COUNT):
+            string = Action.to_string(action)
+            self.assertEqual(Action.to_id(string), action)
+            self.assertEqual(Action.COORDINATES[action],
+                             tuple(map(int, string)))
+            start_row, start_col, dest_row, dest_col = map(int, string)
+            self.assertEqual(Action.ORIGINS[action],
+                             start_row*Board.COLUMNS + start_col)
+            self.assertEqual(Action.DESTINATIONS[action],
+                             dest_row*Board.COLUMNS + dest_col)
+
+    def test_board_actions(self):
+        """
+        This checks that boards list action ids in ascending order, and that
+        ids and strings produce the same transitions.
+        """
+        random.seed(2)
+        matrix = get_blank_matrix(Board.ROWS, Board.COLUMNS)
+        for row, column, piece in [(0, 0, 1), (3, 4, 15), (7, 8, 16),
+                                   (4, 4, 17), (6, 2, 29)]:
+            matrix[row][column] = piece
+        board = Board(matrix, player_to_move=Player.BLUE,
+                      blue_anticipating=False, red_anticipating=False)
+        for _ in range(6):
+            actions = board.actions()
+            self.assertEqual(actions, sorted(actions))
+            action = random.choice(actions)
+            self.assertEqual(
+                board.transition(action),
+                board.transition(Action.to_string(action)))
+            board = board.transition(action)
 
 
 class TestPlayer(unittest.TestCase):
@@ -0,0 +1,94 @@
+"""
+This is for testing the encoding of infostates into NumPy arrays.
+"""
+
+import unittest
+
+import numpy as np
+
+from OLA.constants import Ranking, Result
+from OLA.core import Board, Infostate, Player
+from OLA.encoding import (encode_flat, encode_planes, FLAT_WIDTH,
+                          PLANES_SHAPE)
+
+
+def get_sample_infostates():
+    """
+    This prepares infostates of both owners, including ones with identified
+    and removed pieces.
+    """
+    sample_state_matrix = [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 17, 1, 0, 0, 2, 30, 0],
+        [0, 0, 15, 0, 0, 9, 15, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 23, 0, 29, 0, 0, 0],
+        [0, 0, 0, 6, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 16, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    sample_board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                         blue_anticipating=False, red_anticipating=False)
+    infostates = [Infostate.at_start(owner=owner, board=sample_board)
+                  for owner in [Player.BLUE, Player.RED]]
+    for infostate in infostates[:2]:
+        infostates.append(infostate.transition("4353", result=Result.WIN))
+        infostates.append(infostate.transition("1222", result=Result.DRAW))
+
+    return infostates
+
+
+class TestEncodeFlat(unittest.TestCase):
+    """
+    This tests the encoding of infostates into the flat layout.
+    """
+
+    def test_matches_string(self):
+        """
+        This checks that each row matches the integers of the infostate
+        string.
+        """
+        infostates = get_sample_infostates()
+        encoded = encode_flat(infostates)
+        self.assertEqual(encoded.shape, (len(infostates), FLAT_WIDTH))
+        for row, infostate in zip(encoded, infostates):
+            self.assertEqual(row.tolist(),
+                             list(map(int, str(infostate).split(" "))))
+        self.assertEqual(encode_flat(infostates[0]).tolist(),
+                         encoded[0].tolist())
+
+    def test_preallocated(self):
+        """
+        This checks that batches are written into a reused buffer.
+        """
+        infostates = get_sample_infostates()
+        buffer = np.full((10, FLAT_WIDTH), -1, dtype=np.int16)
+        encoded = encode_flat(infostates, out=buffer)
+        self.assertTrue(np.shares_memory(encoded, buffer))
+        self.assertEqual(encoded.shape[0], len(infostates))
+        self.assertTrue((buffer[len(infostates):] == -1).all())
+        with self.assertRaises(ValueError):
+            encode_flat(infostates, out=np.empty((2, FLAT_WIDTH)))
+
+
+class TestEncodePlanes(unittest.TestCase):
+    """
+    This tests the encoding of infostates into the floor and ceiling planes.
+    """
+
+    def test_matches_matrix(self):
+        """
+        This checks that the planes hold the floors and ceilings of the
+        infostate matrix.
+        """
+        infostates = get_sample_infostates()
+        encoded = encode_planes(infostates)
+        self.assertEqual(encoded.shape, (len(infostates),) + PLANES_SHAPE)
+        for planes, infostate in zip(encoded, infostates):
+            self.assertEqual(planes[0].tolist(), [
+                [pair[0] for pair in matrix_row]
+                for matrix_row in infostate.matrix])
+            self.assertEqual(planes[1].tolist(), [
+                [pair[1] for pair in matrix_row]
+                for matrix_row in infostate.matrix])
+        self.assertEqual(encoded.max(), Ranking.SPY*2)
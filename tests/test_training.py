@@ -4,16 +4,47 @@ This is for testing classes and functions in the training module.
 
 import sys
 import os
+import random
+import subprocess
+import tempfile
 
 import unittest
-from OLA.core import Board
-from OLA.training import TimelessBoard
+from OLA.core import Action, Board, Infostate, Player
+from OLA.training import (TimelessBoard, Abstraction, DepthLimitedCFRTrainer,
+                          CFRParameters, ExternalSamplingCFRTrainer,
+                          OutcomeSamplingCFRTrainer, DiscountParameters,
+                          SelfPlayCoordinator, CFRTrainingSimulator)
+from OLA.transposition import TranspositionTable
+from OLA.tables import TableStore
+from OLA.constants import Replacement, UpdateRule
 
 testdir = os.path.dirname(__file__)
 SRCDIR = '../OLA'
 sys.path.insert(0, os.path.abspath(os.path.join(testdir, SRCDIR)))
 
 
+def get_sample_abstraction():
+    """
+    This prepares a small position with few pieces, so that CFR can be solved
+    quickly in the tests.
+    """
+    sample_state_matrix = [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 1, 0, 0, 2, 0, 0],
+        [0, 0, 15, 0, 0, 9, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 23, 0, 29, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 16, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    board = Board(sample_state_matrix, player_to_move=Player.BLUE,
+                  blue_anticipating=False, red_anticipating=False)
+    infostate = Infostate.at_start(owner=Player.BLUE, board=board)
+
+    return Abstraction(state=board, infostate=infostate)
+
+
 class TestTimelessBoard(unittest.TestCase):
     """
     This is for testing the TimelessBoard class.
@@ -45,5 +76,525 @@ class TestTimelessBoard(unittest.TestCase):
         self.assertEqual(len(actions), 254)
 
 
+class TestDepthLimitedCFRTrainer(unittest.TestCase):
+    """
+    This is for testing the depth-limited CFR trainer.
+    """
+
+    def test_in_place_matches_transitions(self):
+        """
+        This verifies that walking the tree with a single mutable board
+        produces the same tables as creating a board for every node, and that
+        the caller's board is left untouched.
+        """
+        abstraction = get_sample_abstraction()
+        squares = abstraction.state.squares[:]
+        trainer = DepthLimitedCFRTrainer()
+        in_place_trainer = DepthLimitedCFRTrainer(in_place=True)
+        trainer.solve(abstraction, turn_number=5, iterations=2)
+        in_place_trainer.solve(abstraction, turn_number=5, iterations=2)
+
+        self.assertEqual(trainer.strategy_tables,
+                         in_place_trainer.strategy_tables)
+        self.assertEqual(trainer.regret_tables,
+                         in_place_trainer.regret_tables)
+        self.assertEqual(abstraction.state.squares, squares)
+
+    def test_simultaneous(self):
+        """
+        This checks that a single traversal per iteration updates the nodes
+        of both players, matching the first alternating pass at the root.
+        """
+        abstraction = get_sample_abstraction()
+        trainer = DepthLimitedCFRTrainer()
+        simultaneous_trainer = DepthLimitedCFRTrainer(simultaneous=True)
+        trainer.solve(abstraction, turn_number=5, iterations=1)
+        simultaneous_trainer.solve(abstraction, turn_number=5, iterations=1)
+
+        self.assertEqual(trainer.strategy_tables.keys(),
+                         simultaneous_trainer.strategy_tables.keys())
+        self.assertEqual(
+            trainer.cumulative_strategy(abstraction.infostate,
+                                        trainer.root_actions),
+            simultaneous_trainer.cumulative_strategy(
+                abstraction.infostate, simultaneous_trainer.root_actions))
+
+    def test_arena(self):
+        """
+        This checks that the passes over the tree arena produce the same
+        tables as walking the tree, for both kinds of traversal.
+        """
+        for simultaneous in [False, True]:
+            abstraction = get_sample_abstraction()
+            trainer = DepthLimitedCFRTrainer(simultaneous=simultaneous)
+            arena_trainer = DepthLimitedCFRTrainer(simultaneous=simultaneous,
+                                                   use_arena=True)
+            trainer.solve(abstraction, turn_number=5, iterations=3)
+            arena_trainer.solve(abstraction, turn_number=5, iterations=3)
+
+            self.assertEqual(trainer.root_actions, arena_trainer.root_actions)
+            arena_regrets = arena_trainer.regret_tables
+            for key, regrets in trainer.regret_tables.items():
+                for regret, arena_regret in zip(regrets, arena_regrets[key]):
+                    self.assertAlmostEqual(regret, arena_regret)
+            for strategy, arena_strategy in zip(
+                    trainer.cumulative_strategy(abstraction.infostate,
+                                                trainer.root_actions),
+                    arena_trainer.cumulative_strategy(
+                        abstraction.infostate, arena_trainer.root_actions)):
+                self.assertAlmostEqual(strategy, arena_strategy)
+
+    def test_parallel(self):
+        """
+        This checks that splitting the root's children across workers gives
+        the same tables as the serial search.
+        """
+        abstraction = get_sample_abstraction()
+        trainer = DepthLimitedCFRTrainer()
+        parallel_trainer = DepthLimitedCFRTrainer(workers=2,
+                                                  min_parallel_actions=2)
+        try:
+            trainer.solve(abstraction, turn_number=5, iterations=3, depth=3)
+            parallel_trainer.solve(abstraction, turn_number=5, iterations=3,
+                                   depth=3)
+        finally:
+            parallel_trainer.close()
+
+        self.assertIsNotNone(parallel_trainer.subtree_keys)
+        parallel_regrets = parallel_trainer.regret_tables
+        self.assertEqual(trainer.regret_tables.keys(), parallel_regrets.keys())
+        for key, regrets in trainer.regret_tables.items():
+            for regret, parallel_regret in zip(regrets, parallel_regrets[key]):
+                self.assertAlmostEqual(regret, parallel_regret)
+
+    def test_visualized_tree(self):
+        """
+        This checks that the parameters are left untouched by the algorithm,
+        and that the visualized tree is rooted at the trainer.
+        """
+        abstraction = get_sample_abstraction()
+        trainer = DepthLimitedCFRTrainer()
+        arguments = CFRParameters(abstraction=abstraction,
+                                  current_player=Player.BLUE, iteration=0,
+                                  blue_probability=1, red_probability=1,
+                                  turn_number=5, depth=2, visualize=True)
+        trainer.cfr(params=arguments)
+
+        self.assertIsNone(arguments.parent_data_node)
+        self.assertIsNone(trainer.root_data_node.parent)
+        self.assertEqual(len(trainer.root_data_node.children),
+                         len(abstraction.state.actions()))
+
+    def test_sparse_tables(self):
+        """
+        This checks that the tables of a filtered node only cover the actions
+        that pass the filter.
+        """
+        abstraction = get_sample_abstraction()
+        trainer = DepthLimitedCFRTrainer()
+        trainer.solve(abstraction, turn_number=1, iterations=2)
+
+        # Only forward moves are searched on the first turn
+        forward_actions = [action for action in abstraction.state.actions()
+                           if Action.COORDINATES[action][2]
+                           > Action.COORDINATES[action][0]]
+        self.assertEqual(trainer.root_actions, forward_actions)
+        self.assertEqual(len(trainer.cumulative_strategy(
+            abstraction.infostate, forward_actions)), len(forward_actions))
+
+
+class TestMCCFRTrainers(unittest.TestCase):
+    """
+    This is for testing the Monte Carlo CFR trainers.
+    """
+
+    def test_solve(self):
+        """
+        This checks that the sampling trainers produce a strategy over the
+        searched actions of the root, and leave the caller's board untouched.
+        """
+        for trainer_class in [ExternalSamplingCFRTrainer,
+                              OutcomeSamplingCFRTrainer]:
+            random.seed(0)
+            abstraction = get_sample_abstraction()
+            squares = abstraction.state.squares[:]
+            trainer = trainer_class(in_place=True)
+            trainer.solve(abstraction, turn_number=5, iterations=20)
+
+            self.assertEqual(trainer.root_actions,
+                             abstraction.state.actions())
+            strategy = trainer.cumulative_strategy(abstraction.infostate,
+                                                   trainer.root_actions)
+            self.assertEqual(len(strategy), len(trainer.root_actions))
+            self.assertTrue(all(weight >= 0 for weight in strategy))
+            self.assertGreater(sum(strategy), 0)
+            self.assertEqual(abstraction.state.squares, squares)
+
+    def test_update_rules(self):
+        """
+        This checks that every trainer solves under every update rule, and
+        that CFR+ keeps the regrets nonnegative.
+        """
+        for trainer_class in [DepthLimitedCFRTrainer,
+                              ExternalSamplingCFRTrainer,
+                              OutcomeSamplingCFRTrainer]:
+            for update_rule in [UpdateRule.CFR_PLUS, UpdateRule.LINEAR,
+                                UpdateRule.DISCOUNTED]:
+                random.seed(0)
+                abstraction = get_sample_abstraction()
+                trainer = trainer_class(
+                    update_rule=update_rule,
+                    discounts=DiscountParameters(alpha=1.0, gamma=1.0))
+                trainer.solve(abstraction, turn_number=5, iterations=5)
+                strategy = trainer.cumulative_strategy(abstraction.infostate,
+                                                       trainer.root_actions)
+                self.assertGreater(sum(strategy), 0)
+                if update_rule == UpdateRule.CFR_PLUS:
+                    self.assertGreaterEqual(
+                        trainer.tables.regret_slab[:trainer.tables.used].min(),
+                        0.0)
+
+    def test_discounts_per_iteration(self):
+        """
+        This checks that Discounted CFR leaves the rows of a previous search
+        alone, and discounts the rows of the current search.
+        """
+        for trainer_class in [DepthLimitedCFRTrainer,
+                              ExternalSamplingCFRTrainer]:
+            random.seed(0)
+            abstraction = get_sample_abstraction()
+            trainer = trainer_class(
+                update_rule=UpdateRule.DISCOUNTED,
+                discounts=DiscountParameters(alpha=1.0, beta=1.0, gamma=1.0))
+            row = trainer.tables.add(abstraction.infostate, actions=[0])
+            trainer.tables.regrets(row)[:] = [6.0]
+            trainer.tables.strategy(row)[:] = [6.0]
+            trainer.solve(abstraction, turn_number=5, iterations=2)
+            self.assertEqual(trainer.tables.regrets(row).tolist(), [6.0])
+            self.assertEqual(trainer.tables.strategy(row).tolist(), [6.0])
+            self.assertNotIn(row, trainer.tables.updated)
+            self.assertTrue(trainer.tables.updated)
+
+            # The first iteration of a search halves its strategies
+            root_row = trainer.tables.row(abstraction.infostate,
+                                          trainer.root_actions)
+            self.assertIn(root_row, trainer.tables.updated)
+            strategy = trainer.tables.strategy(root_row).copy()
+            trainer.tables.updated = {root_row}
+            trainer._end_iteration(0)
+            self.assertEqual(trainer.tables.strategy(root_row).tolist(),
+                             (strategy/2).tolist())
+
+    def test_filtered_root(self):
+        """
+        This checks that the sampling trainers use the actions filters.
+        """
+        random.seed(0)
+        abstraction = get_sample_abstraction()
+        trainer = ExternalSamplingCFRTrainer()
+        trainer.solve(abstraction, turn_number=1, iterations=5)
+        self.assertLess(len(trainer.root_actions),
+                        len(abstraction.state.actions()))
+
+
+class TestTableStore(unittest.TestCase):
+    """
+    This is for testing the NumPy storage of the regret and strategy tables.
+    """
+
+    def test_update(self):
+        """
+        This checks the accumulation of regrets and strategies, and the regret
+        matching of the next profile.
+        """
+        infostate = get_sample_abstraction().infostate
+        store = TableStore()
+        row = store.add(infostate, actions=[4, 7, 9])
+        self.assertEqual(store.add(infostate, actions=[4, 7, 9]), row)
+        self.assertIsNone(store.row(infostate, actions=[4, 7]))
+        self.assertEqual(store.actions(row).tolist(), [4, 7, 9])
+        self.assertEqual(store.profile(row).tolist(), [1/3]*3)
+        store.update(row, profile=[0.5, 0.25, 0.25], utilities=[3.0, 1.0, -2.0],
+                     node_utility=1.0, opponent_probability=0.5,
+                     player_probability=0.5)
+        self.assertEqual(store.regrets(row).tolist(), [1.0, 0.0, -1.5])
+        self.assertEqual(store.strategy(row).tolist(), [0.25, 0.125, 0.125])
+        self.assertEqual(store.profile(row).tolist(), [1.0, 0.0, 0.0])
+        store.update(row, profile=[1.0, 0.0, 0.0], utilities=[0.0, 0.0, 0.0],
+                     node_utility=2.0, opponent_probability=1.0,
+                     player_probability=1.0)
+        self.assertEqual(store.profile(row).tolist(), [1/3]*3)
+
+    def test_update_rules(self):
+        """
+        This checks that the flooring of regrets for CFR+ and the discounting
+        of regrets and strategies for Discounted CFR apply once to every
+        recorded row, whether it was updated twice or not since, and leave the
+        other rows alone.
+        """
+        infostate = get_sample_abstraction().infostate
+        store = TableStore()
+        row = store.add(infostate, actions=[4, 7])
+        other_row = store.add(infostate, actions=[4, 9])
+        old_row = store.add(infostate, actions=[7, 9])
+        store.regrets(old_row)[:] = [-4.0, 2.0]
+        store.updated = set()
+        store.accumulate_strategy(other_row, profile=[0.25, 0.75], weight=4.0)
+        store.regrets(other_row)[:] = [-4.0, 2.0]
+        for _ in range(2):
+            store.update(row, profile=[0.5, 0.5], utilities=[3.0, -1.0],
+                         node_utility=1.0, opponent_probability=1.0,
+                         player_probability=1.0)
+        store.accumulate_strategy(row, profile=[1.0, 0.0], weight=1.0)
+        self.assertEqual(store.updated, {row, other_row})
+        self.assertEqual(store.regrets(row).tolist(), [4.0, -4.0])
+        self.assertEqual(store.strategy(row).tolist(), [2.0, 1.0])
+
+        store.discount(store.updated, regret_discounts=(0.5, 0.25),
+                       strategy_discount=0.5)
+        self.assertEqual(store.regrets(row).tolist(), [2.0, -1.0])
+        self.assertEqual(store.strategy(row).tolist(), [1.0, 0.5])
+        self.assertEqual(store.regrets(other_row).tolist(), [-1.0, 1.0])
+        self.assertEqual(store.strategy(other_row).tolist(), [0.5, 1.5])
+        self.assertEqual(store.regrets(old_row).tolist(), [-4.0, 2.0])
+        self.assertEqual(store.profile(row).tolist(), [1.0, 0.0])
+
+        store.discount(store.updated, floor_regrets=True)
+        self.assertEqual(store.regrets(row).tolist(), [2.0, 0.0])
+        self.assertEqual(store.regrets(other_row).tolist(), [0.0, 1.0])
+        self.assertEqual(store.regrets(old_row).tolist(), [-4.0, 2.0])
+
+    def test_merge(self):
+        """
+        This checks that the changes of a copy of the tables, started from a
+        snapshot, can be merged back.
+        """
+        infostate = get_sample_abstraction().infostate
+        store, copy = TableStore(), TableStore()
+        row = store.add(infostate, actions=[4, 7])
+        store.regrets(row)[:] = [1.0, 3.0]
+        copy.load(store.snapshot())
+        copy.update(copy.row(infostate, actions=[4, 7]), profile=[0.5, 0.5],
+                    utilities=[0.0, 2.0], node_utility=1.0,
+                    opponent_probability=1.0, player_probability=1.0)
+        copy.add(infostate, actions=[9])
+        store.merge(copy.deltas(store.snapshot()))
+
+        self.assertEqual(store.to_dict("regrets"), copy.to_dict("regrets"))
+        self.assertEqual(store.to_dict("strategies"),
+                         copy.to_dict("strategies"))
+        self.assertEqual(store.profile(row).tolist(), [0.0, 1.0])
+
+    def test_growth(self):
+        """
+        This checks that rows survive the reallocation of the slabs, and that
+        the export lays them out by id.
+        """
+        abstraction = get_sample_abstraction()
+        actions = abstraction.state.actions()
+        store = TableStore(capacity=4)
+        for width in range(1, 5):
+            row = store.add(abstraction.infostate, actions=actions[:width])
+            store.strategy(row)[:] = width
+        self.assertEqual(len(store), 4)
+        exported = store.export()
+        self.assertEqual(exported["offsets"].tolist(), [0, 1, 3, 6])
+        self.assertEqual(exported["strategies"].tolist(),
+                         [1, 2, 2, 3, 3, 3, 4, 4, 4, 4])
+        self.assertEqual(exported["actions"][6:].tolist(), actions[:4])
+        self.assertEqual(store.to_dict("strategies")[TableStore.node_key(
+            abstraction.infostate, actions[:3])], [3.0]*3)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """
+    This is for testing the bounded transposition table.
+    """
+
+    def test_lru(self):
+        """
+        This checks that the least recently used entry is evicted, and that
+        hits and misses are counted.
+        """
+        table = TranspositionTable(
+            max_bytes=3*TranspositionTable.LRU_ENTRY_BYTES)
+        for zobrist in range(3):
+            table.store(zobrist, depth=1, value=float(zobrist))
+        self.assertEqual(table.get(0, depth=1), 0.0)
+        self.assertIsNone(table.get(0, depth=2))
+        table.store(3, depth=1, value=3.0)
+        self.assertEqual(len(table), 3)
+        self.assertIsNone(table.get(1, depth=1))
+        self.assertEqual(table.get(3, depth=1), 3.0)
+        self.assertEqual((table.hits, table.misses), (2, 2))
+
+    def test_buckets(self):
+        """
+        This checks that shallower entries go to the always-replace slot
+        without displacing the deepest entry of the bucket.
+        """
+        table = TranspositionTable(
+            max_bytes=2*TranspositionTable.BUCKET_ENTRY_BYTES,
+            policy=Replacement.BUCKETS)
+        self.assertEqual(table.capacity, 2)
+        table.store(10, depth=3, value=1.0)
+        table.store(11, depth=1, value=2.0)
+        table.store(12, depth=2, value=3.0)
+        self.assertEqual(table.get(10, depth=3), 1.0)
+        self.assertIsNone(table.get(11, depth=1))
+        self.assertEqual(table.get(12, depth=2), 3.0)
+        table.store(13, depth=4, value=4.0)
+        self.assertEqual(table.get(13, depth=4), 4.0)
+        self.assertEqual(len(table), 2)
+
+    def test_kept_across_solves(self):
+        """
+        This checks that the trainer keeps its table between searches.
+        """
+        table = TranspositionTable(max_bytes=1024*1024)
+        trainer = DepthLimitedCFRTrainer(transposition_table=table)
+        table.store(1, depth=5, value=1.0)
+        trainer.solve(get_sample_abstraction(), turn_number=5, iterations=2)
+        self.assertIs(trainer.transposition_table, table)
+        self.assertEqual(table.get(1, depth=5), 1.0)
+
+
+class QuickCFRTrainer(DepthLimitedCFRTrainer):
+    """
+    This is a trainer that solves each move with a single iteration, so that
+    games can be generated quickly in the tests.
+    """
+    SOLVE_ITERATIONS = 1
+
+
+class StopAtRows:
+    """
+    This is a stop event for generating data, which is set once the output
+    file has the given number of rows.
+    """
+
+    def __init__(self, path: str, rows: int):
+        self.path = path
+        self.rows = rows
+
+    def is_set(self):
+        """
+        This checks the number of rows of the output file.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as output:
+            return sum(1 for _ in output) >= self.rows
+
+
+class TestCFRTrainingSimulator(unittest.TestCase):
+    """
+    This is for testing the generation of training data.
+    """
+
+    def test_prune_strategy(self):
+        """
+        This checks that the three lowest nonzero probabilities of a strategy
+        are dropped, and that the most likely action is always kept.
+        """
+        pruned = CFRTrainingSimulator._prune_strategy(
+            [0.0, 0.05, 0.4, 0.1, 0.0, 0.15, 0.3])
+        for probability, expected in zip(pruned,
+                                         [0.0, 0.0, 0.4/0.7, 0.0, 0.0, 0.0, 0.3/0.7]):
+            self.assertAlmostEqual(probability, expected)
+        self.assertEqual(CFRTrainingSimulator._prune_strategy([0.25, 0.75, 0.0]),
+                         [0.0, 1.0, 0.0])
+
+    def test_resume(self):
+        """
+        This checks that a run stopped in the middle of a game, with rows
+        written after its checkpoint, resumes exactly where it stopped, whether
+        or not the checkpoints include the tables.
+        """
+        for checkpoint_tables in [True, False]:
+            with tempfile.TemporaryDirectory() as output_dir:
+                outputs = []
+                for name, stops in [("whole", [40]), ("resumed", [15, 40])]:
+                    output_path = os.path.join(output_dir, f"{name}.csv")
+                    random.seed(0)
+                    for s, rows in enumerate(stops):
+                        simulator = CFRTrainingSimulator(
+                            formations=[None, None], controllers=None,
+                            save_data=False, pov=0,
+                            trainer_class=QuickCFRTrainer,
+                            output_path=output_path, verbose=False,
+                            checkpoint_path=os.path.join(output_dir,
+                                                         f"{name}.ckpt"),
+                            checkpoint_interval=10,
+                            checkpoint_tables=checkpoint_tables)
+                        if s > 0:
+                            # Scramble the random number generator, and write
+                            # a row that the checkpoint does not cover
+                            random.seed(1)
+                            with open(output_path, "a",
+                                      encoding="utf-8") as output:
+                                output.write("unfinished\n")
+                        simulator.generate(target=100, resume=s > 0,
+                                           stop=StopAtRows(output_path, rows))
+                    with open(output_path, encoding="utf-8") as output:
+                        outputs.append(output.read())
+
+                self.assertEqual(outputs[0].count("\n"), 40)
+                self.assertEqual(outputs[0], outputs[1])
+
+
+class TestSelfPlayCoordinator(unittest.TestCase):
+    """
+    This is for testing the parallel generation of training data.
+    """
+
+    def test_shards(self):
+        """
+        This checks that the workers generate exactly the target number of
+        samples between their shards, that the shards can be merged, and that
+        the run can be resumed.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            coordinator = SelfPlayCoordinator(workers=2, output_dir=output_dir,
+                                              seed=0)
+            self.assertEqual(coordinator.start(target=4, progress_interval=1),
+                             4)
+
+            index = coordinator.write_index()
+            self.assertEqual([shard for shard, _ in index],
+                             ["shard_000.csv", "shard_001.csv"])
+            self.assertEqual(sum(rows for _, rows in index), 4)
+            merged_path = os.path.join(output_dir, "merged.csv")
+            coordinator.merge(merged_path)
+            with open(merged_path, encoding="utf-8") as merged:
+                self.assertEqual(len(merged.readlines()), 4)
+
+            # The checkpoints let a later run carry on to a higher target
+            self.assertEqual(coordinator.start(target=6, progress_interval=1,
+                                               resume=True), 6)
+            self.assertEqual(sum(rows for _, rows in coordinator.write_index()),
+                             6)
+
+
+class TestImports(unittest.TestCase):
+    """
+    This is for testing that importing the training module stays light.
+    """
+
+    def test_optional_dependencies_not_imported(self):
+        """
+        This checks that the GUI, plotting, tree visualization and NumPy
+        dependencies are not imported along with the training module, using a
+        fresh interpreter.
+        """
+        code = ("import sys, OLA.training; "
+                "print(' '.join(m for m in ['tkinter', 'anytree', 'matplotlib', "
+                "'numpy'] if m in sys.modules))")
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True,
+            text=True, cwd=os.path.abspath(os.path.join(testdir, '..')))
+        self.assertEqual(output.stdout.strip(), "")
+
+
 if __name__ == '__main__':
     unittest.main()